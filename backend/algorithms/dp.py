@@ -0,0 +1,491 @@
+'''
+Declarative dynamic programming engine.
+
+A problem is declared once as a DPProblem: its state space (root() and subproblems()), its transition
+(combine()), its base cases (is_base() and base_value()) and, for tabulation, its table (new_table() and
+fill()) and how the answer is read off it (answer_steps()). The recursive, memoized and tabulated tracers are
+derived from the declaration by recursive_trace_iter(), memo_trace_iter() and tab_trace_iter(), so the
+explicit call stack, subtree deduplication, the memo and table delta encodings and the tabulation
+granularities are implemented here once, for every problem.
+
+A declaration also says what its events carry (their fields and explanations). The defaults give every
+event the bare fields the engine knows about, the fibonacci, knapsack and lcs declarations override them so
+each problem keeps the trace format its frontend view expects.
+'''
+from functools import partial
+
+from backend.algorithms.tracing import (StepCounter, SubtreeIndex, check_encoding, check_dedup,
+                                        check_granularity, block_steps, copy_table, DEFAULT_KEYFRAME_INTERVAL,
+                                        DEFAULT_STRIDE)
+from backend.algorithms.explanations import explainer
+
+
+class DPProblem:
+    '''
+    Base class of a declared DP problem. An instance holds one input (n, the items and capacity, ...),
+    states are hashable values of the subclass' choosing.
+
+    Subclasses must define root(), is_base(), base_value(), subproblems() and combine() to be traced
+    recursively or with memoization, and new_table() and fill() to be tabulated. Everything else has a default.
+    What a hook returns for a state must only depend on the state: the recursive tracer asks call_fields(),
+    call_explanation(), is_base(), base_value() and subproblems() once per distinct state, however often
+    it is called.
+    '''
+
+    # Tabulation tables are 1D (filled from 'first_cell' on, the entries before it hold the base cases) or
+    # 2D (filled row by row from (1, 1), row and column 0 hold the base cases).
+    dimensions = 2
+    first_cell = 1
+    column = 'j'  # name of the column index field of 2D tabulation events
+
+    # Whether a memoized call returns with a 'return' event after storing its result
+    memo_returns = True
+
+    # STATE SPACE AND TRANSITION
+
+    def root(self):
+        '''
+        The state of the whole problem.
+        '''
+        raise NotImplementedError
+
+    def is_base(self, state):
+        raise NotImplementedError
+
+    def base_value(self, state):
+        raise NotImplementedError
+
+    def subproblems(self, state):
+        '''
+        The states a non-base state's value is computed from, in the order they are solved.
+        '''
+        raise NotImplementedError
+
+    def combine(self, state, results):
+        '''
+        The value of a state from the values of its subproblems.
+        '''
+        raise NotImplementedError
+
+    def memoizes(self, state):
+        '''
+        Whether a state's value is stored in the memo once it has been computed.
+        '''
+        return True
+
+    def memo_key(self, state):
+        '''
+        The state's key in the memo sent to the client, which has to be JSON serializable.
+        '''
+        return str(state)
+
+    # RECURSIVE AND MEMOIZED EVENTS
+    # 'explain' builds an explanation (see explanations.py), 'results' are the values of the subproblems
+    # solved so far. A None explanation leaves the 'explanation' field out.
+
+    def call_fields(self, state):
+        '''
+        The fields identifying a call's state, on its 'call' and 'subtree_ref' events.
+        '''
+        return {'state' : state}
+
+    def call_explanation(self, explain, state, memoized):
+        return None
+
+    def base_step(self, explain, state, call_id, result):
+        return {'type' : 'base_case', 'id' : call_id, 'result' : result}
+
+    def expand_steps(self, explain, state, call_id):
+        '''
+        Events traced once a non-base state's subproblems are known, before the first one is solved, as a
+        tuple or list (the tracers count them before yielding them).
+        '''
+        return ()
+
+    def child_steps(self, explain, state, call_id, results):
+        '''
+        Events traced after subproblem len(results) - 1 has been solved, as a tuple or list.
+        '''
+        return ()
+
+    def return_step(self, explain, state, call_id, results, result):
+        return {'type' : 'return', 'id' : call_id, 'result' : result}
+
+    def cache_hit_step(self, explain, state, call_id, result):
+        return {'type' : 'cache_hit', 'id' : call_id, 'state' : state, 'result' : result}
+
+    def cache_miss_step(self, explain, state, call_id):
+        return {'type' : 'cache_miss', 'id' : call_id, 'state' : state}
+
+    def store_step(self, explain, state, call_id, result):
+        return {'type' : 'store_result', 'id' : call_id, 'state' : state, 'result' : result}
+
+    # TABULATION
+
+    def new_table(self):
+        '''
+        The DP table before any cell is filled.
+        '''
+        raise NotImplementedError
+
+    def fill(self, dp, *cell):
+        '''
+        Computes one cell of the table, dp[i] or dp[i][j].
+        '''
+        raise NotImplementedError
+
+    def table_shape(self):
+        '''
+        The size of new_table(), (rows,) or (rows, columns), for cost estimates. The default builds the table,
+        declarations whose tables can be large should work it out from their input instead.
+        '''
+        dp = self.new_table()
+        return (len(dp),) if self.dimensions == 1 else (len(dp), len(dp[0]) if dp else 0)
+
+    def init_steps(self, explain, dp, delta):
+        '''
+        Events traced before the table is filled, setting its base cases.
+        '''
+        yield {'type' : 'init_table', 'table' : copy_table(dp)}
+
+    def iteration_explanation(self, explain, dp, cell):
+        return None
+
+    def block_explanation(self, explain, dp, start, end):
+        '''
+        Explanation of a 1D 'stride' block that filled dp[start..end].
+        '''
+        return None
+
+    def answer_steps(self, explain, dp):
+        '''
+        Events traced once the table is filled, reading the answer (and whatever goes with it) off it.
+        '''
+        result = dp[-1][-1] if self.dimensions == 2 else dp[-1]
+        yield {'type' : 'final_result', 'table' : copy_table(dp), 'result' : result}
+
+
+def _call_stepper(problem, explain, memoized):
+    # Builds the 'call' events of a trace, with the declaration's hooks looked up once per trace
+    call_fields, call_explanation = problem.call_fields, problem.call_explanation
+
+    def call_step(state, call_id, parent_id, depth):
+        step = {'type' : 'call', 'id' : call_id, 'parent' : parent_id, 'depth' : depth}
+        step.update(call_fields(state))
+        explanation = call_explanation(explain, state, memoized)
+        if explanation is not None:
+            step['explanation'] = explanation
+        return step
+
+    return call_step
+
+
+def _state_cache(problem, explain):
+    # What a plain recursive call to a state looks like does not change from one call to the next: its call
+    # fields and explanation, and whether it is a base case (with its value) or which subproblems it has.
+    # learn(state) works them out with the declaration's hooks on the state's first call and keeps them.
+    entered = {}
+    call_fields, call_explanation = problem.call_fields, problem.call_explanation
+    is_base, base_value, subproblems = problem.is_base, problem.base_value, problem.subproblems
+
+    def learn(state):
+        fields = call_fields(state)
+        explanation = call_explanation(explain, state, False)
+        if explanation is not None:
+            fields['explanation'] = explanation
+        if is_base(state):
+            known = entered[state] = (fields, True, base_value(state))
+        else:
+            known = entered[state] = (fields, False, subproblems(state))
+        return known
+
+    return entered, learn
+
+
+def recursive_trace_iter(problem, explanations='text', dedup=False):
+    '''
+    Solves a declared problem by plain recursion, yielding its execution trace: a 'call' for every call, then
+    its 'base_case' or the problem's expand and child events around its subproblems' calls, then its 'return'.
+
+    The call stack is kept in an explicit list rather than on Python's, so the depth is not bounded by the
+    interpreter's recursion limit. With dedup=True a call to a state whose subtree has already been traced
+    is a single 'subtree_ref' step (see expand_subtrees() in tracing.py).
+    '''
+    check_dedup(dedup)
+    explain = explainer(explanations)
+    counter = StepCounter()
+    subtrees = SubtreeIndex(counter) if dedup else None
+    entered, learn = _state_cache(problem, explain)
+    # the declaration's hooks, looked up once rather than on every step
+    base_step, expand_steps, child_steps = problem.base_step, problem.expand_steps, problem.child_steps
+    combine, return_step = problem.combine, problem.return_step
+
+    # Each frame is [state, parent_id, depth, call_id, subproblems, results]. A frame with no call_id has not
+    # been entered yet, 'result' holds the value returned by the last frame popped off the stack. 'count' is
+    # bumped before each step is yielded, so a call's id is the count when it is entered. The subtree index
+    # reads it off the counter, which is only kept up to date with dedup=True.
+    stack = [[problem.root(), None, 0, None, None, None]]
+    result = None
+    count = 0
+    while stack:
+        frame = stack[-1]
+        state, parent_id, depth, call_id, children, results = frame
+
+        if call_id is None:
+            if subtrees is not None and state in subtrees:
+                # Trace Event: Repeated Call
+                counter.count = count
+                step = subtrees.reference(state, parent_id, depth, problem.call_fields(state), explain)
+                count += step['length']
+                yield step
+                result = step['result']
+                stack.pop()
+                continue
+
+            call_id = frame[3] = count
+            count += 1
+            fields, base, below = entered.get(state) or learn(state)
+            step = {'type' : 'call', 'id' : call_id, 'parent' : parent_id, 'depth' : depth}
+            step.update(fields)
+            yield step
+
+            if base:
+                result = below
+                count += 1
+                yield base_step(explain, state, call_id, result)
+                if subtrees is not None:
+                    counter.count = count
+                    subtrees.finished(state, call_id, result)
+                stack.pop()
+                continue
+
+            children = frame[4] = below
+            results = frame[5] = []
+            steps = expand_steps(explain, state, call_id)
+        else:
+            # a subproblem has returned
+            results.append(result)
+            steps = child_steps(explain, state, call_id, results)
+        if steps:
+            count += len(steps)
+            yield from steps
+
+        if len(results) < len(children):
+            stack.append([children[len(results)], call_id, depth + 1, None, None, None])
+            continue
+
+        result = combine(state, results)
+        count += 1
+        yield return_step(explain, state, call_id, results, result)
+        if subtrees is not None:
+            counter.count = count
+            subtrees.finished(state, call_id, result)
+        stack.pop()
+
+
+class _Memo:
+    '''
+    The memo of a memoized trace, kept alongside a copy under the problem's memo keys so it is JSON
+    serializable for the frontend, and the events that show it in the trace's encoding.
+    '''
+
+    def __init__(self, problem, explain, delta, keyframe_interval):
+        self.values = {}
+        self.json = {}
+        self.explain = explain
+        self.delta = delta
+        self.keyframe_interval = keyframe_interval
+        self._memo_key, self._store_step, self._hit_step = problem.memo_key, problem.store_step, problem.cache_hit_step
+
+    def hit_step(self, state, call_id):
+        step = self._hit_step(self.explain, state, call_id, self.values[state])
+        if not self.delta:
+            step['memo'] = self.json.copy()
+        return step
+
+    def store(self, state, call_id, result):
+        '''
+        Stores a state's value, returning the 'store_result' event.
+        '''
+        self.values[state] = result
+        key = self._memo_key(state)
+        self.json[key] = result
+        step = self._store_step(self.explain, state, call_id, result)
+        if self.delta:
+            step['memo_entry'] = {'key' : key, 'value' : result}
+        if not self.delta or len(self.values) % self.keyframe_interval == 0:
+            step['memo'] = self.json.copy()
+        return step
+
+
+def memo_trace_iter(problem, encoding='full', keyframe_interval=DEFAULT_KEYFRAME_INTERVAL, explanations='text'):
+    '''
+    Solves a declared problem by recursion with memoization, yielding its execution trace. Every call is
+    checked against the memo ('cache_hit' or 'cache_miss') and the values of the states the problem
+    memoizes are stored in it ('store_result'). Calls are kept on an explicit stack, as in recursive_trace_iter.
+
+    With encoding='delta' a 'store_result' carries only the new 'memo_entry' and a cache hit carries no
+    memo at all. A full 'memo' checkpoint is attached every 'keyframe_interval' stored entries.
+    '''
+    check_encoding(encoding, keyframe_interval)
+    explain = explainer(explanations)
+    memo = _Memo(problem, explain, encoding == 'delta', keyframe_interval)
+    memo_values, hit_step, store = memo.values, memo.hit_step, memo.store
+    count = 0
+    call_step = _call_stepper(problem, explain, True)
+    cache_miss_step = problem.cache_miss_step
+    is_base, base_value, base_step = problem.is_base, problem.base_value, problem.base_step
+    subproblems, expand_steps, child_steps = problem.subproblems, problem.expand_steps, problem.child_steps
+    combine, return_step, memoizes = problem.combine, problem.return_step, problem.memoizes
+    memo_returns = problem.memo_returns
+
+    # Each frame is [state, parent_id, depth, call_id, subproblems, results], see recursive_trace_iter
+    stack = [[problem.root(), None, 0, None, None, None]]
+    result = None
+    while stack:
+        frame = stack[-1]
+        state, parent_id, depth, call_id, children, results = frame
+
+        if call_id is None:
+            call_id = frame[3] = count
+            # the call and its cache hit or miss
+            count += 2
+            yield call_step(state, call_id, parent_id, depth)
+
+            if state in memo_values:
+                result = memo_values[state]
+                yield hit_step(state, call_id)
+                stack.pop()
+                continue
+
+            yield cache_miss_step(explain, state, call_id)
+
+            if is_base(state):
+                result = base_value(state)
+                count += 1
+                yield base_step(explain, state, call_id, result)
+                if memoizes(state):
+                    count += 1
+                    yield store(state, call_id, result)
+                stack.pop()
+                continue
+
+            children = frame[4] = subproblems(state)
+            results = frame[5] = []
+            steps = expand_steps(explain, state, call_id)
+        else:
+            results.append(result)
+            steps = child_steps(explain, state, call_id, results)
+        if steps:
+            count += len(steps)
+            yield from steps
+
+        if len(results) < len(children):
+            stack.append([children[len(results)], call_id, depth + 1, None, None, None])
+            continue
+
+        result = combine(state, results)
+        if memoizes(state):
+            count += 1
+            yield store(state, call_id, result)
+        if memo_returns:
+            count += 1
+            yield return_step(explain, state, call_id, results, result)
+        stack.pop()
+
+
+def tab_trace_iter(problem, encoding='full', keyframe_interval=DEFAULT_KEYFRAME_INTERVAL, explanations='text',
+                   granularity='cell', stride=DEFAULT_STRIDE):
+    '''
+    Solves a declared problem by filling its DP table bottom up, yielding its execution trace: the
+    problem's init events, an 'iteration' per cell, then its answer events.
+
+    With encoding='delta' the 'iteration' events carry only the changed 'cell' and a full 'table'
+    keyframe is attached every 'keyframe_interval' iterations.
+
+    With granularity 'row', 'diagonal' or 'stride' (only 'stride' for a 1D table) the table is filled
+    without per-cell events and one 'iteration_block' event is traced per row, anti-diagonal or 'stride'
+    cells (see tracing.py).
+    '''
+    check_encoding(encoding, keyframe_interval)
+    check_granularity(granularity, stride, problem.dimensions)
+    explain = explainer(explanations)
+    delta = encoding == 'delta'
+
+    dp = problem.new_table()
+    yield from problem.init_steps(explain, dp, delta)
+
+    if problem.dimensions == 1:
+        if granularity == 'stride':
+            yield from _stride_steps(problem, dp, stride, delta, keyframe_interval, explain)
+        else:
+            yield from _line_steps(problem, dp, delta, keyframe_interval, explain)
+    elif granularity != 'cell':
+        yield from block_steps(dp, granularity, stride, partial(problem.fill, dp), delta, keyframe_interval, explain,
+                               column=problem.column)
+    else:
+        yield from _grid_steps(problem, dp, delta, keyframe_interval, explain)
+
+    yield from problem.answer_steps(explain, dp)
+
+
+def _line_steps(problem, dp, delta, keyframe_interval, explain):
+    # 'iteration' events of a 1D table
+    fill = problem.fill
+    for filled, i in enumerate(range(problem.first_cell, len(dp)), 1):
+        fill(dp, i)
+        step = {'type' : 'iteration', 'i' : i}
+        explanation = problem.iteration_explanation(explain, dp, (i,))
+        if explanation is not None:
+            step['explanation'] = explanation
+        if delta:
+            step['cell'] = {'index' : i, 'value' : dp[i]}
+        if not delta or filled % keyframe_interval == 0:
+            step['table'] = list(dp)
+        yield step
+
+
+def _stride_steps(problem, dp, stride, delta, keyframe_interval, explain):
+    # 'iteration_block' events of a 1D table, one per 'stride' entries
+    fill = problem.fill
+    for blocks, start in enumerate(range(problem.first_cell, len(dp), stride), 1):
+        stop = min(start + stride, len(dp))
+        for i in range(start, stop):
+            fill(dp, i)
+
+        step = {
+            'type' : 'iteration_block',
+            'unit' : 'stride',
+            'i' : stop - 1,
+            'count' : stop - start
+        }
+        explanation = problem.block_explanation(explain, dp, start, stop - 1)
+        if explanation is not None:
+            step['explanation'] = explanation
+        if delta:
+            step['spans'] = [{'index' : start, 'values' : dp[start:stop]}]
+        if not delta or blocks % keyframe_interval == 0:
+            step['table'] = list(dp)
+        yield step
+
+
+def _grid_steps(problem, dp, delta, keyframe_interval, explain):
+    # 'iteration' events of a 2D table, filled row by row
+    fill = problem.fill
+    column = problem.column
+    filled = 0
+    for i in range(1, len(dp)):
+        row = dp[i]
+        for j in range(1, len(row)):
+            fill(dp, i, j)
+            filled += 1
+
+            step = {'type' : 'iteration', 'i' : i, column : j, 'highlight' : {'row' : i, 'col' : j}}
+            explanation = problem.iteration_explanation(explain, dp, (i, j))
+            if explanation is not None:
+                step['explanation'] = explanation
+            if delta:
+                step['cell'] = {'row' : i, 'col' : j, 'value' : row[j]}
+            if not delta or filled % keyframe_interval == 0:
+                step['table'] = copy_table(dp)
+            yield step
@@ -0,0 +1,137 @@
+'''
+Explanation templates for the tracer events.
+
+By default ('text') every event carries its explanation as a formatted string. With explanations='template'
+an event carries [template_id, *args] instead, and the text is only rendered when someone wants to read it:
+by the client from the catalog (see template_catalog()), or on the server with render_explanation().
+That keeps string formatting and string memory out of the tracers' hot loops.
+'''
+
+
+EXPLANATION_MODES = ('text', 'template')
+
+# Templates are str.format strings over positional arguments. A template's id is its position in this dict,
+# so new templates must only ever be added at the end.
+EXPLANATIONS = {
+    # fibonacci
+    'fib.call' : "Calling fib({0}).",
+    'fib.base_case' : "Base case for fib({0}), returning {0}.",
+    'fib.return' : "fib({1}) + fib({2}) = {3} + {4}. Returning {5} for fib({0}).",
+    'fib.memo_call' : "Calling fib({0}). Checking Cache",
+    'fib.cache_hit' : "fib({0}) found in cache. Returning {1}",
+    'fib.cache_miss' : "fib({0}) not in cache. Proceeding to compute",
+    'fib.store_result' : "Storing fib({0} = {1} in cache.",
+    'fib.zero' : "Input is 0, returning 0 as output.",
+    'fib.init_table' : "Initialized a table of size {0} with zeros.",
+    'fib.set_base_case' : "Set base case table[1] = 1",
+    'fib.iteration' : "i = {0}: table[{0}] = table[{1}] + table[{2}] = {3} + {4} = dp[{0}].",
+    'fib.final_result' : "Final Result is table[{0}] = {1}.",
+
+    # knapsack
+    'knapsack.call' : "Considering item {0} with capacity {1}.",
+    'knapsack.base_case' : "Base case reached (no more items or capacity).",
+    'knapsack.skip' : "Item {0} with weight {1} is too heavy and therefore skipped.",
+    'knapsack.return' : "Max Value for item {0} with capacity {1} is {2}.",
+    'knapsack.memo_call' : "Considering item {0} with capacity {1}. Checking Cache",
+    'knapsack.cache_hit' : "Result for item {0} with capacity {1} found in cache.",
+    'knapsack.cache_miss' : "Result for item {0} with capacity {1} not found in cache.. Proceeding to compute",
+    'knapsack.store_result' : "Storing result for item {0} with capacity {1} in cache.",
+    'knapsack.init_table' : "Initialized a {0} x {1} DP table with zeros.",
+    'knapsack.iteration' : "Calculated dp[{0}][{1}]= {2}.",
+    'knapsack.final_result' : "Table Complete. Max value is {0}. Starting Traceback to find included items.",
+    'knapsack.traceback_step' : "Checking if item {0} was included.",
+    'knapsack.item_included' : "Item {0} was included. New capacity for traceback {1}",
+    'knapsack.traceback_complete' : "Traceback complete. Items {0} give max value",
+
+    # lcs
+    'lcs.call' : "Comparing s1[{0}] with capacity s2[{1}].",
+    'lcs.memo_call' : "Comparing s1[{0}] with capacity s2[{1}]. Checking cache.",
+    'lcs.init_table' : "Initialized a {0} x {1} DP table with zeros.",
+    'lcs.match' : "Match! s1[{0}] == s2[{1}] ({2}). Value is 1 + dp[{0}][{1}].",
+    'lcs.mismatch' : "Mismatch. Value is max(dp[{0}][{1}], dp[{2}][{3}]).",
+    'lcs.final_result' : "Table complete. LCS length is {0}. Starting traceback.",
+    'lcs.traceback_step' : "Tracing back from dp[{0}][{1}].",
+    'lcs.traceback_match' : "Found common character {0}. Moving diagonally up towards the left.",
+    'lcs.traceback_complete' : "Traceback complete. LCS is '{0}'",
+
+    # recursive tracers with dedup=True
+    'subtree_ref' : "Call {0} repeats call {1}: its {2} steps are the same, returning {3}.",
+
+    # tabulation tracers with a coarse granularity
+    'table.fill_row' : "Filled row {0} of the DP table ({1} cells).",
+    'table.fill_diagonal' : "Filled anti-diagonal {0} of the DP table ({1} cells).",
+    'table.fill_cells' : "Filled {0} more cells of the DP table, up to dp[{1}][{2}] = {3}.",
+    'fib.fill_cells' : "Filled table[{0}] to table[{1}], table[{1}] = {2}.",
+
+    # knapsack tabulation over one rolling row
+    'knapsack.init_row' : "Initialized a row of size {0} with zeros, rewritten in place for each item.",
+    'knapsack.row_include' : "Including item {0} improves capacity {1}: dp[{1}] = {2}.",
+    'knapsack.row_exclude' : "Item {0} doesn't improve capacity {1}, dp[{1}] stays {2}.",
+
+    # lcs in linear space
+    'lcs.hirschberg_start' : "Splitting {0} (length {1}) in halves, keeping only score rows as wide as {2} (length {3}).",
+    'lcs.hirschberg_split' : "Rows {0} to {1} split at row {2}: forward and backward scores add up to {3} at column {4}.",
+    'lcs.hirschberg_base' : "Rows {0} to {1} against columns {2} to {3} add '{4}' to the subsequence.",
+
+    # lcs length, bit-parallel
+    'lcs.bitparallel_start' : "Packed the {0} columns into match masks for {1} distinct characters.",
+    'lcs.bitparallel_row' : "Row {0} ({1}) updated in one pass over the bit vector. LCS length so far is {2}.",
+    'lcs.bitparallel_result' : "All rows done. LCS length is {0}.",
+
+    # fibonacci by fast doubling
+    'fib.doubling_start' : "n = {0} is {1} in binary: {2} doubling steps from F(0) and F(1).",
+    'fib.doubling_step' : "Bit {0} is {1}: doubling gives k = {2}, F({2}) = {3}.",
+    'fib.doubling_result' : "F({0}) = {1}.",
+}
+
+TEMPLATE_IDS = {name : template_id for template_id, name in enumerate(EXPLANATIONS)}
+_TEMPLATES = list(EXPLANATIONS.values())
+
+
+def check_explanations(explanations):
+    '''
+    Raises a ValueError for an unknown explanation mode.
+    '''
+    if explanations not in EXPLANATION_MODES:
+        raise ValueError(f"Unknown explanations '{explanations}'. Expected one of {list(EXPLANATION_MODES)}.")
+
+
+def explainer(explanations='text'):
+    '''
+    Returns the explain(name, *args) function a tracer uses to build its 'explanation' fields:
+    the rendered text in 'text' mode, [template_id, *args] in 'template' mode.
+    '''
+    check_explanations(explanations)
+    if explanations == 'template':
+        ids = TEMPLATE_IDS
+        return lambda name, *args: [ids[name], *args]
+    templates = EXPLANATIONS
+    return lambda name, *args: templates[name].format(*args)
+
+
+def render_explanation(explanation):
+    '''
+    Turns a templated explanation back into its text. Text explanations are returned as they are.
+    '''
+    if isinstance(explanation, (list, tuple)):
+        return _TEMPLATES[explanation[0]].format(*explanation[1:])
+    return explanation
+
+
+def render_explanations(steps):
+    '''
+    Yields the steps with every templated explanation rendered to text, i.e. the 'text' mode trace.
+    '''
+    for step in steps:
+        if isinstance(step.get('explanation'), (list, tuple)):
+            step = dict(step)
+            step['explanation'] = render_explanation(step['explanation'])
+        yield step
+
+
+def template_catalog():
+    '''
+    The templates in the form sent to clients once per session: their ids are the list positions.
+    '''
+    return {'version' : 1, 'templates' : [{'id' : template_id, 'name' : name, 'text' : text}
+                                          for template_id, (name, text) in enumerate(EXPLANATIONS.items())]}
@@ -1,67 +1,191 @@
+from backend.algorithms.tracing import (summarize_int, describe_int, DEFAULT_KEYFRAME_INTERVAL, DEFAULT_STRIDE,
+                                        DEFAULT_MAX_DIGITS)
+from backend.algorithms.explanations import explainer
+from backend.algorithms.dp import DPProblem, recursive_trace_iter, memo_trace_iter, tab_trace_iter
+from backend.algorithms.registry import register_problem, register, declare
 
-def fibonacci_recursive_trace(n):
+
+register_problem('fibonacci', ('n',))
+
+
+@declare('fibonacci')
+class Fibonacci(DPProblem):
     '''
-    Computes the nth fibonacci number using pure recursion and generates an execution trace.
-    
-    The trace captures the call stack, showing how the function calls itself.
-    
-    Trace events for this function include:
-    - 'call' : When a function 'fib(k)' is called.
-    - 'base_case': When a base case (n <= 1) is hit.
-    - 'return' : When a function returns a value.
+    fib(n) declared for the DP engine: fib(k) = fib(k - 1) + fib(k - 2) with fib(0) = 0 and fib(1) = 1.
+    States are the k of fib(k) and the table is the 1D array of fib(0..n).
     '''
-    trace = []
-    def fib(k, parent_id, depth):
-        #    Create a unique ID for this specific call
-        call_id = len(trace)
-        
-        # Trace Event: Function Call
-        trace.append({
-            'type': 'call',
-            'id': call_id,
-            'parent': parent_id,
-            'depth' : depth,
-            'n' : k,
-            'explanation': f"Calling fib({k})."
-        })
-        
-        # Base case
-        if k <= 1:
-            # Trace Event: Base Case
-            trace.append({
+
+    dimensions = 1
+    first_cell = 2
+
+    def __init__(self, n):
+        self.n = n
+
+    def root(self):
+        return self.n
+
+    def is_base(self, k):
+        return k <= 1
+
+    def base_value(self, k):
+        return k
+
+    def subproblems(self, k):
+        return (k - 1, k - 2)
+
+    def combine(self, k, results):
+        return results[0] + results[1]
+
+    def memo_key(self, k):
+        return k
+
+    def call_fields(self, k):
+        return {'n' : k}
+
+    def call_explanation(self, explain, k, memoized):
+        return explain('fib.memo_call' if memoized else 'fib.call', k)
+
+    def base_step(self, explain, k, call_id, result):
+        return {
             'type': 'base_case',
             'id': call_id,
             'n' : k,
-            'result' : k,
-            'explanation': f"Base case for fib({k}), returning {k}."
-            })
-            return k
-    
-        res1 = fib(k - 1, call_id, depth + 1)
-        res2 = fib(k - 2, call_id, depth + 1)
-        
-        result = res1 + res2
-        
-        # Trace Event: Return
-        trace.append({
+            'result' : result,
+            'explanation': explain('fib.base_case', k)
+        }
+
+    def return_step(self, explain, k, call_id, results, result):
+        return {
             'type': 'return',
             'id': call_id,
             'n' : k,
             'result' : result,
-            'explanation': f"fib({k - 1}) + fib({k - 2}) = {res1} + {res2}. Returning {result} for fib({k})."
-        })
-        return result
+            'explanation': explain('fib.return', k, k - 1, k - 2, results[0], results[1], result)
+        }
+
+    def cache_hit_step(self, explain, k, call_id, result):
+        return {
+            'type': 'cache-hit',
+            'id': call_id,
+            'n': k,
+            'result' : result,
+            'explanation': explain('fib.cache_hit', k, result)
+        }
+
+    def cache_miss_step(self, explain, k, call_id):
+        return {
+            'type': 'cache-miss',
+            'id': call_id,
+            'n' : k,
+            'explanation': explain('fib.cache_miss', k)
+        }
+
+    def store_step(self, explain, k, call_id, result):
+        return {
+            'type': 'store_result',
+            'id': call_id,
+            'n' : k,
+            'result' : result,
+            'explanation': explain('fib.store_result', k, result)
+        }
+
+    def new_table(self):
+        return [0] * (self.n + 1)
+
+    def table_shape(self):
+        return (self.n + 1,)
+
+    def fill(self, dp, i):
+        dp[i] = dp[i - 1] + dp[i - 2]
+
+    def init_steps(self, explain, dp, delta):
+        if self.n == 0:
+            return
+        
+        # Trace Event: Initalize Table
+        yield {
+            'type': 'init_table',
+            'table': list(dp),
+            'explanation': explain('fib.init_table', self.n + 1)
+        }
+        
+        # base case
+        dp[1] = 1
+        
+        # Trace Event: Set Base Case
+        step = {
+            'type': 'set_base_case',
+            'explanation': explain('fib.set_base_case')
+        }
+        if delta:
+            step['cell'] = {'index' : 1, 'value' : dp[1]}
+        else:
+            step['table'] = list(dp)
+        yield step
+
+    def iteration_explanation(self, explain, dp, cell):
+        i = cell[0]
+        return explain('fib.iteration', i, i - 1, i - 2, dp[i - 1], dp[i - 2])
+
+    def block_explanation(self, explain, dp, start, end):
+        return explain('fib.fill_cells', start, end, dp[end])
+
+    def answer_steps(self, explain, dp):
+        n = self.n
+        if n == 0:
+            yield {
+                'type' : 'final_result',
+                'n' : 0,
+                'result' : 0,
+                'explanation' : explain('fib.zero')
+            }
+            return
+        
+        # Trace Event: Final Result
+        yield {
+            'type': 'final_result',
+            'table': list(dp),
+            'result' : dp[n],
+            'explanation': explain('fib.final_result', n, dp[n])
+        }
+
+
+@register('fibonacci', 'recursive')
+def fibonacci_recursive_trace_iter(n, explanations='text', dedup=False):
+    '''
+    Computes the nth fibonacci number using pure recursion and generates an execution trace.
+    
+    The trace captures the call stack, showing how the function calls itself.
+    Steps are yielded as soon as they happen, so only the current call stack is held in memory.
+    The call stack is kept in an explicit list rather than on Python's, so n is not bounded by the
+    interpreter's recursion limit (see recursive_trace_iter in dp.py).
+    
+    Trace events for this function include:
+    - 'call' : When a function 'fib(k)' is called.
+    - 'base_case': When a base case (n <= 1) is hit.
+    - 'return' : When a function returns a value.
+    - 'subtree_ref' : With dedup=True, a call to fib(k) after the first one, standing for a copy of the
+      first call's subtree (see expand_subtrees() in tracing.py).
     
-    fib(n, parent_id=None, depth=0)
-    return trace
+    With explanations='template' each 'explanation' is [template_id, *args] (see explanations.py).
+    '''
+    return recursive_trace_iter(Fibonacci(n), explanations, dedup)
+
+
+def fibonacci_recursive_trace(n, explanations='text', dedup=False):
+    '''
+    Returns the full trace of fibonacci_recursive_trace_iter(n) as a list.
+    '''
+    return list(fibonacci_recursive_trace_iter(n, explanations, dedup))
 
 
-def fibonacci_memo_trace(n):
+@register('fibonacci', 'memoization')
+def fibonacci_memo_trace_iter(n, encoding='full', keyframe_interval=DEFAULT_KEYFRAME_INTERVAL, explanations='text'):
     '''
     Computes the nth fibonacci number using memoization and generates an execution trace.
     
     The trace captures the memo cache is used to store and receive the results of sub-problems, avoiding
-    redundant computations.
+    redundant computations. Calls are kept on an explicit stack, as in fibonacci_recursive_trace_iter.
     
     Trace events for this function include:
     - 'call' : When a function 'fib(k)' is called.
@@ -70,97 +194,25 @@ def fibonacci_memo_trace(n):
     - 'store-result' : When a new result is stored in the cache.
     - 'base_case': When a base case (n <= 1) is hit.
     - 'return' : When a function returns a value.
-    '''
     
-    trace = []
-    memo = {}
-    
-    def fib(k, parent_id, depth):
-        call_id = len(trace)
-        
-        # Trace Event: Function Call
-        trace.append({
-            'type': 'call',
-            'id': call_id,
-            'parent': parent_id,
-            'depth' : depth,
-            'n' : k,
-            'explanation': f"Calling fib({k}). Checking Cache"
-        })
-        
-        # Check Cache
-        if k in memo:
-            # Trace Event: Function Call
-            trace.append({
-                'type': 'cache-hit',
-                'id': call_id,
-                'n': k,
-                'result' : memo[k],
-                'memo' : memo.copy(),
-                'explanation': f"fib({k}) found in cache. Returning {memo[k]}"
-            })
-            return memo[k]
-        
-        # Trace Event: Cache Miss
-        trace.append({
-            'type': 'cache-miss',
-            'id': call_id,
-            'n' : k,
-            'explanation': f"fib({k}) not in cache. Proceeding to compute"
-        })
-        
-        # Base case
-        if k <= 1:
-            # Trace Event: Base Case
-            trace.append({
-                'type': 'base_case',
-                'id': call_id,
-                'n' : k,
-                'result' : k,
-                'explanation': f"Base case for fib({k}), returning {k}."
-            })
-            
-            # store the result in memo
-            memo[k] = k
-            trace.append({
-                'type': 'store_result',
-                'id': call_id,
-                'n' : k,
-                'result' : k,
-                'memo' : memo.copy(),
-                'explanation': f"Storing fib({k} = {k} in cache."
-            })
-            
-            return k
-        
-        res1 = fib(k - 1, call_id, depth + 1)
-        res2 = fib(k - 2, call_id, depth + 1)
-        result = res1 + res2
-        
-        memo[k] = result
-        trace.append({
-            'type': 'store_result',
-            'id': call_id,
-            'n' : k,
-            'result' : result,
-            'memo' : memo.copy(),
-            'explanation': f"Storing fib({k} = {result} in cache."
-        })
-        
-        # Trace Event: Return
-        trace.append({
-            'type': 'return',
-            'id': call_id,
-            'n' : k,
-            'result' : result,
-            'explanation': f"fib({k - 1}) + fib({k - 2}) = {res1} + {res2}. Returning {result} for fib({k})."
-        })
-        return result
+    With encoding='delta' a 'store_result' carries only the new 'memo_entry' and a cache hit carries no
+    memo at all. A full 'memo' checkpoint is attached every 'keyframe_interval' stored entries.
     
-    fib(n, parent_id=None, depth=0)
-    return trace
+    With explanations='template' each 'explanation' is [template_id, *args] (see explanations.py).
+    '''
+    return memo_trace_iter(Fibonacci(n), encoding, keyframe_interval, explanations)
+
+
+def fibonacci_memo_trace(n, encoding='full', keyframe_interval=DEFAULT_KEYFRAME_INTERVAL, explanations='text'):
+    '''
+    Returns the full trace of fibonacci_memo_trace_iter(n) as a list.
+    '''
+    return list(fibonacci_memo_trace_iter(n, encoding, keyframe_interval, explanations))
+
 
-def fibonacci_tab_trace(n):
+@register('fibonacci', 'tabulation')
+def fibonacci_tab_trace_iter(n, encoding='full', keyframe_interval=DEFAULT_KEYFRAME_INTERVAL, explanations='text',
+                             granularity='cell', stride=DEFAULT_STRIDE):
     '''
     Computes the nth fibonacci number using tabulation and generates an execution trace.
     
@@ -171,59 +223,89 @@ def fibonacci_tab_trace(n):
     - 'set_base_case': When the initial value 'dp[1] = 1' is set.
     - 'iteration' : Calculating dp[i] for each step of the loop
     - 'final_result' : The final value extracted from the table.
-    '''
-    
-    if n == 0:
-        return [{
-            'type' : 'final_result',
-            'n' : 0,
-            'result' : 0,
-            'explanation' : 'Input is 0, returning 0 as output.'
-        }]
     
-    trace = []
+    With encoding='delta' the 'set_base_case' and 'iteration' events carry only the changed 'cell'
+    and a full 'table' keyframe is attached every 'keyframe_interval' iterations.
     
-    # Initialize DP table
-    dp = [0] * (n + 1)
+    With granularity='stride' the table is filled without per-cell events and one 'iteration_block' event
+    is traced per 'stride' entries, carrying them as 'spans' in the delta encoding with a keyframe every
+    'keyframe_interval' events.
     
-    # Trace Event: Initalize Table
-    trace.append({
-        'type': 'init_table',
-        'table': list(dp),
-        'explanation': f"Initialized a table of size {n + 1} with zeros."
-    })
+    With explanations='template' each 'explanation' is [template_id, *args] (see explanations.py).
+    '''
+    return tab_trace_iter(Fibonacci(n), encoding, keyframe_interval, explanations, granularity, stride)
+
+
+def fibonacci_tab_trace(n, encoding='full', keyframe_interval=DEFAULT_KEYFRAME_INTERVAL, explanations='text',
+                        granularity='cell', stride=DEFAULT_STRIDE):
+    '''
+    Returns the full trace of fibonacci_tab_trace_iter(n) as a list.
+    '''
+    return list(fibonacci_tab_trace_iter(n, encoding, keyframe_interval, explanations, granularity, stride))
+
+
+@register('fibonacci', 'fast_doubling')
+def fibonacci_fast_doubling_trace_iter(n, explanations='text', max_digits=DEFAULT_MAX_DIGITS):
+    '''
+    Computes the nth fibonacci number by fast doubling, in O(log n) big integer multiplications, and
+    generates an execution trace.
     
-    # base case
-    if n > 0:
-        dp[1] = 1
+    From F(k) and F(k + 1): F(2k) = F(k) * (2 * F(k + 1) - F(k)) and F(2k + 1) = F(k)^2 + F(k + 1)^2,
+    which is squaring the matrix [[1, 1], [1, 0]]^k without its redundant entry. Reading the bits of n from
+    the most significant one, every bit doubles k and a 1 bit adds one more.
     
-    # Trace Event: Set Base Case
-    trace.append({
-        'type': 'set_base_case',
-        'table': list(dp),
-        'explanation': 'Set base case table[1] = 1'    
-    })
+    Trace events for this function include:
+    - 'doubling_start' : n and its binary digits 'bits'.
+    - 'doubling_step' : After bit 'bit_index' (0 is the most significant) with value 'bit', the new 'k' with
+       F(k) as 'value' and F(k + 1) as 'next_value'.
+    - 'final_result' : F(n).
     
-    # Fill the table iteratively
+    Values of more than 'max_digits' digits are sent as {'digits', 'prefix', 'suffix'} (see summarize_int).
     
-    for i in range(2, n + 1):
-        dp[i] = dp[i - 1] + dp[i - 2]
-        # Trace Event: Set Base Case
-        trace.append({
-            'type': 'iteration',
-            'i' : i,
-            'table': list(dp),
-            'explanation': f'i = {i}: table[{i}] = table[{i - 1}] + table[{i - 2}] = {dp[i -1]} + {dp[i -2]} = dp{[i]}.'    
-        })
+    With explanations='template' each 'explanation' is [template_id, *args] (see explanations.py).
+    '''
+    if not isinstance(n, int) or n < 0:
+        raise ValueError('n must be a non-negative integer.')
+    explain = explainer(explanations)
+    bits = bin(n)[2:]
     
+    yield {
+        'type' : 'doubling_start',
+        'n' : n,
+        'bits' : bits,
+        'explanation' : explain('fib.doubling_start', n, bits, len(bits))
+    }
     
-    # Trace Event: Final Result
-    trace.append({
-        'type': 'final_result',
-        'table': list(dp),
-        'result' : dp[n],
-        'explanation': f'Final Result is table[{n}] = {dp[n]}.'    
-    })
+    k, a, b = 0, 0, 1  # a = F(k), b = F(k + 1)
+    for bit_index, bit in enumerate(bits):
+        a, b = a * (2 * b - a), a * a + b * b
+        k *= 2
+        if bit == '1':
+            a, b = b, a + b
+            k += 1
+        
+        value = summarize_int(a, max_digits)
+        yield {
+            'type' : 'doubling_step',
+            'bit_index' : bit_index,
+            'bit' : int(bit),
+            'k' : k,
+            'value' : value,
+            'next_value' : summarize_int(b, max_digits),
+            'explanation' : explain('fib.doubling_step', bit_index, bit, k, describe_int(value))
+        }
     
-    return trace
-    
\ No newline at end of file
+    # the last step already summarized F(n)
+    yield {
+        'type' : 'final_result',
+        'n' : n,
+        'result' : value,
+        'explanation' : explain('fib.doubling_result', n, describe_int(value))
+    }
+
+
+def fibonacci_fast_doubling_trace(n, explanations='text', max_digits=DEFAULT_MAX_DIGITS):
+    '''
+    Returns the full trace of fibonacci_fast_doubling_trace_iter(n) as a list.
+    '''
+    return list(fibonacci_fast_doubling_trace_iter(n, explanations, max_digits))
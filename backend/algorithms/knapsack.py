@@ -1,107 +1,245 @@
+from backend.algorithms.tracing import check_encoding, DEFAULT_KEYFRAME_INTERVAL, DEFAULT_STRIDE
+from backend.algorithms.explanations import explainer
+from backend.algorithms.dp import DPProblem, recursive_trace_iter, memo_trace_iter, tab_trace_iter
+from backend.algorithms.registry import register_problem, register, declare
 
-def knapsack_recursive_trace(weights, values, capacity):
+try:
+    import numpy as np
+except ImportError:  # optional, knapsack_solve() falls back to pure Python
+    np = None
+
+
+register_problem('knapsack', ('weights', 'values', 'capacity'))
+
+
+@declare('knapsack')
+class Knapsack(DPProblem):
     '''
-    Computes the 0/1 knapsack problem using pure recursion and generates an execution trace.
-    The trace captures the decision tree for each item, whether to include it or not.
-    Trace events for this function include:
-    - 'call' : When the function 'solve(index, capacity)' is called.
-    - 'base_case': When a base case (no items or capacity) is reached.
-    - 'decision' : When an item is skipped because its too heavy.
-    - 'decision_start' : Marks the beginning of exploring a branch
-    - 'decision_end' : Marks the end of exploring a branch.
-    - 'return' : When a function returns a value.
+    The 0/1 knapsack problem declared for the DP engine. A state (index, capacity) is the best value of
+    items 0..index within 'capacity': item 'index' is skipped when it is too heavy, otherwise it is the
+    better of leaving the item out and putting it in. The table's dp[i][w] is the best value of the first
+    i items within capacity w.
     '''
-    trace = []
-    n = len(weights)
-    
-    def solve(index, current_capacity, parent_id, depth):
-        #    Create a unique ID for this specific call
-        call_id = len(trace)
-        
-        # Trace Event: Function Call
-        trace.append({
-            'type': 'call',
-            'id': call_id,
-            'parent': parent_id,
-            'depth' : depth,
-            'index' : index,
-            'capacity' : current_capacity,
-            'explanation': f"Considering item {index} with capacity {current_capacity}."
-        })
-        
-        # Base case
-        if index < 0 or current_capacity <= 0:
-            # Trace Event: Base Case
-            trace.append({
+
+    column = 'w'
+
+    def __init__(self, weights, values, capacity):
+        self.weights = weights
+        self.values = values
+        self.capacity = capacity
+
+    def root(self):
+        return (len(self.weights) - 1, self.capacity)
+
+    def is_base(self, state):
+        index, capacity = state
+        return index < 0 or capacity <= 0
+
+    def base_value(self, state):
+        return 0
+
+    def subproblems(self, state):
+        index, capacity = state
+        if self.weights[index] > capacity:
+            return ((index - 1, capacity),)
+        return ((index - 1, capacity), (index - 1, capacity - self.weights[index]))
+
+    def combine(self, state, results):
+        if len(results) == 1:
+            return results[0]
+        return max(results[0], self.values[state[0]] + results[1])
+
+    def memoizes(self, state):
+        # Only the states that chose between two branches are cached, a skipped item just passes its value on
+        index, capacity = state
+        return not self.is_base(state) and self.weights[index] <= capacity
+
+    def call_fields(self, state):
+        index, capacity = state
+        return {'index' : index, 'capacity' : capacity}
+
+    def call_explanation(self, explain, state, memoized):
+        return explain('knapsack.memo_call' if memoized else 'knapsack.call', *state)
+
+    def base_step(self, explain, state, call_id, result):
+        return {
             'type': 'base_case',
             'id': call_id,
-            'result' : 0,
-            'explanation': "Base case reached (no more items or capacity)."
-            })
-            return 0
-        
-        # Item too heavy
-        if weights[index] > current_capacity:
+            'result' : result,
+            'explanation': explain('knapsack.base_case')
+        }
+
+    def expand_steps(self, explain, state, call_id):
+        index, capacity = state
+        if self.weights[index] > capacity:
             # Trace Event: Skip Decision
-            trace.append({
-            'type': 'decision',
-            'id': call_id,
-            'decision' : 'skip',
-            'explanation': f"Item {index} with weight {weights[index]} is too heavy and therefore skipped."
-            })
-    
-            result = solve(index - 1, current_capacity, call_id, depth + 1)
-        else:
-            # Don't include the current item
-            # Trace Event: Exclude Decision Start
-            trace.append({
-            'type': 'decision_start',
+            return ({
+                'type': 'decision',
+                'id': call_id,
+                'decision' : 'skip',
+                'explanation': explain('knapsack.skip', index, self.weights[index])
+            },)
+        
+        # Don't include the current item
+        # Trace Event: Exclude Decision Start
+        return ({'type': 'decision_start', 'id': call_id, 'branch' : 'exclude'},)
+
+    def child_steps(self, explain, state, call_id, results):
+        index, capacity = state
+        if self.weights[index] > capacity:
+            return ()
+        
+        if len(results) == 1:
+            # Trace Event: Exclude Decision End, then the Decision Start of including the current item
+            return (
+                {'type': 'decision_end', 'id': call_id, 'branch' : 'exclude', 'value' : results[0]},
+                {'type': 'decision_start', 'id': call_id, 'branch' : 'exclude'}
+            )
+        
+        # Trace Event: Include Decision End
+        value_with_item = self.values[index] + results[1]
+        return ({'type': 'decision_end', 'id': call_id, 'branch' : 'exclude', 'value' : value_with_item},)
+
+    def return_step(self, explain, state, call_id, results, result):
+        return {
+            'type': 'return',
             'id': call_id,
-            'branch' : 'exclude'
-            })
-            value_without_item = solve(index - 1, current_capacity, call_id, depth + 1)
-            # Trace Event: Exclude Decision End
-            trace.append({
-            'type': 'decision_end',
+            'result' : result,
+            'explanation': explain('knapsack.return', *state, result)
+        }
+
+    def cache_hit_step(self, explain, state, call_id, result):
+        return {
+            'type': 'cache_hit',
             'id': call_id,
-            'branch' : 'exclude',
-            'value' : value_without_item
-            })
-            
-            # Include the current item
-            # Trace Event: Exclude Decision Start
-            trace.append({
-            'type': 'decision_start',
+            'state': state,
+            'result' : result,
+            'explanation': explain('knapsack.cache_hit', *state)
+        }
+
+    def cache_miss_step(self, explain, state, call_id):
+        return {
+            'type': 'cache_miss',
             'id': call_id,
-            'branch' : 'exclude'
-            })
-            value_with_item = values[index] + solve(index - 1, current_capacity - weights[index], call_id, depth + 1)
-            # Trace Event: Exclude Decision End
-            trace.append({
-            'type': 'decision_end',
+            'state' : state,
+            'explanation': explain('knapsack.cache_miss', *state)
+        }
+
+    def store_step(self, explain, state, call_id, result):
+        return {
+            'type': 'store_result',
             'id': call_id,
-            'branch' : 'exclude',
-            'value' : value_with_item
-            })
+            'result' : result,
+            'explanation': explain('knapsack.store_result', *state)
+        }
+
+    def new_table(self):
+        # dp[i][w] will be the maximum value that can be obtained with the first i items and a knapsack capacity of 'w'.
+        return [[0 for _ in range(self.capacity + 1)] for _ in range(len(self.weights) + 1)]
+
+    def table_shape(self):
+        return (len(self.weights) + 1, self.capacity + 1)
+
+    def fill(self, dp, i, w):
+        item = i - 1
+        if self.weights[item] <= w:
+            dp[i][w] = max(dp[i - 1][w], self.values[item] + dp[i - 1][w - self.weights[item]])
+        else:
+            dp[i][w] = dp[i - 1][w]
+
+    def init_steps(self, explain, dp, delta):
+        # Trace Event: Initalize Table
+        yield {
+            'type': 'init_table',
+            'table': [row[:] for row in dp],  # Deep Copy of table
+            'explanation': explain('knapsack.init_table', len(dp), self.capacity + 1)
+        }
+
+    def iteration_explanation(self, explain, dp, cell):
+        i, w = cell
+        return explain('knapsack.iteration', i, w, dp[i][w])
+
+    def answer_steps(self, explain, dp):
+        weights = self.weights
+        n = len(weights)
+        capacity = self.capacity
+        
+        # Trace Event: Final Result
+        max_value = dp[n][capacity]
+        yield {
+            'type': 'final_result',
+            'table': [row[:] for row in dp],
+            'result' : max_value,
+            'explanation': explain('knapsack.final_result', max_value)
+        }
+        
+        included_items = []
+        w = capacity
+        for i in range(n, 0, -1):
+            yield {
+                'type': 'traceback_step',
+                'highlight' : {'row' : i, 'col' : w},
+                'explanation': explain('knapsack.traceback_step', i - 1)
+            }
             
-            result = max(value_without_item, value_with_item)
+            if dp[i][w] != dp[i - 1][w]:
+                item_index = i - 1
+                included_items.append(item_index)
+                w -= weights[item_index]
+                
+                # Trace Event: Item Included
+                yield {
+                    'type': 'item_included',
+                    'item_index' : item_index,
+                    'explanation': explain('knapsack.item_included', item_index, w)
+                }
         
-        # Trace Event: Return
-        trace.append({
-            'type': 'return',
-            'id': call_id,
-            'result' : result,
-            'explanation': f"Max Value for item {index} with capacity {current_capacity} is {result}."
-        })
-        return result
+        included_items.reverse()
+        
+        # Trace Event: Traceback Complete
+        yield {
+            'type': 'traceback_complete',
+            'included_items' : included_items,
+            'result' : max_value,
+            'explanation': explain('knapsack.traceback_complete', included_items)
+        }
+
+
+@register('knapsack', 'recursive')
+def knapsack_recursive_trace_iter(weights, values, capacity, explanations='text', dedup=False):
+    '''
+    Computes the 0/1 knapsack problem using pure recursion and generates an execution trace.
+    The trace captures the decision tree for each item, whether to include it or not.
+    The recursion runs on an explicit stack, so the number of items is not bounded by the recursion limit.
+    Trace events for this function include:
+    - 'call' : When the function 'solve(index, capacity)' is called.
+    - 'base_case': When a base case (no items or capacity) is reached.
+    - 'decision' : When an item is skipped because its too heavy.
+    - 'decision_start' : Marks the beginning of exploring a branch
+    - 'decision_end' : Marks the end of exploring a branch.
+    - 'return' : When a function returns a value.
+    - 'subtree_ref' : With dedup=True, a call to a state (index, capacity) after the first one, standing
+      for a copy of the first call's subtree (see expand_subtrees() in tracing.py).
     
-    solve(n - 1, capacity,  parent_id=None, depth=0)
-    return trace
+    With explanations='template' each 'explanation' is [template_id, *args] (see explanations.py).
+    '''
+    return recursive_trace_iter(Knapsack(weights, values, capacity), explanations, dedup)
+
+
+def knapsack_recursive_trace(weights, values, capacity, explanations='text', dedup=False):
+    '''
+    Returns the full trace of knapsack_recursive_trace_iter(weights, values, capacity) as a list.
+    '''
+    return list(knapsack_recursive_trace_iter(weights, values, capacity, explanations, dedup))
+
 
-def knapsack_memo_trace(weights, values, capacity):
+@register('knapsack', 'memoization')
+def knapsack_memo_trace_iter(weights, values, capacity, encoding='full', keyframe_interval=DEFAULT_KEYFRAME_INTERVAL,
+                             explanations='text'):
     '''
     Computes the 0/1 knapsack problem using pure recursion and generates an execution trace.
     The trace captures the decision tree for each item, whether to include it or not.
+    Calls are kept on an explicit stack, as in knapsack_recursive_trace_iter.
     
     Trace events for this function include:
     - 'call' : When a function 'fib(k)' is called.
@@ -110,127 +248,26 @@ def knapsack_memo_trace(weights, values, capacity):
     - 'store_result' : When a new result is stored in the cache.
     - 'base_case': When a base case is reached.
     - 'return' : When a function returns a value.
-    '''
-    trace = []
-    n = len(weights)
-    memo = {}
-    
-    def solve(index, current_capacity, parent_id, depth):
-        #  Create a unique ID for this specific call
-        call_id = len(trace)
-        state = (index, current_capacity)
-        
-        # Trace Event: Function Call
-        trace.append({
-            'type': 'call',
-            'id': call_id,
-            'parent': parent_id,
-            'depth' : depth,
-            'index' : index,
-            'capacity' : current_capacity,
-            'explanation': f"Considering item {index} with capacity {current_capacity}. Checking Cache"
-        })
-        
-        if state in memo:
-            # Trace Event: Function Call
-            trace.append({
-                'type': 'cache_hit',
-                'id': call_id,
-                'state': state,
-                'result' : memo[state],
-                'memo' : {str(k):v for k, v in memo.items()}, # make keys JSON Serializable for frontend
-                'explanation': f"Result for item {index} with capacity {current_capacity} found in cache."
-            })
-            return memo[state]
-        
-        # Trace Event: Cache Miss
-        trace.append({
-            'type': 'cache_miss',
-            'id': call_id,
-            'state' : state,
-            'explanation': f"Result for item {index} with capacity {current_capacity} not found in cache.. Proceeding to compute"
-        })
-        
-        # Base case
-        if index < 0 or current_capacity <= 0:
-            # Trace Event: Base Case
-            trace.append({
-            'type': 'base_case',
-            'id': call_id,
-            'result' : 0,
-            'explanation': "Base case reached (no more items or capacity)."
-            })
-            return 0
-        
-        # Item too heavy
-        if weights[index] > current_capacity:
-            # Trace Event: Skip Decision
-            trace.append({
-            'type': 'decision',
-            'id': call_id,
-            'decision' : 'skip',
-            'explanation': f"Item {index} with weight {weights[index]} is too heavy and therefore skipped."
-            })
     
-            result = solve(index - 1, current_capacity, call_id, depth + 1)
-        else:
-            # Don't include the current item
-            # Trace Event: Exclude Decision Start
-            trace.append({
-            'type': 'decision_start',
-            'id': call_id,
-            'branch' : 'exclude'
-            })
-            value_without_item = solve(index - 1, current_capacity, call_id, depth + 1)
-            # Trace Event: Exclude Decision End
-            trace.append({
-            'type': 'decision_end',
-            'id': call_id,
-            'branch' : 'exclude',
-            'value' : value_without_item
-            })
-            
-            # Include the current item
-            # Trace Event: Exclude Decision Start
-            trace.append({
-            'type': 'decision_start',
-            'id': call_id,
-            'branch' : 'exclude'
-            })
-            value_with_item = values[index] + solve(index - 1, current_capacity - weights[index], call_id, depth + 1)
-            # Trace Event: Exclude Decision End
-            trace.append({
-            'type': 'decision_end',
-            'id': call_id,
-            'branch' : 'exclude',
-            'value' : value_with_item
-            })
-            
-            result = max(value_without_item, value_with_item)
-            memo[state] = result
-            trace.append({
-            'type': 'store_result',
-            'id': call_id,
-            'result' : result,
-            'memo' : {str(k):v for k, v in memo.items()},
-            'explanation': f"Storing result for item {index} with capacity {current_capacity} in cache."
-        })
-        
-        # Trace Event: Return
-        trace.append({
-            'type': 'return',
-            'id': call_id,
-            'result' : result,
-            'explanation': f"Max Value for item {index} with capacity {current_capacity} is {result}."
-        })
-        return result
+    With encoding='delta' a 'store_result' carries only the new 'memo_entry' and a cache hit carries no
+    memo at all. A full 'memo' checkpoint is attached every 'keyframe_interval' stored entries.
     
-    solve(n - 1, capacity,  parent_id=None, depth=0)
-    return trace
+    With explanations='template' each 'explanation' is [template_id, *args] (see explanations.py).
+    '''
+    return memo_trace_iter(Knapsack(weights, values, capacity), encoding, keyframe_interval, explanations)
+
 
+def knapsack_memo_trace(weights, values, capacity, encoding='full', keyframe_interval=DEFAULT_KEYFRAME_INTERVAL,
+                        explanations='text'):
+    '''
+    Returns the full trace of knapsack_memo_trace_iter(weights, values, capacity) as a list.
+    '''
+    return list(knapsack_memo_trace_iter(weights, values, capacity, encoding, keyframe_interval, explanations))
 
 
-def knapsack_tab_trace(weights, values, capacity):
+@register('knapsack', 'tabulation')
+def knapsack_tab_trace_iter(weights, values, capacity, encoding='full', keyframe_interval=DEFAULT_KEYFRAME_INTERVAL,
+                            explanations='text', granularity='cell', stride=DEFAULT_STRIDE):
     '''
     Computes the 0/1 knapsack problem using tabulation and generates an execution trace.
     
@@ -243,86 +280,227 @@ def knapsack_tab_trace(weights, values, capacity):
     - 'item_included' : When traceback identifies an item in the optimal set
     - 'traceback_complete' : When the traceback is finished
     - 'final_result' : The final value extracted from the table.
+    
+    With encoding='delta' the 'iteration' events carry only the changed 'cell' and a full
+    'table' keyframe is attached every 'keyframe_interval' iterations.
+    
+    With granularity 'row', 'diagonal' or 'stride' the table is filled without per-cell events and one
+    'iteration_block' event is traced per row, anti-diagonal or 'stride' cells (see tracing.py).
+    
+    With explanations='template' each 'explanation' is [template_id, *args] (see explanations.py).
+    '''
+    return tab_trace_iter(Knapsack(weights, values, capacity), encoding, keyframe_interval, explanations, granularity,
+                          stride)
+
+
+def knapsack_tab_trace(weights, values, capacity, encoding='full', keyframe_interval=DEFAULT_KEYFRAME_INTERVAL,
+                       explanations='text', granularity='cell', stride=DEFAULT_STRIDE):
+    '''
+    Returns the full trace of knapsack_tab_trace_iter(weights, values, capacity) as a list.
+    '''
+    return list(knapsack_tab_trace_iter(weights, values, capacity, encoding, keyframe_interval, explanations,
+                                        granularity, stride))
+
+
+@register('knapsack', 'tabulation_1d')
+def knapsack_tab_1d_trace_iter(weights, values, capacity, encoding='full', keyframe_interval=DEFAULT_KEYFRAME_INTERVAL,
+                               explanations='text'):
     '''
+    Computes the 0/1 knapsack problem using tabulation over a single rolling row and generates an execution trace.
+    
+    dp[w] holds the best value for capacity 'w' with the items seen so far. Each item rewrites the row from
+    'capacity' down to its weight, so dp[w - weight] still holds the previous item's value when it is read.
+    Whether each cell took the item is kept as one bit per (item, capacity) instead of a full table of values,
+    which is all the traceback needs.
+    
+    Trace events for this function include:
+    - 'init_table' : When the rolling row is first created.
+    - 'iteration' : Updating dp[w] for item i, with the 'decision' ('include' or 'exclude') made.
+    - 'final_result' : The final value extracted from the row.
+    - 'traceback_step' : A step in traceback phase, 'highlight' is the decision bit read.
+    - 'item_included' : When traceback identifies an item in the optimal set
+    - 'traceback_complete' : When the traceback is finished
     
+    With encoding='delta' the 'iteration' events carry only the changed 'cell' and a full
+    'table' keyframe is attached every 'keyframe_interval' iterations.
+    
+    With explanations='template' each 'explanation' is [template_id, *args] (see explanations.py).
+    '''
+    
+    check_encoding(encoding, keyframe_interval)
+    explain = explainer(explanations)
+    delta = encoding == 'delta'
     n = len(weights)
-    trace = []
+    width = capacity + 1
+    cells_filled = 0
     
-    # Initialize DP table
-    # dp[i][w] will be the maximum value that can be obtained with the first i items and a knapsack capacity of 'w'.
-    dp = [[0 for _ in range(capacity + 1)] for _ in range(n + 1)]
+    dp = [0] * width
+    # bit (i - 1) * width + w is set when item i - 1 is included in the best value for capacity w
+    decisions = bytearray((n * width + 7) // 8)
     
     # Trace Event: Initalize Table
-    trace.append({
+    yield {
         'type': 'init_table',
-        'table': [row[:] for row in dp], # Deep Copy of table
-        'explanation': f"Initialized a {n + 1} x {capacity + 1} DP table with zeros."
-    })
-    
-    # Fill the table
+        'table': list(dp),
+        'explanation': explain('knapsack.init_row', width)
+    }
     
     for i in range(1, n + 1):
-        for w in range(1, capacity + 1):
-            prev_val = dp[i - 1][w]
-            current_item_index = i - 1
+        weight, value = weights[i - 1], values[i - 1]
+        row = (i - 1) * width
+        
+        # Reverse order, so every dp[w - weight] read is still from the previous item's row
+        for w in range(capacity, weight - 1, -1):
+            with_item = value + dp[w - weight]
+            include = with_item > dp[w]
+            if include:
+                dp[w] = with_item
+                bit = row + w
+                decisions[bit >> 3] |= 1 << (bit & 7)
             
-            if weights[current_item_index] <= w:
-                val_with_item = values[current_item_index] + dp[i - 1][w - weights[current_item_index]]
-                dp[i][w] = max(prev_val, val_with_item)
-            else:
-                dp[i][w] = prev_val
+            cells_filled += 1
             
             # Trace Event: Iteration
-            trace.append({
+            step = {
                 'type': 'iteration',
                 'i' : i,
                 'w' : w,
-                'table': [row[:] for row in dp],
+                'decision' : 'include' if include else 'exclude',
                 'highlight' : {'row' : i, 'col' : w},
-                'explanation': f'Calculated dp[{i}][{w}]= {dp[i][w]}.'    
-            })
+                'explanation': explain('knapsack.row_include' if include else 'knapsack.row_exclude', i - 1, w, dp[w])
+            }
+            if delta:
+                step['cell'] = {'index' : w, 'value' : dp[w]}
+            if not delta or cells_filled % keyframe_interval == 0:
+                step['table'] = list(dp)
+            yield step
     
-
-
     # Trace Event: Final Result
-    max_value = dp[n][capacity]
-    trace.append({
+    max_value = dp[capacity]
+    yield {
         'type': 'final_result',
-        'table': [row[:] for row in dp],
+        'table': list(dp),
         'result' : max_value,
-        'explanation': f'Table Complete. Max value is {max_value}. Starting Traceback to find included items.'    
-    })
+        'explanation': explain('knapsack.final_result', max_value)
+    }
     
     included_items = []
     w = capacity
     for i in range(n, 0, -1):
-        trace.append({
+        yield {
             'type': 'traceback_step',
             'highlight' : {'row' : i, 'col' : w},
-            'explanation': f"Checking if item {i - 1} was included."
-        })
+            'explanation': explain('knapsack.traceback_step', i - 1)
+        }
         
-        if dp[i][w] != dp[i - 1][w]:
+        bit = (i - 1) * width + w
+        if decisions[bit >> 3] >> (bit & 7) & 1:
             item_index = i - 1
             included_items.append(item_index)
             w -= weights[item_index]
             
             # Trace Event: Item Included
-            trace.append({
-            'type': 'item_included',
-            'item_index' : item_index,
-            'explanation': f"Item {item_index} was included. New capacity for traceback {w}"
-        })
+            yield {
+                'type': 'item_included',
+                'item_index' : item_index,
+                'explanation': explain('knapsack.item_included', item_index, w)
+            }
     
     included_items.reverse()
     
     # Trace Event: Traceback Complete
-    trace.append({
-            'type': 'traceback_complete',
-            'included_items' : included_items,
-            'result' : max_value,
-            'explanation': f"Traceback complete. Items {included_items} give max value"
-        })
+    yield {
+        'type': 'traceback_complete',
+        'included_items' : included_items,
+        'result' : max_value,
+        'explanation': explain('knapsack.traceback_complete', included_items)
+    }
+
+
+def knapsack_tab_1d_trace(weights, values, capacity, encoding='full', keyframe_interval=DEFAULT_KEYFRAME_INTERVAL,
+                          explanations='text'):
+    '''
+    Returns the full trace of knapsack_tab_1d_trace_iter(weights, values, capacity) as a list.
+    '''
+    return list(knapsack_tab_1d_trace_iter(weights, values, capacity, encoding, keyframe_interval, explanations))
+
+
+# Largest total value the NumPy solver's int64 row can hold
+INT64_MAX = 2 ** 63 - 1
+
+
+def _knapsack_solve_numpy(weights, values, capacity):
+    # Each item's row is one vectorized max over the previous row and a copy shifted by the item's weight.
+    # The take/skip decisions are kept as a packed bit matrix, one row of (capacity + 8) // 8 bytes per item.
+    dp = np.zeros(capacity + 1, dtype=np.int64)
+    decisions = np.zeros((len(weights), (capacity + 8) // 8), dtype=np.uint8)
+    take = np.zeros(capacity + 1, dtype=bool)
+    for item, (weight, value) in enumerate(zip(weights, values)):
+        if weight > capacity:
+            continue
+        with_item = dp[:capacity + 1 - weight] + value
+        take[:weight] = False
+        np.greater(with_item, dp[weight:], out=take[weight:])
+        decisions[item] = np.packbits(take)
+        np.maximum(dp[weight:], with_item, out=dp[weight:])
+    
+    included_items = []
+    w = capacity
+    for item in range(len(weights) - 1, -1, -1):
+        if decisions[item, w >> 3] >> (7 - (w & 7)) & 1:
+            included_items.append(item)
+            w -= weights[item]
+    included_items.reverse()
+    return int(dp[capacity]), included_items
+
+
+def _knapsack_solve_python(weights, values, capacity):
+    # Same rolling row, a row at a time with list comprehensions, one decision byte per cell
+    dp = [0] * (capacity + 1)
+    decisions = []
+    for weight, value in zip(weights, values):
+        if weight > capacity:
+            decisions.append(None)
+            continue
+        with_item = [below + value for below in dp[:capacity + 1 - weight]]
+        take = bytes(new > old for new, old in zip(with_item, dp[weight:]))
+        dp[weight:] = [new if taken else old for new, old, taken in zip(with_item, dp[weight:], take)]
+        decisions.append(take)
+    
+    included_items = []
+    w = capacity
+    for item in range(len(weights) - 1, -1, -1):
+        take = decisions[item]
+        if take is not None and w >= weights[item] and take[w - weights[item]]:
+            included_items.append(item)
+            w -= weights[item]
+    included_items.reverse()
+    return dp[capacity], included_items
+
+
+def knapsack_solve(weights, values, capacity):
+    '''
+    Solves the 0/1 knapsack problem without tracing it. Returns (max value, included item indices), the same
+    as knapsack_tab_trace's 'traceback_complete' step.
     
-    return trace
-    
\ No newline at end of file
+    Uses NumPy when it is installed and the values fit in int64, pure Python otherwise.
+    '''
+    if np is not None and sum(abs(value) for value in values) <= INT64_MAX:
+        return _knapsack_solve_numpy(weights, values, capacity)
+    return _knapsack_solve_python(weights, values, capacity)
+
+
+@register('knapsack', 'solve')
+def knapsack_solve_trace_iter(weights, values, capacity, explanations='text'):
+    '''
+    Solve-only mode: runs knapsack_solve() and yields a single 'traceback_complete' event with the 'result'
+    and 'included_items', for callers that need the answer but not the trace.
+    '''
+    explain = explainer(explanations)
+    max_value, included_items = knapsack_solve(weights, values, capacity)
+    yield {
+        'type': 'traceback_complete',
+        'included_items' : included_items,
+        'result' : max_value,
+        'explanation': explain('knapsack.traceback_complete', included_items)
+    }
@@ -1,159 +1,196 @@
-def lcs_recursive_trace(s1, s2):
+from backend.algorithms.tracing import DEFAULT_KEYFRAME_INTERVAL, DEFAULT_STRIDE
+from backend.algorithms.explanations import explainer
+from backend.algorithms.dp import DPProblem, recursive_trace_iter, memo_trace_iter, tab_trace_iter
+from backend.algorithms.registry import register_problem, register, declare
+
+
+register_problem('lcs', ('s1', 's2'))
+
+
+@declare('lcs')
+class LCS(DPProblem):
     '''
-    Finds the length of the longest common subsequence using pure recursion and generates an execution trace
-    
-    Trace events for this function include:
-    - 'call' : When the function 'solve(index, capacity)' is called.
-    - 'base_case': When a base case (no items or capacity) is reached.
-    - 'match' : When characters s1[i] and s2[j] are the same
-    - 'mismatch' : When characters do not match, initiated two recursive branches.
-    - 'return' : When a function returns a value.
+    The longest common subsequence declared for the DP engine. A state (i, j) is the LCS length of
+    s1[0..i] and s2[0..j]: one more than (i - 1, j - 1) when s1[i] and s2[j] match, otherwise the longer of
+    (i - 1, j) and (i, j - 1). The table's dp[i][j] is the LCS length of the first i and j characters.
     '''
-    
-    trace = []
-    
-    def solve(i, j, parent_id, depth):
-        call_id  = len(trace)
+
+    memo_returns = False
+
+    def __init__(self, s1, s2):
+        self.s1 = s1
+        self.s2 = s2
+
+    def root(self):
+        return (len(self.s1) - 1, len(self.s2) - 1)
+
+    def is_base(self, state):
+        i, j = state
+        return i < 0 or j < 0
+
+    def base_value(self, state):
+        return 0
+
+    def subproblems(self, state):
+        i, j = state
+        if self.s1[i] == self.s2[j]:
+            return ((i - 1, j - 1),)
+        return ((i - 1, j), (i, j - 1))
+
+    def combine(self, state, results):
+        if len(results) == 1:
+            return 1 + results[0]
+        return max(results)
+
+    def memoizes(self, state):
+        return not self.is_base(state)
+
+    def call_fields(self, state):
+        i, j = state
+        return {'i' : i, 'j' : j}
+
+    def call_explanation(self, explain, state, memoized):
+        return explain('lcs.memo_call' if memoized else 'lcs.call', *state)
+
+    def expand_steps(self, explain, state, call_id):
+        i, j = state
+        if self.s1[i] == self.s2[j]:
+            # Trace Event: Match
+            return ({'type' : 'match', 'id' : call_id, 'char' : self.s1[i]},)
+        # Trace Event: Mismatch
+        return ({'type' : 'mismatch', 'id' : call_id},)
+
+    def new_table(self):
+        return [[0 for _ in range(len(self.s2) + 1)] for _ in range(len(self.s1) + 1)]
+
+    def table_shape(self):
+        return (len(self.s1) + 1, len(self.s2) + 1)
+
+    def fill(self, dp, i, j):
+        if self.s1[i - 1] == self.s2[j - 1]:
+            dp[i][j] = 1 + dp[i - 1][j - 1]
+        else:
+            dp[i][j] = max(dp[i - 1][j], dp[i][j - 1])
+
+    def init_steps(self, explain, dp, delta):
+        # Trace Event: Initalize Table
+        yield {
+            'type': 'init_table',
+            'table': [row[:] for row in dp],  # Deep Copy of table
+            'explanation': explain('lcs.init_table', len(self.s1) + 1, len(self.s2) + 1)
+        }
+
+    def iteration_explanation(self, explain, dp, cell):
+        i, j = cell
+        if self.s1[i - 1] == self.s2[j - 1]:
+            return explain('lcs.match', i - 1, j - 1, self.s1[i - 1])
+        return explain('lcs.mismatch', i - 1, j, i, j - 1)
+
+    def answer_steps(self, explain, dp):
+        s1, s2 = self.s1, self.s2
+        m, n = len(s1), len(s2)
         
-        # Trace Event: Function Call
-        trace.append({
-            'type': 'call',
-            'id': call_id,
-            'parent': parent_id,
-            'depth' : depth,
-            'i' : i,
-            'j' : j,
-            'explanation': f"Comparing s1[{i}] with capacity s2[{j}]."
-        })
+        lcs_len = dp[m][n]
+        yield {
+            'type':  'final_result',
+            'result': lcs_len,
+            'table': [row[:] for row in dp],
+            'explanation' : explain('lcs.final_result', lcs_len)
+        }
         
-        # Base Case
-        if i < 0 or j < 0:
-            # Trace Event: Base Case
-            trace.append({
-                'type' : 'base_case',
-                'id' : call_id,
-                'result' : 0      
-            })
-            return 0
+        lcs_str = []
+        i, j = m, n
         
-        # Match Case
-        if s1[i] == s2[j]:
-            # Trace Event: Match
-            trace.append({
-                'type' : 'match',
-                'id' : call_id, 
-                'char' : s1[i]
-            })
-            result = 1 + solve(i - 1, j - 1, call_id, depth + 1)
+        while i > 0 and j > 0:
+            yield {
+                'type': 'traceback_step',
+                'highlight' : {'row' : i, 'col' : j},
+                'explanation': explain('lcs.traceback_step', i, j)
+            }
             
-        else:
-            # Trace Event: Mismatch
-            trace.append({'type' : 'mismatch', 'id' : call_id})
-            res1 = solve(i - 1, j, call_id, depth + 1)
-            res2 = solve(i, j - 1, call_id, depth + 1)
-            result = max(res1, res2)
-
-        trace.append({
-            'type' : 'return',
-            'id' : call_id,
-            'result' : result
-        })
+            if s1[i - 1] == s2[j - 1]:
+                lcs_str.append(s1[i - 1])
+                yield {
+                    'type': 'traceback_match',
+                    'char' : s1[i - 1],
+                    'explanation': explain('lcs.traceback_match', s1[i - 1])
+                }
+                i -= 1
+                j -= 1
+            
+            elif dp[i - 1][j] > dp[i][j - 1]:
+                i -= 1
+            
+            else:
+                j -= 1
         
-        return result
+        lcs_str.reverse()
+        result_str = "".join(lcs_str)
+        # Trace Event: Traceback Complete
+        yield {
+            'type': 'traceback_complete',
+            'result_length' : lcs_len,
+            'result' : result_str,
+            'explanation': explain('lcs.traceback_complete', result_str)
+        }
+
+
+@register('lcs', 'recursive')
+def lcs_recursive_trace_iter(s1, s2, explanations='text', dedup=False):
+    '''
+    Finds the length of the longest common subsequence using pure recursion and generates an execution trace
+    The recursion runs on an explicit stack, so long strings do not hit the recursion limit.
     
-    solve(len(s1) - 1, len(s2) - 1, parent_id=None, depth=0)
-    return trace
+    Trace events for this function include:
+    - 'call' : When the function 'solve(i, j)' is called.
+    - 'base_case': When a base case (either string used up) is reached.
+    - 'match' : When characters s1[i] and s2[j] are the same
+    - 'mismatch' : When characters do not match, initiated two recursive branches.
+    - 'return' : When a function returns a value.
+    - 'subtree_ref' : With dedup=True, a call to a state (i, j) after the first one, standing for a copy
+      of the first call's subtree (see expand_subtrees() in tracing.py).
     
+    With explanations='template' each 'explanation' is [template_id, *args] (see explanations.py).
+    '''
+    return recursive_trace_iter(LCS(s1, s2), explanations, dedup)
+
+
+def lcs_recursive_trace(s1, s2, explanations='text', dedup=False):
+    '''
+    Returns the full trace of lcs_recursive_trace_iter(s1, s2) as a list.
+    '''
+    return list(lcs_recursive_trace_iter(s1, s2, explanations, dedup))
+
 
-def lcs_memo_trace(s1, s2):
+@register('lcs', 'memoization')
+def lcs_memo_trace_iter(s1, s2, encoding='full', keyframe_interval=DEFAULT_KEYFRAME_INTERVAL, explanations='text'):
     '''
     Finds the length of the longest common subsequence using pure recursion and generates an execution trace
+    Calls are kept on an explicit stack, as in lcs_recursive_trace_iter.
     
     Trace events for this function include:
     - 'cache_hit' : When the result for the state (i, j) is found in the cache.
     - 'cache_miss' : When the result for the state (i, j) is not found in the cache.
     - 'store_result' : When a new result is stored in the cache.
-    '''
-    trace = []
-    memo = {}
     
-    def solve(i, j, parent_id, depth):
-        call_id  = len(trace)
-        state = (i, j)
-        
-        # Trace Event: Function Call
-        trace.append({
-            'type': 'call',
-            'id': call_id,
-            'parent': parent_id,
-            'depth' : depth,
-            'i' : i,
-            'j' : j,
-            'explanation': f"Comparing s1[{i}] with capacity s2[{j}]. Checking cache."
-        })
-        
-        # Checking Cache
-        if state in memo:
-        # Trace Event: Function Call
-            trace.append({
-                'type': 'cache_hit',
-                'id': call_id,
-                'state': state,
-                'result' : memo[state],
-                'memo' : {str(k):v for k, v in memo.items()}, # make keys JSON Serializable for frontend
-            })
-            return memo[state]
-        
-        # Trace Event: Mismatch
-        trace.append({
-            'type': 'cache_miss',
-            'id': call_id,
-            'state' : state,
-        })
-        
-        # Base Case
-        if i < 0 or j < 0:
-            trace.append({
-                'type' : 'base_case',
-                'id' : call_id,
-                'result' : 0      
-            })
-            return 0
-        
-        # Match Case
-        if s1[i] == s2[j]:
-            trace.append({
-                'type' : 'match',
-                'id' : call_id, 
-                'char' : s1[i]
-            })
-            result = 1 + solve(i - 1, j - 1, call_id, depth + 1)
-            
-        else:
-            # Trace Event: Mismatch
-            trace.append({'type' : 'mismatch', 'id' : call_id})
-            res1 = solve(i - 1, j, call_id, depth + 1)
-            res2 = solve(i, j - 1, call_id, depth + 1)
-            result = max(res1, res2)
-            
-        
-
-        memo[state] = result
-        trace.append({
-            'type': 'store_result',
-            'id': call_id,
-            'state': state,
-            'result' : result,
-            'memo' : {str(k):v for k, v in memo.items()}
-        })
-        
-        return result
+    With encoding='delta' a 'store_result' carries only the new 'memo_entry' and a cache hit carries no
+    memo at all. A full 'memo' checkpoint is attached every 'keyframe_interval' stored entries.
     
-    solve(len(s1) - 1, len(s2) - 1, parent_id=None, depth=0)
-    return trace
+    With explanations='template' each 'explanation' is [template_id, *args] (see explanations.py).
+    '''
+    return memo_trace_iter(LCS(s1, s2), encoding, keyframe_interval, explanations)
+
+
+def lcs_memo_trace(s1, s2, encoding='full', keyframe_interval=DEFAULT_KEYFRAME_INTERVAL, explanations='text'):
+    '''
+    Returns the full trace of lcs_memo_trace_iter(s1, s2) as a list.
+    '''
+    return list(lcs_memo_trace_iter(s1, s2, encoding, keyframe_interval, explanations))
 
 
-def lcs_tab_trace(s1, s2):
+@register('lcs', 'tabulation')
+def lcs_tab_trace_iter(s1, s2, encoding='full', keyframe_interval=DEFAULT_KEYFRAME_INTERVAL, explanations='text',
+                       granularity='cell', stride=DEFAULT_STRIDE):
     '''
     Finds the length of the longest common subsequence using tabulation and generates an execution trace
     
@@ -166,84 +203,225 @@ def lcs_tab_trace(s1, s2):
     - 'traceback_match' : When a common character is found in traceback.
     - 'traceback_complete' : When the traceback is finished.
     - 'final_result' : The final value extracted from the table.
+    
+    With encoding='delta' the 'iteration' events carry only the changed 'cell' and a full
+    'table' keyframe is attached every 'keyframe_interval' iterations.
+    
+    With granularity 'row', 'diagonal' or 'stride' the table is filled without per-cell events and one
+    'iteration_block' event is traced per row, anti-diagonal or 'stride' cells (see tracing.py).
+    
+    With explanations='template' each 'explanation' is [template_id, *args] (see explanations.py).
     '''
+    return tab_trace_iter(LCS(s1, s2), encoding, keyframe_interval, explanations, granularity, stride)
 
-    m, n = len(s1), len(s2)
-    trace = []
+
+def lcs_tab_trace(s1, s2, encoding='full', keyframe_interval=DEFAULT_KEYFRAME_INTERVAL, explanations='text',
+                  granularity='cell', stride=DEFAULT_STRIDE):
+    '''
+    Returns the full trace of lcs_tab_trace_iter(s1, s2) as a list.
+    '''
+    return list(lcs_tab_trace_iter(s1, s2, encoding, keyframe_interval, explanations, granularity, stride))
+
+
+def _score_row(a, b, i0, i1, j0, j1, backward=False):
+    '''
+    LCS lengths of a[i0:i1] against b[j0:j0 + k] for k = 0..j1 - j0, or against b[j1 - k:j1] when 'backward'
+    (both strings read from the end). Only one row is kept at a time.
+    '''
+    cols = b[j0:j1]
+    rows = a[i0:i1]
+    if backward:
+        cols, rows = cols[::-1], rows[::-1]
+    row = [0] * (len(cols) + 1)
+    for char in rows:
+        new_row = [0]
+        left = 0
+        for k, col_char in enumerate(cols):
+            if char == col_char:
+                left = row[k] + 1
+            elif row[k + 1] > left:
+                left = row[k + 1]
+            new_row.append(left)
+        row = new_row
+    return row
+
+
+@register('lcs', 'hirschberg')
+def lcs_hirschberg_trace_iter(s1, s2, explanations='text'):
+    '''
+    Finds a longest common subsequence with Hirschberg's divide and conquer in linear space, and generates
+    an execution trace.
     
-    dp = [[0 for _ in range(n + 1)] for _ in range(m + 1)]
+    The longer string is split in halves. A forward score row for the top half and a backward one for the
+    bottom half, each only as wide as the shorter string, give the column the LCS crosses the split at,
+    and both halves are solved the same way until a single row is left. Subproblems are kept on an explicit
+    stack, so memory stays O(min(m, n)) apart from the strings and the subsequence itself.
     
-    # Trace Event: Initalize Table
-    trace.append({
-        'type': 'init_table',
-        'table': [row[:] for row in dp], # Deep Copy of table
-        'explanation': f"Initialized a {m + 1} x {n + 1} DP table with zeros."
-    })
+    Trace events for this function include:
+    - 'hirschberg_start' : Which string is split ('row_string') and which one the score rows run over.
+    - 'hirschberg_split' : A subproblem rows [i0, i1) x cols [j0, j1) split at row 'mid' and column 'split',
+       with its 'forward' and 'backward' score rows (backward[k] is the score of the bottom half against
+       the columns from j0 + k on) and their best total 'score'.
+    - 'hirschberg_base' : A subproblem of at most one row, with the characters it adds to the subsequence.
+    - 'traceback_complete' : The subsequence found.
     
-    for i in range(1, m + 1):
-        for j in range(1, n + 1):
-            s1_char = s1[i - 1]
-            s2_char = s2[j - 1]
-            
-            if s1_char == s2_char:
-                dp[i][j] = 1 + dp[i - 1][j - 1]
-                explanation = f"Match! s1[{i - 1}] == s2[{j - 1}] ({s1_char}). Value is 1 + dp[{i - 1}][{j - 1}]."
-            else:
-                dp[i][j] = max(dp[i - 1][j], dp[i][j - 1])
-                explanation = f"Mismatch. Value is max(dp[{i - 1}][{j}], dp[{i}][{j - 1}])."
-                
-            # Trace Event: Iteration
-            trace.append({
-                'type': 'iteration',
-                'i' : i,
-                'j' : j,
-                'table': [row[:] for row in dp],
-                'highlight' : {'row' : i, 'col' : j},
-                'explanation': explanation   
-            })
-    
-    lcs_len = dp[m][n]
-    trace.append({
-        'type':  'final_result',
-        'result': lcs_len,
-        'table': [row[:] for row in dp],
-        'explanation' : f"Table complete. LCS length is {lcs_len}. Starting traceback."
-    })
-    
-    lcs_str = []
-    i, j = m, n
-    
-    while i > 0 and j > 0:
-        trace.append({
-        'type': 'traceback_step',
-        'highlight' : {'row' : i, 'col' : j},
-        'explanation': f"Tracing back from dp[{i}][{j}]."
-        })
+    'id' is the position of a subproblem's step in the trace and 'parent' that of the split it came from.
+    
+    With explanations='template' each 'explanation' is [template_id, *args] (see explanations.py).
+    '''
+    explain = explainer(explanations)
+    a, b, row_string, col_string = (s1, s2, 's1', 's2') if len(s1) >= len(s2) else (s2, s1, 's2', 's1')
+    
+    yield {
+        'type' : 'hirschberg_start',
+        'row_string' : row_string,
+        'rows' : len(a),
+        'cols' : len(b),
+        'explanation' : explain('lcs.hirschberg_start', row_string, len(a), col_string, len(b))
+    }
+    
+    position = 1
+    chars = []
+    # Each frame is (i0, i1, j0, j1, parent_id, depth). The right half is pushed first so the left one is
+    # solved first and the characters come out in order.
+    stack = [(0, len(a), 0, len(b), None, 0)]
+    while stack:
+        i0, i1, j0, j1, parent_id, depth = stack.pop()
         
-        if s1[i - 1] == s2[j - 1]:
-            lcs_str.append(s1[i - 1])
-            trace.append({
-            'type': 'traceback_match',
-            'char' : s1[i - 1],
-            'explanation': f"Found common character {s1[i - 1]}. Moving diagonally up towards the left."
-            })
-            i -= 1
-            j -= 1
+        if i1 - i0 <= 1 or j0 == j1:
+            found = a[i0] if i1 - i0 == 1 and j0 < j1 and a[i0] in b[j0:j1] else ''
+            chars.append(found)
+            yield {
+                'type' : 'hirschberg_base',
+                'id' : position,
+                'parent' : parent_id,
+                'depth' : depth,
+                'rows' : [i0, i1],
+                'cols' : [j0, j1],
+                'result' : found,
+                'explanation' : explain('lcs.hirschberg_base', i0, i1, j0, j1, found)
+            }
+            position += 1
+            continue
         
-        elif dp[i - 1][j] > dp[i][j - 1]:
-            i -= 1
+        mid = (i0 + i1) // 2
+        forward = _score_row(a, b, i0, mid, j0, j1)
+        backward = _score_row(a, b, mid, i1, j0, j1, backward=True)
+        backward.reverse()
+        scores = [top + bottom for top, bottom in zip(forward, backward)]
+        best = max(scores)
+        split = j0 + scores.index(best)
         
-        else:
-            j -= 1
+        yield {
+            'type' : 'hirschberg_split',
+            'id' : position,
+            'parent' : parent_id,
+            'depth' : depth,
+            'rows' : [i0, i1],
+            'cols' : [j0, j1],
+            'mid' : mid,
+            'split' : split,
+            'score' : best,
+            'forward' : forward,
+            'backward' : backward,
+            'explanation' : explain('lcs.hirschberg_split', i0, i1, mid, best, split)
+        }
+        stack.append((mid, i1, split, j1, position, depth + 1))
+        stack.append((i0, mid, j0, split, position, depth + 1))
+        position += 1
     
-    lcs_str.reverse()
-    result_str = "".join(lcs_str)
-    # Trace Event: Traceback Complete
-    trace.append({
+    result = ''.join(chars)
+    yield {
         'type': 'traceback_complete',
-        'result_length' : lcs_len,
-        'result' : result_str,
-        'explanation': f"Traceback complete. LCS is '{result_str}'"
-    })            
-    return trace
-         
\ No newline at end of file
+        'result_length' : len(result),
+        'result' : result,
+        'explanation': explain('lcs.traceback_complete', result)
+    }
+
+
+def lcs_hirschberg_trace(s1, s2, explanations='text'):
+    '''
+    Returns the full trace of lcs_hirschberg_trace_iter(s1, s2) as a list.
+    '''
+    return list(lcs_hirschberg_trace_iter(s1, s2, explanations))
+
+
+def _match_masks(b):
+    # For every character of b, an int with bit j set where b[j] is that character
+    masks = {}
+    for j, char in enumerate(b):
+        masks[char] = masks.get(char, 0) | 1 << j
+    return masks
+
+
+def lcs_length_bitparallel(s1, s2):
+    '''
+    Length of the longest common subsequence, computed bit-parallel (Allison-Dix / Hyyro): a whole row of
+    the DP table is one int with a bit per column of the shorter string, and each character of the longer
+    string updates it with a handful of big integer operations instead of a loop over the columns.
+    '''
+    a, b = (s1, s2) if len(s1) >= len(s2) else (s2, s1)
+    masks = _match_masks(b)
+    full = (1 << len(b)) - 1
+    row = full
+    for char in a:
+        matches = row & masks.get(char, 0)
+        row = ((row + matches) | (row - matches)) & full
+    return len(b) - row.bit_count()
+
+
+@register('lcs', 'bitparallel')
+def lcs_bitparallel_trace_iter(s1, s2, explanations='text'):
+    '''
+    Finds the length of the longest common subsequence with lcs_length_bitparallel() and generates a summary
+    trace: one event per row rather than per cell.
+    
+    Trace events for this function include:
+    - 'bitparallel_start' : The shorter string packed into per-character match 'masks' (hex, bit j for column j).
+    - 'bitparallel_row' : The row bit vector after character 'char' of the longer string, as hex 'bits'.
+       A 0 bit marks a column where the row's LCS length goes up, so 'length' is the number of 0 bits.
+    - 'final_result' : The LCS length.
+    
+    With explanations='template' each 'explanation' is [template_id, *args] (see explanations.py).
+    '''
+    explain = explainer(explanations)
+    a, b, row_string = (s1, s2, 's1') if len(s1) >= len(s2) else (s2, s1, 's2')
+    masks = _match_masks(b)
+    full = (1 << len(b)) - 1
+    
+    yield {
+        'type' : 'bitparallel_start',
+        'row_string' : row_string,
+        'rows' : len(a),
+        'cols' : len(b),
+        'masks' : {char : format(mask, 'x') for char, mask in masks.items()},
+        'explanation' : explain('lcs.bitparallel_start', len(b), len(masks))
+    }
+    
+    row = full
+    for i, char in enumerate(a):
+        matches = row & masks.get(char, 0)
+        row = ((row + matches) | (row - matches)) & full
+        length = len(b) - row.bit_count()
+        yield {
+            'type' : 'bitparallel_row',
+            'i' : i,
+            'char' : char,
+            'bits' : format(row, 'x'),
+            'length' : length,
+            'explanation' : explain('lcs.bitparallel_row', i, char, length)
+        }
+    
+    length = len(b) - row.bit_count()
+    yield {
+        'type' : 'final_result',
+        'result' : length,
+        'explanation' : explain('lcs.bitparallel_result', length)
+    }
+
+
+def lcs_bitparallel_trace(s1, s2, explanations='text'):
+    '''
+    Returns the full trace of lcs_bitparallel_trace_iter(s1, s2) as a list.
+    '''
+    return list(lcs_bitparallel_trace_iter(s1, s2, explanations))
@@ -0,0 +1,89 @@
+'''
+Registry of the problems that can be traced and the algorithms that trace them.
+
+Each algorithm module registers its problem with the request parameters its tracers take, and every tracer
+under its algorithm name (see register()). app.py looks tracers up here rather than in a hard-coded mapping,
+so adding a problem is a matter of declaring it (see dp.py) and registering its tracers. A problem's
+declaration is registered too (see declare()), which lets the cost model estimate it without an estimator
+written for it.
+'''
+
+
+class Problem:
+    '''
+    A registered problem: the request 'params' its tracers take as positional arguments, in order, its
+    tracer generators by algorithm name and its DPProblem 'declaration' class, if it has one.
+    '''
+
+    def __init__(self, name, params):
+        self.name = name
+        self.params = tuple(params)
+        self.algorithms = {}
+        self.declaration = None
+
+    def args(self, params):
+        '''
+        The positional arguments of the problem's tracers, taken from the request params.
+        '''
+        return tuple(params[name] for name in self.params)
+
+
+PROBLEMS = {}
+
+
+def register_problem(name, params):
+    '''
+    Registers a problem whose tracers take the request parameters 'params', and returns it.
+    '''
+    problem = PROBLEMS.get(name)
+    if problem is None:
+        problem = PROBLEMS[name] = Problem(name, params)
+    elif problem.params != tuple(params):
+        raise ValueError(f"Problem '{name}' is already registered with params {list(problem.params)}.")
+    return problem
+
+
+def register(problem, algorithm):
+    '''
+    Decorator registering a tracer generator as the 'algorithm' of a registered problem.
+    '''
+    def decorator(func):
+        PROBLEMS[problem].algorithms[algorithm] = func
+        return func
+    return decorator
+
+
+def declare(problem):
+    '''
+    Class decorator registering a DPProblem subclass as the declaration of a registered problem. It is
+    constructed from the same positional arguments as the problem's tracers.
+    '''
+    def decorator(cls):
+        PROBLEMS[problem].declaration = cls
+        return cls
+    return decorator
+
+
+def tracer_args(problem, params):
+    '''
+    The positional arguments of the problem's tracers. Raises a KeyError if the problem is unknown.
+    '''
+    return PROBLEMS[problem].args(params)
+
+
+def declaration(problem, params):
+    '''
+    The problem's declaration instantiated for the request params, or None if it has none. Raises a KeyError
+    if the problem is unknown.
+    '''
+    registered = PROBLEMS[problem]
+    if registered.declaration is None:
+        return None
+    return registered.declaration(*registered.args(params))
+
+
+def algorithm_mapping():
+    '''
+    Every registered problem's tracers by algorithm name: {problem : {algorithm : tracer}}.
+    '''
+    return {name : problem.algorithms for name, problem in PROBLEMS.items()}
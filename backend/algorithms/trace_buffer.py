@@ -0,0 +1,179 @@
+'''
+Compact, column based storage for execution traces.
+
+A trace kept as a list of dicts pays for a dict and a set of repeated string keys on every step.
+TraceBuffer instead stores the event type as a small integer code and the common integer fields
+(id, parent, depth, ...) in typed arrays, one column per field. Step dicts are only built again
+when a step is read back, e.g. just before it is emitted to the client.
+'''
+import sys
+from array import array
+
+
+# Event types used by the tracers, each stored as its position in this tuple.
+# Types not listed here still work, they are given the next free code when first appended.
+EVENT_TYPES = (
+    'call', 'base_case', 'return',
+    'cache-hit', 'cache-miss', 'cache_hit', 'cache_miss', 'store_result',
+    'decision', 'decision_start', 'decision_end', 'match', 'mismatch',
+    'init_table', 'set_base_case', 'iteration', 'final_result',
+    'traceback_step', 'traceback_match', 'item_included', 'traceback_complete',
+)
+
+# Integer fields that get their own array column
+INT_FIELDS = ('id', 'parent', 'depth', 'n', 'i', 'j', 'w', 'index', 'capacity', 'result')
+
+# Stored in a column to mean the field was present with a value of None (e.g. the root call's parent)
+NULL = -2 ** 63
+INT_MAX = 2 ** 63 - 1
+
+
+def _sizeof(value):
+    '''
+    Approximate memory used by a value, including the lists, tuples and dicts nested in it.
+    '''
+    size = sys.getsizeof(value)
+    if isinstance(value, dict):
+        size += sum(_sizeof(k) + _sizeof(v) for k, v in value.items())
+    elif isinstance(value, (list, tuple)):
+        size += sum(_sizeof(item) for item in value)
+    return size
+
+
+class TraceBuffer:
+    '''
+    Append-only trace storage with array backed columns.
+
+    Steps go in as dicts through append()/extend() and come back out as equal dicts through
+    indexing or iteration. Fields that don't fit a column (explanations, tables, memos, strings,
+    integers too large for 64 bits) are kept per step alongside the columns.
+    '''
+
+    def __init__(self, steps=None):
+        self.event_types = list(EVENT_TYPES)
+        self._type_codes = {name : code for code, name in enumerate(self.event_types)}
+
+        self._types = array('H')
+        self._present = array('H')  # bit k is set when INT_FIELDS[k] is present in the step
+        self._columns = {field : array('q') for field in INT_FIELDS}
+        self._explanations = []
+        self._extras = {}  # step index -> dict of fields without a column
+        self._object_bytes = 0
+
+        if steps is not None:
+            self.extend(steps)
+
+    def append(self, step):
+        index = len(self._types)
+        step_type = step.get('type')
+        code = self._type_codes.get(step_type)
+        if code is None:
+            code = len(self.event_types)
+            self.event_types.append(step_type)
+            self._type_codes[step_type] = code
+        self._types.append(code)
+
+        present = 0
+        extras = None
+        for bit, field in enumerate(INT_FIELDS):
+            column = self._columns[field]
+            if field not in step:
+                column.append(0)
+                continue
+
+            value = step[field]
+            if value is None:
+                column.append(NULL)
+            elif type(value) is int and NULL < value <= INT_MAX:
+                column.append(value)
+            else:
+                # doesn't fit the column, keep it with the other extras
+                column.append(0)
+                extras = extras or {}
+                extras[field] = value
+                continue
+            present |= 1 << bit
+        self._present.append(present)
+
+        explanation = step.get('explanation')
+        self._explanations.append(explanation)
+        if explanation is not None:
+            self._object_bytes += sys.getsizeof(explanation)
+
+        for key, value in step.items():
+            if key == 'type' or key == 'explanation' or key in self._columns:
+                continue
+            extras = extras or {}
+            extras[key] = value
+        if extras:
+            self._extras[index] = extras
+            self._object_bytes += _sizeof(extras)
+
+    def extend(self, steps):
+        for step in steps:
+            self.append(step)
+
+    def step(self, index):
+        '''
+        Builds the dict for the step at 'index'.
+        '''
+        step = {'type' : self.event_types[self._types[index]]}
+        present = self._present[index]
+        if present:
+            for bit, field in enumerate(INT_FIELDS):
+                if present & (1 << bit):
+                    value = self._columns[field][index]
+                    step[field] = None if value == NULL else value
+
+        extras = self._extras.get(index)
+        if extras:
+            step.update(extras)
+        if self._explanations[index] is not None:
+            step['explanation'] = self._explanations[index]
+        return step
+
+    def type_code(self, index):
+        '''
+        Integer code of the step's event type, see event_types for the names.
+        '''
+        return self._types[index]
+
+    def indexes_with(self, field):
+        '''
+        Sorted indexes of the steps that have 'field', found without building any step dicts.
+        '''
+        if field in self._columns:
+            flag = 1 << INT_FIELDS.index(field)
+            in_column = [index for index, present in enumerate(self._present) if present & flag]
+            return sorted(set(in_column).union(index for index, extras in self._extras.items() if field in extras))
+        if field == 'explanation':
+            return [index for index, explanation in enumerate(self._explanations) if explanation is not None]
+        return [index for index, extras in self._extras.items() if field in extras]
+
+    def nbytes(self):
+        '''
+        Approximate number of bytes held by the buffer: the array columns plus the explanations and extra fields.
+        '''
+        array_bytes = sum(column.itemsize * len(column) for column in self._columns.values())
+        array_bytes += self._types.itemsize * len(self._types) + self._present.itemsize * len(self._present)
+        container_bytes = sys.getsizeof(self._explanations) + sys.getsizeof(self._extras)
+        return array_bytes + container_bytes + self._object_bytes
+
+    def clear(self):
+        self.__init__()
+
+    def __len__(self):
+        return len(self._types)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self.step(k) for k in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError('TraceBuffer index out of range')
+        return self.step(index)
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self.step(index)
@@ -0,0 +1,500 @@
+'''
+Shared helpers used by the algorithm tracers.
+'''
+import decimal
+import math
+from bisect import bisect_right
+
+
+class StepCounter:
+    '''
+    Keeps count of how many steps a trace generator has produced so far.
+
+    The tracers give every call the id of its 'call' event's position in the trace,
+    which used to be read off as len(trace). Generators don't keep the trace around, so
+    the count is tracked here instead.
+    '''
+
+    def __init__(self):
+        self.count = 0
+
+
+def counted(steps, counter):
+    '''
+    Re-yields every step from 'steps', bumping 'counter' before the step leaves the generator.
+    '''
+    for step in steps:
+        counter.count += 1
+        yield step
+
+
+# SUBTREE DEDUPLICATION
+# A recursive tracer run with dedup=True traces the subtree of each distinct state in full only the first
+# time. A later call to the same state is sent as one 'subtree_ref' step that stands for a copy of that
+# subtree, so the trace grows with the number of distinct states rather than the number of calls. The ids
+# in the copy are the original's plus 'id_offset' (= id - ref): they are the ids the steps would have had
+# without deduplication, so ids still count steps of the full trace. expand_subtrees() rebuilds it.
+
+def check_dedup(dedup):
+    '''
+    Raises a ValueError unless dedup is True or False.
+    '''
+    if not isinstance(dedup, bool):
+        raise ValueError('dedup must be true or false.')
+
+
+class SubtreeIndex:
+    '''
+    Where the subtree of each finished state was first traced: state -> (id of its call, its number of
+    steps, its result).
+    '''
+
+    def __init__(self, counter):
+        self.counter = counter
+        self._subtrees = {}
+
+    def __contains__(self, state):
+        return state in self._subtrees
+
+    def finished(self, state, call_id, result):
+        '''
+        Records a state's subtree. Must be called once its last step has been yielded.
+        '''
+        if state not in self._subtrees:
+            self._subtrees[state] = (call_id, self.counter.count - call_id, result)
+
+    def reference(self, state, parent_id, depth, fields, explain):
+        '''
+        The 'subtree_ref' step for a repeated call to a finished state. 'fields' are the call's own
+        fields ('n', 'index' and 'capacity', ...).
+        '''
+        first_id, length, result = self._subtrees[state]
+        call_id = self.counter.count
+        step = {'type' : 'subtree_ref', 'id' : call_id, 'parent' : parent_id, 'depth' : depth}
+        step.update(fields)
+        step.update({
+            'ref' : first_id,
+            'id_offset' : call_id - first_id,
+            'length' : length,
+            'result' : result,
+            'explanation' : explain('subtree_ref', call_id, first_id, length, result)
+        })
+        return step
+
+    def skip(self, step):
+        '''
+        Moves the step count past the steps a yielded 'subtree_ref' stands for.
+        '''
+        self.counter.count += step['length'] - 1
+
+
+def expand_subtrees(steps):
+    '''
+    Yields the full trace of a trace recorded with dedup=True: every 'subtree_ref' is replaced by a copy
+    of the subtree it refers to, with the ids shifted by its offset, the depths shifted to the reference's
+    and the copy's root attached to the reference's parent. Only the compressed steps are kept around.
+    '''
+    compressed = []
+    positions = {}  # call id -> position in compressed
+    for step in steps:
+        if step['type'] == 'call':
+            positions[step['id']] = len(compressed)
+        compressed.append(step)
+        if step['type'] == 'subtree_ref':
+            yield from _copy_subtree(compressed, positions, step)
+        else:
+            yield step
+
+
+def _copy_subtree(compressed, positions, ref):
+    # Each entry is [position of the next step to copy, position of the root, steps left to copy,
+    # id offset, depth shift, parent of the root]. References inside a copy push a copy of their own.
+    def entry(ref_id, call_id, parent_id, depth, length):
+        root = positions[ref_id]
+        return [root, root, length, call_id - ref_id, depth - compressed[root]['depth'], parent_id]
+
+    stack = [entry(ref['ref'], ref['id'], ref['parent'], ref['depth'], ref['length'])]
+    while stack:
+        current = stack[-1]
+        position, root, left, offset, depth_shift, parent_id = current
+        if left <= 0:
+            stack.pop()
+            continue
+        step = compressed[position]
+        current[0] += 1
+
+        if step['type'] == 'subtree_ref':
+            current[2] -= step['length']
+            stack.append(entry(step['ref'], step['id'] + offset, step['parent'] + offset, step['depth'] + depth_shift,
+                               step['length']))
+            continue
+
+        current[2] -= 1
+        step = dict(step)
+        step['id'] += offset
+        if 'parent' in step:
+            step['parent'] = parent_id if position == root else step['parent'] + offset
+        if 'depth' in step:
+            step['depth'] += depth_shift
+        yield step
+
+
+# TABLE AND MEMO ENCODING
+# 'full' attaches a copy of the whole DP table or memo to every event that shows it (the original behaviour).
+# 'delta' only attaches what changed: the 'cell' written by a tabulation step or the 'memo_entry' stored
+# by a memoized call. A full copy (a keyframe) is attached every 'keyframe_interval' cells or memo
+# entries so any snapshot can be rebuilt without replaying the whole trace.
+
+ENCODINGS = ('full', 'delta')
+DEFAULT_KEYFRAME_INTERVAL = 64
+
+# Memo trace events that carry the full memo in the 'full' encoding
+MEMO_EVENT_TYPES = ('cache-hit', 'cache_hit', 'store_result')
+
+
+def check_encoding(encoding, keyframe_interval):
+    '''
+    Raises a ValueError for an unknown encoding or a keyframe interval below 1.
+    '''
+    if encoding not in ENCODINGS:
+        raise ValueError(f"Unknown encoding '{encoding}'. Expected one of {list(ENCODINGS)}.")
+    if keyframe_interval < 1:
+        raise ValueError('keyframe_interval must be at least 1.')
+
+
+# TABULATION GRANULARITY
+# 'cell' traces every cell of the DP table as its own 'iteration' event (the original behaviour). The coarser
+# granularities fill the table without per-cell events and trace one 'iteration_block' event per unit:
+# 'row' per row, 'diagonal' per anti-diagonal (i + j constant, filled top right to bottom left) and
+# 'stride' per 'stride' cells in row order. A block carries the cells it filled as 'spans' in the delta
+# encoding, and the whole 'table' in the full one. Keyframes are counted in blocks rather than cells.
+
+GRANULARITIES = ('cell', 'row', 'diagonal', 'stride')
+DEFAULT_STRIDE = 16
+
+
+def check_granularity(granularity, stride, dimensions=2):
+    '''
+    Raises a ValueError for an unknown granularity, one a 1D table can't be traced at, or a stride below 1.
+    '''
+    if granularity not in GRANULARITIES:
+        raise ValueError(f"Unknown granularity '{granularity}'. Expected one of {list(GRANULARITIES)}.")
+    if dimensions == 1 and granularity in ('row', 'diagonal'):
+        raise ValueError(f"granularity '{granularity}' needs a 2D table, use 'cell' or 'stride'.")
+    if isinstance(stride, bool) or not isinstance(stride, int) or stride < 1:
+        raise ValueError('stride must be an integer of at least 1.')
+
+
+def table_blocks(rows, cols, granularity, stride=DEFAULT_STRIDE):
+    '''
+    Groups the cells in rows 1..rows and columns 1..cols of a 2D table (row and column 0 hold the base
+    cases) into the blocks a coarse granularity traces as one event, in the order they are filled.
+    Each block is a list of spans (row, col, length, diagonal): 'length' cells starting at (row, col) and
+    going right, or down and to the left when diagonal.
+    '''
+    if rows < 1 or cols < 1:
+        return
+    if granularity == 'row':
+        for row in range(1, rows + 1):
+            yield [(row, 1, cols, False)]
+    elif granularity == 'diagonal':
+        for diagonal in range(2, rows + cols + 1):
+            first = max(1, diagonal - cols)
+            last = min(rows, diagonal - 1)
+            yield [(first, diagonal - first, last - first + 1, True)]
+    else:
+        block, size = [], 0
+        for row in range(1, rows + 1):
+            col = 1
+            while col <= cols:
+                length = min(cols - col + 1, stride - size)
+                block.append((row, col, length, False))
+                size += length
+                col += length
+                if size == stride:
+                    yield block
+                    block, size = [], 0
+        if block:
+            yield block
+
+
+def block_steps(dp, granularity, stride, fill, delta, keyframe_interval, explain, column='j'):
+    '''
+    Fills the inner cells of a 2D DP table block by block, fill(i, j) computing one cell, and yields one
+    'iteration_block' event per block of table_blocks(). 'column' names the column index field ('w' for
+    knapsack). In the delta encoding a full 'table' keyframe goes with every 'keyframe_interval'th block.
+    '''
+    blocks = 0
+    for spans in table_blocks(len(dp) - 1, len(dp[0]) - 1, granularity, stride):
+        blocks += 1
+        count = 0
+        for row, col, length, diagonal in spans:
+            if diagonal:
+                for offset in range(length):
+                    fill(row + offset, col - offset)
+            else:
+                for j in range(col, col + length):
+                    fill(row, j)
+            count += length
+
+        row, col, length, diagonal = spans[-1]
+        i, j = (row + length - 1, col - length + 1) if diagonal else (row, col + length - 1)
+        if granularity == 'row':
+            explanation = explain('table.fill_row', i, count)
+        elif granularity == 'diagonal':
+            explanation = explain('table.fill_diagonal', i + j, count)
+        else:
+            explanation = explain('table.fill_cells', count, i, j, dp[i][j])
+
+        step = {
+            'type' : 'iteration_block',
+            'unit' : granularity,
+            'i' : i,
+            column : j,
+            'count' : count,
+            'highlight' : {'row' : i, 'col' : j},
+            'explanation' : explanation
+        }
+        if delta:
+            step['spans'] = [span_values(dp, span) for span in spans]
+        if not delta or blocks % keyframe_interval == 0:
+            step['table'] = [row[:] for row in dp]
+        yield step
+
+
+def span_values(table, span):
+    '''
+    The delta of a span of table_blocks(): {'row', 'col', 'values'}, plus 'diagonal' : True for a diagonal.
+    '''
+    row, col, length, diagonal = span
+    if diagonal:
+        return {'row' : row, 'col' : col, 'values' : [table[row + offset][col - offset] for offset in range(length)],
+                'diagonal' : True}
+    return {'row' : row, 'col' : col, 'values' : table[row][col:col + length]}
+
+
+def apply_span(table, span):
+    '''
+    Writes a delta span into the table. 2D spans start at 'row'/'col', 1D spans at 'index'.
+    '''
+    values = span['values']
+    if 'index' in span:
+        table[span['index']:span['index'] + len(values)] = values
+    elif span.get('diagonal'):
+        row, col = span['row'], span['col']
+        for offset, value in enumerate(values):
+            table[row + offset][col - offset] = value
+    else:
+        table[span['row']][span['col']:span['col'] + len(values)] = values
+
+
+def copy_table(table):
+    '''
+    Copies a 1D or 2D DP table.
+    '''
+    if table and isinstance(table[0], list):
+        return [row[:] for row in table]
+    return list(table)
+
+
+def apply_cell(table, cell):
+    '''
+    Writes a delta 'cell' into the table. 2D tables use 'row'/'col', 1D tables use 'index'.
+    '''
+    if 'index' in cell:
+        table[cell['index']] = cell['value']
+    else:
+        table[cell['row']][cell['col']] = cell['value']
+
+
+def expand_table_deltas(steps):
+    '''
+    Turns a delta encoded trace back into the 'full' encoding, giving every step that carries a
+    'cell' (or 'spans') its own copy of the table. Steps are yielded one at a time so large traces can be
+    expanded lazily.
+    '''
+    table = None
+    for step in steps:
+        if 'table' in step:
+            table = copy_table(step['table'])
+        if 'cell' in step or 'spans' in step:
+            step = dict(step)
+            cell = step.pop('cell', None)
+            spans = step.pop('spans', ())
+            if 'table' not in step:
+                if cell is not None:
+                    apply_cell(table, cell)
+                for span in spans:
+                    apply_span(table, span)
+                step['table'] = copy_table(table)
+        yield step
+
+
+def keyframe_positions(steps, field):
+    '''
+    Sorted indexes of the steps that carry 'field' ('table' or 'memo'), for table_at() and memo_at().
+    Uses the trace's own index when it has one (see TraceBuffer.indexes_with), otherwise scans every step.
+    '''
+    indexes_with = getattr(steps, 'indexes_with', None)
+    if indexes_with is not None:
+        return indexes_with(field)
+    return [index for index in range(len(steps)) if field in steps[index]]
+
+
+def _keyframe_before(steps, k, field, keyframes):
+    # index of the last step at or before k that carries 'field', or -1
+    if keyframes is not None:
+        position = bisect_right(keyframes, k) - 1
+        return keyframes[position] if position >= 0 else -1
+    start = k
+    while start >= 0 and field not in steps[start]:
+        start -= 1
+    return start
+
+
+def table_at(steps, k, keyframes=None):
+    '''
+    Rebuilds the DP table as it was at step k of a delta (or full) encoded trace.
+    
+    Walks back to the nearest keyframe and replays the cells after it, so the cost is bounded by the
+    keyframe interval rather than by k. Passing the keyframe_positions() of the trace finds the keyframe
+    with a binary search instead of walking back. Returns None if no table exists yet at step k.
+    '''
+    start = _keyframe_before(steps, k, 'table', keyframes)
+    if start < 0:
+        return None
+    
+    table = copy_table(steps[start]['table'])
+    for index in range(start + 1, k + 1):
+        step = steps[index]
+        if 'cell' in step:
+            apply_cell(table, step['cell'])
+        for span in step.get('spans', ()):
+            apply_span(table, span)
+    return table
+
+
+def expand_memo_deltas(steps):
+    '''
+    Turns a delta encoded memo trace back into the 'full' encoding, giving every cache hit and
+    stored result its own copy of the memo. Steps are yielded one at a time.
+    '''
+    memo = {}
+    for step in steps:
+        if 'memo' in step:
+            memo = dict(step['memo'])
+        if 'memo_entry' in step:
+            step = dict(step)
+            entry = step.pop('memo_entry')
+            memo[entry['key']] = entry['value']
+        if step.get('type') in MEMO_EVENT_TYPES and 'memo' not in step:
+            step = dict(step)
+            step['memo'] = dict(memo)
+        yield step
+
+
+def memo_at(steps, k, keyframes=None):
+    '''
+    Rebuilds the memo as it was at step k of a delta (or full) encoded trace, starting from the
+    nearest checkpoint at or before k (found by binary search when 'keyframes' is given).
+    '''
+    start = _keyframe_before(steps, k, 'memo', keyframes)
+    
+    memo = dict(steps[start]['memo']) if start >= 0 else {}
+    for index in range(start + 1, k + 1):
+        step = steps[index]
+        if 'memo_entry' in step:
+            entry = step['memo_entry']
+            memo[entry['key']] = entry['value']
+    return memo
+
+
+def expand_deltas(steps):
+    '''
+    Restores the 'full' encoding of any delta encoded trace, tables and memos alike.
+    '''
+    return expand_memo_deltas(expand_table_deltas(steps))
+
+
+# LARGE VALUES
+# Values like F(n) for a large n have far too many digits to send on every step (and Python won't even
+# turn an int of more than 4300 digits into a string by default). Above 'max_digits' digits they are
+# sent as {'digits', 'prefix', 'suffix'} instead, the digit count and the first and last few digits.
+
+DEFAULT_MAX_DIGITS = 40
+SUMMARY_DIGITS = 10
+
+# Digit counts and leading digits are read off an approximation of the value to this many significant digits
+APPROXIMATION_DIGITS = 50
+APPROXIMATION_GUARD = 10
+
+
+def _approximate(value):
+    # Powers of 10 as large as the value take time to work out and dividing by them takes time quadratic in
+    # the digits, so large values are looked at through their top bits times a power of 2, worked out to
+    # APPROXIMATION_DIGITS significant digits. Returns (the significant digits, the exponent of the first)
+    # or None for a value small enough to work with exactly.
+    shift = max(value.bit_length() - 4 * APPROXIMATION_DIGITS, 0)
+    if not shift:
+        return None
+    with decimal.localcontext() as context:
+        context.prec = APPROXIMATION_DIGITS
+        context.Emax = decimal.MAX_EMAX
+        approximation = decimal.Decimal(value >> shift) * decimal.Decimal(2) ** shift
+    return ''.join(map(str, approximation.as_tuple().digits)), approximation.adjusted()
+
+
+def _settled(digits):
+    # Whether the rounding error of an approximation, a few units in its last places, can't carry past these
+    # trailing significant digits into the ones before them, which it could if they were all 0s or all 9s
+    digits = digits[:-APPROXIMATION_GUARD]
+    return bool(digits.strip('0')) and bool(digits.strip('9'))
+
+
+def digit_count(value):
+    '''
+    Number of decimal digits of a non-negative int, without converting it to a string.
+    '''
+    if value == 0:
+        return 1
+    approximation = _approximate(value)
+    if approximation is not None and _settled(approximation[0][1:]):
+        return approximation[1] + 1
+    digits = int(value.bit_length() * math.log10(2)) + 1
+    if value < 10 ** (digits - 1):
+        digits -= 1
+    return digits
+
+
+def summarize_int(value, max_digits=DEFAULT_MAX_DIGITS):
+    '''
+    The value itself if it has at most 'max_digits' digits, otherwise {'digits', 'prefix', 'suffix'} with
+    SUMMARY_DIGITS leading and trailing digits as strings.
+    '''
+    digits = digit_count(value)
+    if digits <= max_digits:
+        return value
+    return {
+        'digits' : digits,
+        'prefix' : _leading_digits(value, digits),
+        'suffix' : str(value % 10 ** SUMMARY_DIGITS).zfill(SUMMARY_DIGITS)
+    }
+
+
+def _leading_digits(value, digits):
+    # The first SUMMARY_DIGITS digits of a value with 'digits' digits, approximated unless a carry could reach them
+    approximation = _approximate(value)
+    if approximation is not None:
+        significant, exponent = approximation
+        if exponent == digits - 1 and _settled(significant[SUMMARY_DIGITS:]):
+            return significant[:SUMMARY_DIGITS]
+    return str(value // 10 ** (digits - SUMMARY_DIGITS))
+
+
+def describe_int(summary):
+    '''
+    Text for a summarize_int() result, for explanations.
+    '''
+    if isinstance(summary, dict):
+        return f"{summary['prefix']}...{summary['suffix']} ({summary['digits']} digits)"
+    return summary
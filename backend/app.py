@@ -1,10 +1,28 @@
-from flask import Flask
+import json
+import os
+import tempfile
+import uuid
+
+from flask import Flask, request
 from flask_socketio import SocketIO, emit
 from flask_cors import CORS
 
-from backend.algorithms.fibonacci import fibonacci_recursive_trace, fibonacci_memo_trace, fibonacci_tab_trace
-from backend.algorithms.knapsack import knapsack_recursive_trace, knapsack_memo_trace, knapsack_tab_trace
-from backend.algorithms.lcs import lcs_recursive_trace, lcs_memo_trace, lcs_tab_trace
+# imported for the problems and tracers they register
+from backend.algorithms import fibonacci, knapsack, lcs  # noqa: F401
+from backend.algorithms.registry import algorithm_mapping, tracer_args
+from backend.streaming import TraceStream, parse_flow_control, MAX_BATCH_SIZE
+from backend.scheduler import StreamScheduler, DEFAULT_QUANTUM, DEFAULT_MAX_IN_FLIGHT
+from backend.playback import Playback, parse_playback
+from backend.wire import StepCodec, parse_wire_format, wire_schema, WIRE_VERSION
+from backend.trace_cache import TraceCache, cache_key
+from backend.payloads import PayloadBuffer, DecodedTrace, encode_payloads, join_batch
+from backend.trace_store import TraceStore, DEFAULT_MAX_OPEN, DEFAULT_MAX_STORE_BYTES
+from backend.executions import Execution, ExecutionRegistry
+from backend.algorithms.tracing import keyframe_positions, table_at, memo_at
+from backend.algorithms.explanations import check_explanations, render_explanation, template_catalog
+from backend.workers import (TracerPool, DEFAULT_MAX_WORKERS, DEFAULT_TIMEOUT, DEFAULT_MAX_STEPS,
+                             DEFAULT_MAX_BUFFERED)
+from backend.cost_model import Budget, estimate, suggest_alternatives, DEFAULT_MAX_BYTES, DEFAULT_MAX_SECONDS
 
 # APP AND WEBSOCKET CONFIG
 
@@ -14,26 +32,370 @@ socketio = SocketIO(app, cors_allowed_origins="http://localhost:3000")
 
 
 # ALGORITHM MAPPING
+# Every registered problem's tracers by algorithm name (see registry.py). Each entry is a generator, so steps
+# can be streamed to the client while the trace is still being computed. 'solve' entries skip the trace and
+# yield only the answer.
+
+ALGORITHM_MAPPING = algorithm_mapping()
+
+# Algorithms that accept the 'encoding' and 'keyframe_interval' options
+ENCODING_ALGORITHMS = {'memoization', 'tabulation', 'tabulation_1d'}
+
+# Algorithms whose traces carry a DP 'table'
+TABLE_ALGORITHMS = {'tabulation', 'tabulation_1d'}
+
+# Encoder for executions that asked for the binary wire format
+STEP_CODEC = StepCodec()
+
+# Completed traces shared by every client, so repeated presets are not traced again
+TRACE_CACHE = TraceCache()
+
+# Where 'storage' : 'disk' executions spill their traces. Kept across restarts for replay.
+STORAGE_MODES = ('memory', 'disk')
+TRACE_STORE = TraceStore(
+    os.environ.get('DP_TRACE_STORE_DIR', os.path.join(tempfile.gettempdir(), 'dp-visualizer-traces')),
+    max_open=int(os.environ.get('DP_TRACE_STORE_MAX_OPEN', DEFAULT_MAX_OPEN)),
+    max_bytes=int(os.environ.get('DP_TRACE_STORE_MAX_BYTES', DEFAULT_MAX_STORE_BYTES)),
+    max_age=float(os.environ['DP_TRACE_STORE_MAX_AGE']) if os.environ.get('DP_TRACE_STORE_MAX_AGE') else None
+)
+
+# Recent executions that can be seeked into with 'seek_step' and 'get_range'
+EXECUTIONS = ExecutionRegistry()
+
+# The execution each client is currently running, cancelled when the client starts another one
+CURRENT_EXECUTIONS = {}
+
+# Clients that have already been sent the explanation template catalog
+TEMPLATE_SESSIONS = set()
+
+# Worker processes the tracers run in, so a long trace doesn't block other clients.
+# DP_TRACER_WORKERS=0 runs tracers inline in the handler instead.
+TRACER_WORKERS = int(os.environ.get('DP_TRACER_WORKERS', DEFAULT_MAX_WORKERS))
+TRACER_POOL = TracerPool(
+    TRACER_WORKERS,
+    timeout=float(os.environ.get('DP_TRACER_TIMEOUT', DEFAULT_TIMEOUT)),
+    max_steps=int(os.environ.get('DP_TRACER_MAX_STEPS', DEFAULT_MAX_STEPS)),
+    max_buffered=int(os.environ.get('DP_TRACER_MAX_BUFFERED', DEFAULT_MAX_BUFFERED))
+) if TRACER_WORKERS > 0 else None
+
+# Executions whose estimated cost goes over this budget are rejected before they run
+EXECUTION_BUDGET = Budget(
+    max_steps=int(os.environ.get('DP_BUDGET_MAX_STEPS', DEFAULT_MAX_STEPS)),
+    max_bytes=int(os.environ.get('DP_BUDGET_MAX_BYTES', DEFAULT_MAX_BYTES)),
+    max_seconds=float(os.environ.get('DP_BUDGET_MAX_SECONDS', DEFAULT_MAX_SECONDS))
+)
+
+
+def create_trace(problem, algorithm_type, params, options):
+    '''
+    Returns the step generator for the problem and algorithm with its parameters, replayed from
+    TRACE_CACHE when the same request has been traced before.
+    Raises a KeyError if the problem or algorithm is unknown.
+    '''
+    func = ALGORITHM_MAPPING[problem][algorithm_type]
+    key = cache_key(problem, algorithm_type, params, options)
+    return TRACE_CACHE.steps(key, lambda: run_tracer(func, problem, params, options))
+
+
+def create_payloads(problem, algorithm_type, params, options, wire_format):
+    '''
+    Returns the trace as pre-serialized step payloads in the wire format. The payloads are cached on their
+    own, so a trace that has been sent once is replayed to later clients without encoding any step again.
+    '''
+    key = cache_key(problem, algorithm_type, params, dict(options, payloads=wire_format))
+    payloads = TRACE_CACHE.get(key)
+    if payloads is not None:
+        return iter(payloads)
+    # The tracer is run directly rather than through create_trace(), the payloads replace the step buffer
+    steps = run_tracer(ALGORITHM_MAPPING[problem][algorithm_type], problem, params, options)
+    return TRACE_CACHE.record(key, encode_payloads(steps, wire_format), PayloadBuffer())
+
+
+def stored_key(problem, algorithm_type, params, options, wire_format):
+    '''
+    TRACE_STORE key of the trace's payloads. Stored traces outlive the process, so the key also names the
+    wire version they were encoded with.
+    '''
+    return cache_key(problem, algorithm_type, params, dict(options, payloads=wire_format, wire_version=WIRE_VERSION))
 
-ALGORITHM_MAPPING = {
-    'fibonacci' : {
-        'recursive' : fibonacci_recursive_trace,
-        'memoization' : fibonacci_memo_trace,
-        'tabulation' : fibonacci_tab_trace
-    },
-    
-    'knapsack' : {
-        'recursive' : knapsack_recursive_trace,
-        'memoization' : knapsack_memo_trace,
-        'tabulation' : knapsack_tab_trace
-    },
-    
-    'lcs' : {
-        'recursive' : lcs_recursive_trace,
-        'memoization' : lcs_memo_trace,
-        'tabulation' : lcs_tab_trace
+
+def create_stored_payloads(problem, algorithm_type, params, options, wire_format):
+    '''
+    Returns the trace as serialized step payloads read back from TRACE_STORE, tracing it into the store
+    first if it isn't there yet. Nothing but the step being written is held in memory.
+    '''
+    key = stored_key(problem, algorithm_type, params, options, wire_format)
+    stored = TRACE_STORE.get(key)
+    if stored is not None:
+        return iter(stored)
+    steps = run_tracer(ALGORITHM_MAPPING[problem][algorithm_type], problem, params, options)
+    return TRACE_STORE.record(key, encode_payloads(steps, wire_format))
+
+
+def execution_trace(execution):
+    '''
+    Returns the execution's trace with random access to its steps: the TraceBuffer in TRACE_CACHE, or the
+    stored payloads in TRACE_STORE. A trace that is no longer in either is traced again, into the cache
+    if it fits and onto disk otherwise.
+    '''
+    problem, algorithm_type, params, options = execution.problem, execution.algorithm_type, execution.params, execution.options
+    
+    if execution.storage == 'memory':
+        key = cache_key(problem, algorithm_type, params, options)
+        buffer = TRACE_CACHE.get(key)
+        if buffer is None:
+            for _ in create_trace(problem, algorithm_type, params, options):
+                pass
+            buffer = TRACE_CACHE.get(key)
+        if buffer is not None:
+            return buffer
+    
+    # Asked for disk storage, or too large for the cache
+    wire_format = execution.wire_format if execution.storage == 'disk' else 'json'
+    key = stored_key(problem, algorithm_type, params, options, wire_format)
+    stored = TRACE_STORE.get(key)
+    if stored is None:
+        for _ in create_stored_payloads(problem, algorithm_type, params, options, wire_format):
+            pass
+        stored = TRACE_STORE.get(key)
+    return DecodedTrace(stored, wire_format)
+
+
+def run_tracer(func, problem, params, options):
+    '''
+    Calls the tracer for the problem with its parameters, returning the step generator.
+    The tracer runs in TRACER_POOL when there is one, with the pool's time and step limits.
+    '''
+    args = tracer_args(problem, params)
+    if TRACER_POOL is None:
+        return func(*args, **options)
+    return TRACER_POOL.run(func, args, options)
+
+
+def assess_execution(problem, algorithm_type, params, options):
+    '''
+    Estimates the cost of an execution and checks it against EXECUTION_BUDGET. Executions over budget
+    come with the cheaper alternatives that fit.
+    '''
+    cost = estimate(problem, algorithm_type, params, options)
+    violations = EXECUTION_BUDGET.violations(cost)
+    assessment = {
+        'problem' : problem,
+        'algorithm' : algorithm_type,
+        'estimate' : cost,
+        'budget' : EXECUTION_BUDGET.to_dict(),
+        'admitted' : not violations,
+        'violations' : violations
     }
-}
+    if violations:
+        assessment['suggestions'] = suggest_alternatives(problem, algorithm_type, params, options, EXECUTION_BUDGET,
+                                                         ALGORITHM_MAPPING[problem])
+    return assessment
+
+
+def read_options(data, algorithm_type):
+    '''
+    The tracer options sent with an execute_algorithm (or estimate_execution) request.
+    '''
+    options = {}
+    if algorithm_type in ENCODING_ALGORITHMS:
+        options = {key : data[key] for key in ('encoding', 'keyframe_interval') if key in data}
+    if algorithm_type == 'tabulation':
+        options.update({key : data[key] for key in ('granularity', 'stride') if key in data})
+    if algorithm_type == 'recursive' and 'dedup' in data:
+        options['dedup'] = data['dedup']
+    if 'explanations' in data:
+        options['explanations'] = data['explanations']
+    return options
+
+
+def request_error(data):
+    '''
+    Why an execute_algorithm request can't be run, or None if it can.
+    '''
+    problem = data.get('problem')
+    algorithm_type = data.get('algorithm')
+    if not all([problem, algorithm_type, data.get('params')]):
+        return 'Invalid request. Missing fields.'
+    # Find the correct function to call
+    if algorithm_type not in ALGORITHM_MAPPING.get(problem, {}):
+        return f"Algorithm '{algorithm_type}' for problem '{problem}' not found."
+    if not isinstance(data.get('preserialized', False), bool):
+        return 'preserialized must be true or false.'
+    storage = data.get('storage', 'memory')
+    if storage not in STORAGE_MODES:
+        return f"Unknown storage '{storage}'. Expected one of {list(STORAGE_MODES)}."
+    # Client chosen ids are only reused by the client that owns them, so no one can take over another's execution
+    execution_id = data.get('execution_id')
+    existing = EXECUTIONS.get(str(execution_id)) if execution_id else None
+    if existing is not None and existing.sid != request.sid:
+        return f"Execution id '{execution_id}' is already in use."
+    return None
+
+
+def execution_payloads(problem, algorithm_type, params, options, storage, wire_format, preserialized):
+    '''
+    The trace an execution streams, kept in memory or in TRACE_STORE, and whether its steps are already
+    serialized payloads. Returns (trace, preserialized).
+    '''
+    if storage == 'disk':
+        trace = create_stored_payloads(problem, algorithm_type, params, options, wire_format)
+        if wire_format == 'binary':
+            # stored binary payloads are exactly what the encoder would send
+            return trace, True
+        if not preserialized:
+            trace = (json.loads(payload) for payload in trace)
+        return trace, preserialized
+    if preserialized:
+        return create_payloads(problem, algorithm_type, params, options, wire_format), True
+    return create_trace(problem, algorithm_type, params, options), False
+
+
+def open_stream(execution_id, data, trace, wire_format, preserialized):
+    '''
+    The TraceStream of an execution: in 'trace_batch' events under flow control if the request sent
+    'batch_size', which is announced with 'execution_started', or step by step otherwise.
+    '''
+    if 'batch_size' not in data:
+        # Stream the trace back step-by-step, as the tracer produces each one, one quantum of steps per turn
+        return TraceStream(execution_id, request.sid, trace, STREAM_SCHEDULER.quantum, None, wire_format,
+                           preserialized)
+    
+    batch_size, window = parse_flow_control(data)
+    stream = TraceStream(execution_id, request.sid, trace, batch_size, window, wire_format, preserialized)
+    emit('execution_started', {
+        'execution_id' : execution_id,
+        'batch_size' : batch_size,
+        'window' : window,
+        'wire_format' : wire_format,
+        'preserialized' : preserialized
+    })
+    return stream
+
+
+def send_batch(stream, seq, steps):
+    '''
+    Emits one batch of a stream to the client that owns it: as a 'trace_batch' for batched executions, or
+    as one 'trace_step' per step otherwise.
+    '''
+    if stream.window is None:
+        encode = STEP_CODEC.encode_step if stream.wire_format == 'binary' and not stream.preserialized else None
+        for step in steps:
+            socketio.emit('trace_step', encode(step) if encode else step, to=stream.sid)
+        return
+    
+    if stream.preserialized:
+        steps = join_batch(steps, stream.wire_format)
+    elif stream.wire_format == 'binary':
+        steps = STEP_CODEC.encode_steps(steps)
+    socketio.emit('trace_batch', {'execution_id' : stream.execution_id, 'seq' : seq, 'steps' : steps}, to=stream.sid)
+
+
+def finish_stream(stream, error):
+    '''
+    Tells the client a stream has been sent in full, or that its tracer failed.
+    '''
+    finish_execution(stream.execution_id)
+    if error is not None:
+        socketio.emit('error', {'message' : f'An error occured: {str(error)}', 'execution_id' : stream.execution_id},
+                      to=stream.sid)
+        return
+    
+    completion = {'message': 'Execution Complete', 'execution_id' : stream.execution_id}
+    if stream.window is not None:
+        completion['steps'] = stream.steps_sent
+    socketio.emit('execution_complete', completion, to=stream.sid)
+
+
+# Traces that are still being sent, keyed by execution id. Their batches are interleaved so a long trace
+# doesn't hold up everyone else's, with at most DP_STREAM_MAX_IN_FLIGHT unacknowledged batches per client.
+STREAM_SCHEDULER = StreamScheduler(
+    send_batch,
+    finish_stream,
+    quantum=int(os.environ.get('DP_STREAM_QUANTUM', DEFAULT_QUANTUM)),
+    max_in_flight=int(os.environ.get('DP_STREAM_MAX_IN_FLIGHT', DEFAULT_MAX_IN_FLIGHT))
+)
+
+
+# Executions played back at the client's pace, keyed by execution id
+PLAYBACKS = {}
+
+
+def send_playback(playback, start, steps):
+    '''
+    Emits the steps of a playback that have fallen due, starting at trace position 'start'.
+    '''
+    if playback.wire_format == 'binary':
+        steps = STEP_CODEC.encode_steps(steps)
+    socketio.emit('playback_steps', {'execution_id' : playback.execution_id, 'start' : start, 'steps' : steps},
+                  to=playback.sid)
+
+
+def finish_playback(playback, error):
+    '''
+    Tells the client a playback has reached the end of the trace, or that reading the trace failed.
+    '''
+    PLAYBACKS.pop(playback.execution_id, None)
+    finish_execution(playback.execution_id)
+    if error is not None:
+        socketio.emit('error', {'message' : f'An error occured: {str(error)}', 'execution_id' : playback.execution_id},
+                      to=playback.sid)
+        return
+    socketio.emit('execution_complete', {'message': 'Execution Complete', 'execution_id' : playback.execution_id,
+                                         'steps' : playback.cursor}, to=playback.sid)
+
+
+def start_playback(execution, speed):
+    '''
+    Traces the execution in full (into TRACE_CACHE or TRACE_STORE, see execution_trace()) and starts
+    sending it from a cursor at 'speed' steps per second.
+    '''
+    steps = execution_trace(execution)
+    playback = Playback(execution.execution_id, execution.sid, steps, send_playback, finish_playback, speed,
+                        execution.wire_format)
+    PLAYBACKS[execution.execution_id] = playback
+    emit('execution_started', {
+        'execution_id' : execution.execution_id,
+        'playback' : playback.state(),
+        'wire_format' : execution.wire_format
+    })
+    if execution.wire_format == 'binary':
+        emit('trace_schema', wire_schema())
+    playback.start()
+
+
+def finish_execution(execution_id):
+    '''
+    Marks an execution as no longer running once its trace has been sent (or has failed).
+    '''
+    execution = EXECUTIONS.get(execution_id)
+    if execution is not None:
+        execution.running = False
+        if CURRENT_EXECUTIONS.get(execution.sid) is execution:
+            CURRENT_EXECUTIONS.pop(execution.sid, None)
+
+
+def cancel_execution(execution, reason):
+    '''
+    Stops a running execution: its stream sends no further batch and is closed along with the tracer
+    behind it, and the client gets an 'execution_cancelled' event.
+    Returns False if the execution had already finished.
+    '''
+    if not execution.running:
+        return False
+    execution.running = False
+    if CURRENT_EXECUTIONS.get(execution.sid) is execution:
+        CURRENT_EXECUTIONS.pop(execution.sid, None)
+    
+    stream = STREAM_SCHEDULER.remove(execution.execution_id)
+    if stream is not None:
+        stream.cancel()
+    playback = PLAYBACKS.pop(execution.execution_id, None)
+    if playback is not None:
+        playback.stop()
+    emit('execution_cancelled', {'execution_id' : execution.execution_id, 'reason' : reason})
+    return True
+
 
 # Websocket Event Handlers
 
@@ -42,11 +404,22 @@ def handle_connect():
     # Handles a new client connecting to the Websocket
     print('Client Connected')
     emit('status', {'message': 'Successful Connection to Backend'})
-    
+
+
 @socketio.on('disconnect')
 def handle_disconnect():
     # Handles a client disconnecting from the Websocket
     print('Client disconnected')
+    TEMPLATE_SESSIONS.discard(request.sid)
+    execution = CURRENT_EXECUTIONS.pop(request.sid, None)
+    if execution is not None:
+        execution.running = False
+    for stream in STREAM_SCHEDULER.remove_session(request.sid):
+        stream.close()
+    for playback in [playback for playback in PLAYBACKS.values() if playback.sid == request.sid]:
+        PLAYBACKS.pop(playback.execution_id, None)
+        playback.stop()
+
 
 @socketio.on('execute_algorithm')
 def handle_execute_algorithm(data):
@@ -54,48 +427,325 @@ def handle_execute_algorithm(data):
     Main event handler for running algorithms
     Receives parameters from client, runs the corresponding algorithm and streams 
     the trace back one step at a time.
+    
+    Memoization and tabulation requests may also send 'encoding' ('full' or 'delta') and 'keyframe_interval'
+    to receive only the changed memo entry or table cell on each step instead of the whole memo or table.
+    Tabulation requests may send 'granularity' ('row', 'diagonal' or 'stride', with 'stride' cells per event)
+    to receive one 'iteration_block' event per row, anti-diagonal or stride of the table instead of one per cell.
+    
+    Sending 'batch_size' switches to batched streaming: steps arrive in 'trace_batch' events of up to
+    'batch_size' steps, at most 'window' batches ahead of the client's 'trace_ack' events.
+    
+    Sending 'wire_format' : 'binary' first emits a 'trace_schema' event, then sends each step (or each
+    batch's steps) as bytes packed by backend.wire.StepCodec instead of JSON.
+    
+    Sending 'preserialized' : true sends every step (or batch) as already encoded bytes - JSON text by
+    default - taken from a shared PayloadBuffer, so the trace is only ever encoded once for all clients.
+    
+    Sending 'storage' : 'disk' writes the trace to TRACE_STORE and streams it back from there instead of
+    keeping it in memory, for traces larger than the server should hold.
+    
+    Recursive requests may send 'dedup' : true to trace each distinct subproblem's subtree only once: later
+    calls to it arrive as a single 'subtree_ref' step standing for a copy of the first (see
+    backend.algorithms.tracing.expand_subtrees).
+    
+    Sending 'explanations' : 'template' replaces every explanation with [template_id, *args]. The template
+    catalog is sent in an 'explanation_templates' event the first time a client asks for it, and
+    'render_explanations' turns templated explanations back into text.
+    
+    Sending 'playback_speed' (steps per second) plays the trace back at that pace instead: it is traced
+    in full, then sent from a server-side cursor in 'playback_steps' events as the steps fall due, so the
+    client never holds more than it has been shown. 'pause_playback', 'resume_playback' and
+    'set_playback_speed' control the cursor.
+    
+    Executions estimated to go over EXECUTION_BUDGET are answered with 'execution_rejected' instead,
+    listing cheaper alternatives (see 'estimate_execution').
+    
+    Traces are not sent to the end in one go: STREAM_SCHEDULER takes turns between every client's running
+    executions, so a small trace isn't stuck behind a large one ('get_stream_stats' reports its queues).
+    
+    Every execution gets an 'execution_id' (sent in 'execution_started' / 'execution_complete') that
+    'seek_step' and 'get_range' use to jump around the trace afterwards, and 'cancel_execution' uses to
+    stop it. Starting a new execution cancels the one the client is still running.
     '''
 
+    # Validate the request
+    error = request_error(data)
+    if error is not None:
+        emit('error', {'message' : error})
+        return
+    
+    problem = data['problem']
+    algorithm_type = data['algorithm']
+    params = data['params']
+    options = read_options(data, algorithm_type)
+    preserialized = data.get('preserialized', False)
+    storage = data.get('storage', 'memory')
+    
+    execution_id = str(data.get('execution_id') or uuid.uuid4().hex)
+    
+    execution = None
+    try:
+        # call the appropriate function with its parameters
+        wire_format = parse_wire_format(data)
+        check_explanations(options.get('explanations', 'text'))
+        playback_speed = parse_playback(data)
+        
+        # Turn away executions that would cost more than the budget allows
+        assessment = assess_execution(problem, algorithm_type, params, options)
+        if not assessment['admitted']:
+            emit('execution_rejected', assessment)
+            return
+        
+        if options.get('explanations') == 'template' and request.sid not in TEMPLATE_SESSIONS:
+            TEMPLATE_SESSIONS.add(request.sid)
+            emit('explanation_templates', template_catalog())
+        
+        previous = CURRENT_EXECUTIONS.get(request.sid)
+        if previous is not None:
+            cancel_execution(previous, 'replaced')
+        
+        execution = Execution(execution_id, problem, algorithm_type, params, options, storage, wire_format, request.sid)
+        EXECUTIONS.add(execution)
+        CURRENT_EXECUTIONS[request.sid] = execution
+        
+        if playback_speed is not None:
+            start_playback(execution, playback_speed)
+            return
+        
+        trace, preserialized = execution_payloads(problem, algorithm_type, params, options, storage, wire_format,
+                                                  preserialized)
+        stream = open_stream(execution_id, data, trace, wire_format, preserialized)
+        if wire_format == 'binary':
+            emit('trace_schema', wire_schema())
+        STREAM_SCHEDULER.add(stream)
+        STREAM_SCHEDULER.feed(stream)
+    
+    except Exception as e:
+        if execution is not None:
+            finish_execution(execution.execution_id)
+        emit('error', {'message' : f'An error occured: {str(e)}'})
+
+
+@socketio.on('estimate_execution')
+def handle_estimate_execution(data):
+    '''
+    Predicts the steps, bytes and time an execute_algorithm request with the same payload would take,
+    whether it fits the server's budget, and cheaper alternatives if it doesn't. Nothing is run.
+    '''
     problem = data.get('problem')
     algorithm_type = data.get('algorithm')
     params = data.get('params')
     
-    # Validate the request
     if not all([problem, algorithm_type, params]):
         emit('error', {'message' : 'Invalid request. Missing fields.'})
+        return
+    if algorithm_type not in ALGORITHM_MAPPING.get(problem, {}):
+        emit('error', {'message' : f"Algorithm '{algorithm_type}' for problem '{problem}' not found."})
+        return
     
-    # Find the correct function to call
-    func = ALGORITHM_MAPPING.get(problem, {}).get(algorithm_type)
+    try:
+        emit('execution_estimate', assess_execution(problem, algorithm_type, params, read_options(data, algorithm_type)))
+    except Exception as e:
+        emit('error', {'message' : f'An error occured: {str(e)}'})
+
+
+@socketio.on('cancel_execution')
+def handle_cancel_execution(data):
+    '''
+    Stops one of the client's running executions and frees its trace.
+    Payload: {'execution_id' : ...}, confirmed with an 'execution_cancelled' event.
+    '''
+    execution = EXECUTIONS.get(data.get('execution_id'))
+    if execution is None or execution.sid != request.sid:
+        emit('error', {'message' : 'Unknown execution.', 'execution_id' : data.get('execution_id')})
+        return
     
-    if not func:
-        emit('error', {'message' : f"Algorithm '{algorithm_type}' for problem '{problem}' not found."})
+    if not cancel_execution(execution, 'cancelled'):
+        emit('error', {'message' : 'Execution is not running.', 'execution_id' : execution.execution_id})
+
+
+@socketio.on('trace_ack')
+def handle_trace_ack(data):
+    '''
+    Acknowledges consumed batches of a batched execution, allowing the server to send more.
+    Payload: {'execution_id' : ..., 'credits' : number of batches consumed (default 1)}
+    '''
+    stream = STREAM_SCHEDULER.get(data.get('execution_id'))
+    if stream is None or stream.sid != request.sid or stream.window is None:
+        emit('error', {'message' : 'Unknown execution.', 'execution_id' : data.get('execution_id')})
+        return
     
+    credits = data.get('credits', 1)
+    if not isinstance(credits, int):
+        emit('error', {'message' : 'credits must be an integer.', 'execution_id' : stream.execution_id})
+        return
+    
+    stream.ack(credits)
+    STREAM_SCHEDULER.feed(stream)
+
+
+def find_playback(data):
+    '''
+    Looks up the playback named in a playback control request, emitting an error and returning None if it
+    is unknown, already finished or belongs to another client.
+    '''
+    playback = PLAYBACKS.get(data.get('execution_id'))
+    if playback is None or playback.sid != request.sid:
+        emit('error', {'message' : 'Unknown playback.', 'execution_id' : data.get('execution_id')})
+        return None
+    return playback
+
+
+@socketio.on('pause_playback')
+def handle_pause_playback(data):
+    '''
+    Stops a playback's cursor where it is. Payload: {'execution_id' : ...}, answered with 'playback_state'.
+    '''
+    playback = find_playback(data)
+    if playback is None:
+        return
+    playback.pause()
+    emit('playback_state', playback.state())
+
+
+@socketio.on('resume_playback')
+def handle_resume_playback(data):
+    '''
+    Continues a paused playback from its cursor. Payload: {'execution_id' : ...}, answered with 'playback_state'.
+    '''
+    playback = find_playback(data)
+    if playback is None:
+        return
+    playback.resume()
+    emit('playback_state', playback.state())
+
+
+@socketio.on('set_playback_speed')
+def handle_set_playback_speed(data):
+    '''
+    Changes how many steps per second a playback sends from now on.
+    Payload: {'execution_id' : ..., 'speed' : steps per second}, answered with 'playback_state'.
+    '''
+    playback = find_playback(data)
+    if playback is None:
+        return
     try:
-        # call the appropriate function with its parameters
-        if problem == 'fibonacci':
-            trace = func(params['n']) 
-        elif problem == 'knapsack':
-            trace = func(params['weights'], params['values'], params['capacity'])
-        elif problem == 'lcs':
-            trace = func(params['s1'], params['s2'])
-        else:
-             emit('error', {'message' : 'Unknown Problem type'})
-             return
-
-        # Stream the trace back step-by-step
-        for step in trace:
-            emit('trace_step', step)
+        playback.set_speed(data.get('speed'))
+    except ValueError as e:
+        emit('error', {'message' : str(e), 'execution_id' : playback.execution_id})
+        return
+    emit('playback_state', playback.state())
+
+
+def find_execution(data):
+    '''
+    Looks up the execution named in a seek request, emitting an error and returning None if it is unknown
+    or belongs to another client.
+    '''
+    execution = EXECUTIONS.get(data.get('execution_id'))
+    if execution is None or execution.sid != request.sid:
+        emit('error', {'message' : 'Unknown execution.', 'execution_id' : data.get('execution_id')})
+        return None
+    return execution
+
+
+@socketio.on('seek_step')
+def handle_seek_step(data):
+    '''
+    Sends step k of an execution's trace without replaying the steps before it.
+    Payload: {'execution_id' : ..., 'step' : k}
+    
+    Tabulation traces also get the DP 'table' and memoization traces the 'memo' as they were at step k,
+    rebuilt from the nearest keyframe (found by binary search) even when the trace is delta encoded.
+    '''
+    execution = find_execution(data)
+    if execution is None:
+        return
+    
+    try:
+        steps = execution_trace(execution)
+        k = data.get('step')
+        if not isinstance(k, int) or not 0 <= k < len(steps):
+            emit('error', {'message' : f'step must be an integer between 0 and {len(steps) - 1}.',
+                           'execution_id' : execution.execution_id})
+            return
         
-        emit('execution_complete', {'message': 'Execution Complete'})
+        state = {'execution_id' : execution.execution_id, 'step' : k, 'total_steps' : len(steps), 'data' : steps[k]}
+        if execution.algorithm_type in TABLE_ALGORITHMS:
+            if 'table' not in execution.keyframes:
+                execution.keyframes['table'] = keyframe_positions(steps, 'table')
+            state['table'] = table_at(steps, k, execution.keyframes['table'])
+        elif execution.algorithm_type == 'memoization':
+            if 'memo' not in execution.keyframes:
+                execution.keyframes['memo'] = keyframe_positions(steps, 'memo')
+            state['memo'] = memo_at(steps, k, execution.keyframes['memo'])
+        emit('step_state', state)
     
     except Exception as e:
-        emit('error', {'message' :f'An error occured: {str(e)}'})
+        emit('error', {'message' : f'An error occured: {str(e)}', 'execution_id' : execution.execution_id})
 
 
-if __name__ == '__main__':
-    socketio.run(app, debug=True, port=5001)
-         
+@socketio.on('get_range')
+def handle_get_range(data):
+    '''
+    Sends steps [start, stop) of an execution's trace, at most MAX_BATCH_SIZE of them.
+    Payload: {'execution_id' : ..., 'start' : a, 'stop' : b}
+    '''
+    execution = find_execution(data)
+    if execution is None:
+        return
     
+    start, stop = data.get('start'), data.get('stop')
+    if not isinstance(start, int) or not isinstance(stop, int) or not 0 <= start <= stop or stop - start > MAX_BATCH_SIZE:
+        emit('error', {'message' : f'start and stop must be integers with 0 <= start <= stop <= start + {MAX_BATCH_SIZE}.',
+                       'execution_id' : execution.execution_id})
+        return
     
+    try:
+        steps = execution_trace(execution)
+        stop = min(stop, len(steps))
+        start = min(start, stop)
+        emit('step_range', {
+            'execution_id' : execution.execution_id,
+            'start' : start,
+            'stop' : stop,
+            'total_steps' : len(steps),
+            'steps' : steps[start:stop]
+        })
+    
+    except Exception as e:
+        emit('error', {'message' : f'An error occured: {str(e)}', 'execution_id' : execution.execution_id})
+
+
+@socketio.on('render_explanations')
+def handle_render_explanations(data):
+    '''
+    Renders templated explanations to text for clients that don't render them themselves.
+    Payload: {'explanations' : [[template_id, *args], ...]}, answered in the same order.
+    '''
+    explanations = data.get('explanations')
+    if not isinstance(explanations, list):
+        emit('error', {'message' : 'explanations must be a list.'})
+        return
     
+    try:
+        emit('explanations_rendered', {'explanations' : [render_explanation(explanation) for explanation in explanations]})
+    except (IndexError, KeyError, TypeError) as e:
+        emit('error', {'message' : f'Invalid explanation template: {str(e)}'})
+
 
+@socketio.on('get_cache_stats')
+def handle_get_cache_stats():
+    # Reports the size of the shared trace cache and its hit/miss/eviction counters
+    emit('cache_stats', TRACE_CACHE.stats())
+
+
+@socketio.on('get_stream_stats')
+def handle_get_stream_stats():
+    # Reports how many streams are queued, waiting for acks or throttled, and how much has been sent
+    emit('stream_stats', STREAM_SCHEDULER.stats())
+
+
+if __name__ == '__main__':
+    socketio.run(app, debug=True, port=5001)
@@ -0,0 +1,517 @@
+'''
+Cost model for trace executions, used to turn away requests that would be too expensive before running them.
+
+estimate() predicts how many steps a (problem, algorithm, params, options) request produces, how many JSON
+bytes they take and roughly how long tracing and sending them takes. Step counts are exact where they can be
+counted cheaply: the recursion trees are counted over their distinct states rather than walked call by call,
+so a 2^n call tree costs n * capacity work to count. Bytes and seconds come from per-step and per-byte costs
+measured on the tracers, plus the size of the table and memo snapshots the encoding attaches. Algorithms
+that do most of their work between steps add the time that work takes.
+
+Problems without an estimator of their own in ESTIMATORS are estimated from their declaration (see
+_declared()), less precisely but without having to write one for every new problem.
+'''
+import math
+from functools import partial
+
+from backend.algorithms.tracing import (check_encoding, check_dedup, check_granularity, DEFAULT_KEYFRAME_INTERVAL,
+                                        DEFAULT_STRIDE)
+from backend.algorithms.explanations import check_explanations
+# imported for the problems the estimators below are written for, registered along with their declarations
+from backend.algorithms import fibonacci, knapsack, lcs  # noqa: F401
+from backend.algorithms.registry import PROBLEMS, declaration
+
+
+# Measured averages for one JSON encoded step without a table or memo, and for tracing + encoding it
+STEP_BYTES = 110
+SECONDS_PER_STEP = 8e-6
+SECONDS_PER_BYTE = 3e-8
+
+# Measured time to fill one knapsack table cell without tracing it, with NumPy and in pure Python
+SECONDS_PER_SOLVE_CELL_NUMPY = 2e-9
+SECONDS_PER_SOLVE_CELL = 8e-8
+
+# Measured time Hirschberg's LCS takes per cell of the m x n table: it scores every cell about twice
+# (once forwards, once backwards split over the levels of its recursion) without tracing them
+SECONDS_PER_HIRSCHBERG_CELL = 1.1e-7
+
+# Measured fast doubling time for F(n) is about this times n^log2(3): F(n) has about 0.7 * n bits and
+# multiplying such big ints takes Karatsuba's O(bits^log2(3)), the last few doublings doing most of it
+FAST_DOUBLING_SECONDS = 1.4e-11
+
+# Memo entries as they appear in a memo snapshot, e.g. '"(2, 40)":220,'
+MEMO_ENTRY_BYTES = 14
+
+# Assumed JSON size of a table cell of a problem estimated from its declaration
+CELL_BYTES = 8
+
+# Counting recursion trees stops after this many distinct states and falls back to an upper bound
+STATE_LIMIT = 200_000
+
+# Estimates are capped here so they stay plain numbers for the client
+MAX_ESTIMATE = 10 ** 15
+
+# Algorithms with a delta encoding to suggest
+DELTA_ALGORITHMS = ('memoization', 'tabulation', 'tabulation_1d')
+
+# Algorithms that only return the answer, never suggested in place of a trace
+SOLVE_ALGORITHMS = ('solve',)
+
+DEFAULT_MAX_STEPS = 5_000_000
+DEFAULT_MAX_BYTES = 500 * 1024 * 1024
+DEFAULT_MAX_SECONDS = 60.0
+
+
+class _TooManyStates(Exception):
+    pass
+
+
+def _fib(n):
+    # F(n) by fast doubling
+    a, b = 0, 1
+    for bit in bin(n)[2:]:
+        a, b = a * (2 * b - a), a * a + b * b
+        if bit == '1':
+            a, b = b, a + b
+    return a
+
+
+def _tree_total(root, expand):
+    '''
+    Evaluates total(state) = own + sum(total(child)) over a recursion tree, where expand(state) returns
+    (own, children). Each distinct state is expanded once however often it recurs. Iterative, so deep
+    trees don't hit the recursion limit.
+    '''
+    totals = {}
+    stack = [root]
+    while stack:
+        state = stack[-1]
+        if state in totals:
+            stack.pop()
+            continue
+        own, children = expand(state)
+        pending = [child for child in children if child not in totals]
+        if pending:
+            stack.extend(pending)
+            continue
+        totals[state] = own + sum(totals[child] for child in children)
+        stack.pop()
+        if len(totals) > STATE_LIMIT:
+            raise _TooManyStates()
+    return totals[root]
+
+
+def _distinct_states(root, expand):
+    '''
+    Walks the distinct states of a memoized recursion. Returns {state : expand(state)} for each of them.
+    '''
+    seen = {}
+    stack = [root]
+    while stack:
+        state = stack.pop()
+        if state in seen:
+            continue
+        seen[state] = expand(state)
+        stack.extend(seen[state][1])
+        if len(seen) > STATE_LIMIT:
+            raise _TooManyStates()
+    return seen
+
+
+def _shared_tree_steps(root, expand):
+    '''
+    Steps of a recursive trace recorded with dedup=True: every distinct state's own steps once, plus one
+    'subtree_ref' step for each call to a state after its first.
+    '''
+    states = _distinct_states(root, expand)
+    calls = sum(len(children) for _, children in states.values()) + 1
+    return sum(own for own, _ in states.values()) + calls - len(states)
+
+
+def _memo_steps(root, expand, rank):
+    '''
+    Steps of a memoized trace. expand(state) gives (steps of a call that computes the state, children,
+    whether the result is stored in the memo). A call to a stored state after its first one is a cache hit
+    of 2 steps (call, cache hit); states that are never stored are computed again on every call.
+    Children must have a lower rank(state) than their parents. Returns (steps, states stored, cache hits).
+    '''
+    states = _distinct_states(root, expand)
+    calls = dict.fromkeys(states, 0)
+    calls[root] = 1
+    steps = stored = hits = 0
+    for state in sorted(states, key=rank, reverse=True):
+        own, children, is_stored = states[state]
+        computed = min(calls[state], 1) if is_stored else calls[state]
+        for child in children:
+            calls[child] += computed
+        steps += computed * own + 2 * (calls[state] - computed)
+        if is_stored:
+            stored += 1
+            hits += calls[state] - computed
+    return steps, stored, hits
+
+
+def _knapsack_children(weights):
+    def children(state):
+        index, capacity = state
+        if index < 0 or capacity <= 0:
+            return ()
+        if weights[index] > capacity:
+            return ((index - 1, capacity),)
+        return ((index - 1, capacity), (index - 1, capacity - weights[index]))
+    return children
+
+
+def _lcs_children(s1, s2):
+    def children(state):
+        i, j = state
+        if i < 0 or j < 0:
+            return ()
+        if s1[i] == s2[j]:
+            return ((i - 1, j - 1),)
+        return ((i - 1, j), (i, j - 1))
+    return children
+
+
+def _table_bytes(rows, cols, largest_value):
+    # JSON size of a rows x cols table of values up to largest_value
+    return rows * (cols * (len(str(largest_value)) + 1) + 2)
+
+
+def _recursive_steps(root, expand, options, too_many, too_many_shared):
+    '''
+    (steps, exact) of a recursive trace, from the recursion tree expand() walks down from 'root', with each
+    distinct subtree traced once if options['dedup']. A tree with too many states to walk is charged
+    'too_many' steps, or 'too_many_shared' with dedup, and isn't exact.
+    '''
+    try:
+        if options.get('dedup'):
+            return _shared_tree_steps(root, expand), True
+        return _tree_total(root, expand), True
+    except _TooManyStates:
+        return (too_many_shared if options.get('dedup') else too_many), False
+
+
+def _snapshots(iterations, options):
+    # How many iteration events carry a full table or memo with these options
+    if options.get('encoding', 'full') == 'delta':
+        return iterations // options.get('keyframe_interval', DEFAULT_KEYFRAME_INTERVAL)
+    return iterations
+
+
+def _fill(rows, cols, options):
+    '''
+    Events traced while filling a rows x cols table at the options' granularity, how many of them carry
+    a full table and how many cell values go out in delta 'spans' instead.
+    '''
+    cells = rows * cols
+    granularity = options.get('granularity', 'cell')
+    if granularity == 'cell' or cells == 0:
+        return cells, _snapshots(cells, options), 0
+    if granularity == 'row':
+        events = rows
+    elif granularity == 'diagonal':
+        events = rows + cols - 1
+    else:
+        events = -(-cells // options.get('stride', DEFAULT_STRIDE))
+    return events, _snapshots(events, options), cells if options.get('encoding', 'full') == 'delta' else 0
+
+
+def _fibonacci(algorithm_type, params, options):
+    n = params['n']
+    if algorithm_type == 'recursive' and options.get('dedup'):
+        # fib(k) for k >= 2 is traced once as call + return and called twice, fib(1) and fib(0) are base cases
+        return (2 if n <= 1 else 3 * n), 0, True
+    if algorithm_type == 'recursive':
+        # F(n + 1) is about phi^(n + 1) / sqrt(5). Past the cap there's no need to work out the exact number,
+        # which for a large n takes longer than the budget check is worth.
+        if (n + 1) * math.log10((1 + math.sqrt(5)) / 2) > math.log10(MAX_ESTIMATE) + 1:
+            return MAX_ESTIMATE, 0, False
+        return 2 * (2 * _fib(n + 1) - 1), 0, True
+    if algorithm_type == 'fast_doubling':
+        # one step per bit of n, each with two values of at most DEFAULT_MAX_DIGITS digits or their summary
+        return max(n.bit_length(), 1) + 2, 0, True, FAST_DOUBLING_SECONDS * max(n, 1) ** math.log2(3)
+    if algorithm_type == 'memoization':
+        steps = 4 if n <= 1 else 6 * n
+        # digits of the memo values grow linearly, so an average entry has about n / 10 of them
+        memo_bytes = _snapshots(steps // 3, options) * (n // 2) * (MEMO_ENTRY_BYTES + n // 10)
+        return steps, memo_bytes, True
+    if n == 0:
+        return 1, 0, True
+    # F(k) has about 0.21 * k digits, so the table is about 0.1 * n^2 + n bytes when full
+    table = int(0.105 * n * n) + n
+    iterations, snapshots, spanned = _fill(1, n - 1, options)
+    return iterations + 3, (snapshots // 3 + 2) * table + spanned * (int(0.105 * n) + 1), True
+
+
+def _knapsack(algorithm_type, params, options):
+    weights, values, capacity = params['weights'], params['values'], params['capacity']
+    n = len(weights)
+    children = _knapsack_children(weights)
+    root = (n - 1, capacity)
+
+    if algorithm_type == 'recursive':
+        def expand(state):
+            below = children(state)
+            # call + base case, call + decision + return, or call + 4 decision events + return
+            return (2, 3, 6)[len(below)], below
+        steps, exact = _recursive_steps(root, expand, options, 6 * (2 ** (n + 1) - 1), 8 * (n + 1) * (capacity + 1))
+        return steps, 0, exact
+
+    if algorithm_type == 'memoization':
+        def expand(state):
+            below = children(state)
+            # call + miss + base case, call + miss + decision + return, or call + miss + 4 decisions + store + return.
+            # Only the last kind is stored in the memo.
+            return (3, 4, 8)[len(below)], below, len(below) == 2
+        try:
+            steps, stored, hits = _memo_steps(root, expand, rank=lambda state: state[0])
+            exact = True
+        except _TooManyStates:
+            stored = n * (capacity + 1)
+            steps, hits, exact = 8 * stored, stored, False
+        return steps, _snapshots(stored + hits, options) * (stored // 2) * MEMO_ENTRY_BYTES, exact
+
+    if algorithm_type == 'solve':
+        # one step with the answer, after filling an n x capacity table a row at a time
+        numpy = knapsack.np is not None and sum(abs(value) for value in values) <= knapsack.INT64_MAX
+        per_cell = SECONDS_PER_SOLVE_CELL_NUMPY if numpy else SECONDS_PER_SOLVE_CELL
+        return 1, 0, True, n * (capacity + 1) * per_cell
+
+    if algorithm_type == 'tabulation_1d':
+        # each item rewrites the rolling row from the capacity down to its weight
+        iterations = sum(max(capacity - weight + 1, 0) for weight in weights)
+        steps = 1 + iterations + 1 + 2 * n + 1
+        row = _table_bytes(1, capacity + 1, sum(values))
+        return steps, (_snapshots(iterations, options) + 2) * row, False
+
+    # at most one included item per traceback step, counted as if every item were included
+    iterations, snapshots, spanned = _fill(n, capacity, options)
+    steps = 1 + iterations + 1 + 2 * n + 1
+    table = _table_bytes(n + 1, capacity + 1, sum(values))
+    return steps, (snapshots + 2) * table + spanned * (len(str(sum(values))) + 1), False
+
+
+def _lcs(algorithm_type, params, options):
+    s1, s2 = params['s1'], params['s2']
+    m, n = len(s1), len(s2)
+    children = _lcs_children(s1, s2)
+    root = (m - 1, n - 1)
+
+    if algorithm_type == 'recursive':
+        def expand(state):
+            below = children(state)
+            # call + base case, or call + match/mismatch + return
+            return (3 if below else 2), below
+        steps, exact = _recursive_steps(root, expand, options, 3 * 2 ** (m + n), 5 * (m + 1) * (n + 1))
+        return steps, 0, exact
+
+    if algorithm_type == 'memoization':
+        def expand(state):
+            below = children(state)
+            # call + miss + base case (not stored), or call + miss + match/mismatch + store
+            return (4 if below else 3), below, bool(below)
+        try:
+            steps, stored, hits = _memo_steps(root, expand, rank=lambda state: state[0] + state[1])
+            exact = True
+        except _TooManyStates:
+            stored = (m + 1) * (n + 1)
+            steps, hits, exact = 4 * stored, stored, False
+        return steps, _snapshots(stored + hits, options) * (stored // 2) * MEMO_ENTRY_BYTES, exact
+
+    if algorithm_type == 'bitparallel':
+        # one event per character of the longer string, each with a hex digit per 4 columns of the shorter one
+        longer, shorter = max(m, n), min(m, n)
+        return longer + 2, longer * (shorter // 4 + 1), True
+
+    if algorithm_type == 'hirschberg':
+        # a binary tree of subproblems with at most one leaf per row of the longer string, and score rows
+        # as wide as the shorter one whose widths add up to about that on every level of the tree
+        longer, shorter = max(m, n), min(m, n)
+        levels = math.ceil(math.log2(longer)) + 1 if longer > 1 else 1
+        rows_bytes = 2 * levels * (shorter + 1 + longer) * (len(str(shorter)) + 1)
+        return 2 * max(longer, 1) + 1, rows_bytes, False, m * n * SECONDS_PER_HIRSCHBERG_CELL
+
+    # the traceback takes at most m + n steps, with up to min(m, n) matches
+    iterations, snapshots, spanned = _fill(m, n, options)
+    steps = 1 + iterations + 1 + m + n + min(m, n) + 1
+    table = _table_bytes(m + 1, n + 1, min(m, n))
+    return steps, (snapshots + 2) * table + spanned * (len(str(min(m, n))) + 1), False
+
+
+def _declared_calls(declared):
+    # expand() for the recursion tree of a declaration, as if every call traced an expand event and an event
+    # per subproblem on top of its call and return
+    def expand(state):
+        if declared.is_base(state):
+            return 2, ()
+        below = tuple(declared.subproblems(state))
+        return 2 + 2 * len(below), below
+    return expand
+
+
+def _declared_memo_steps(declared, expand):
+    '''
+    (steps, states stored, cache hits) of a declaration's memoized trace, as if every repeated call to a
+    stored state were a cache hit.
+    '''
+    states = _distinct_states(declared.root(), expand)
+    calls = dict.fromkeys(states, 0)
+    calls[declared.root()] = 1
+    for _, below in states.values():
+        for child in below:
+            calls[child] += 1
+    steps = stored = hits = 0
+    for state, (own, _) in states.items():
+        # a cache miss and a store on top of the recursion's events, then a call + cache hit per repeat
+        if declared.memoizes(state):
+            steps += own + 2 + 2 * (calls[state] - 1)
+            stored += 1
+            hits += calls[state] - 1
+        else:
+            steps += (own + 1) * calls[state]
+    return steps, stored, hits
+
+
+def _declared(problem, algorithm_type, params, options):
+    '''
+    Estimate for a problem without an estimator in ESTIMATORS, from the DPProblem declaration it registered
+    (see registry.declare()). The recursion is counted over its distinct states as if every call traced an
+    expand event and an event per subproblem, the memoized trace as if every repeated call were a cache hit,
+    and tabulation fills table_shape(). Other algorithms, and problems without a declaration, are charged a
+    step per table cell, the table being as large as the params (ints by their value, sequences by their
+    length). Never exact.
+    '''
+    declared = declaration(problem, params)
+    if declared is None:
+        cells = math.prod((value if isinstance(value, int) else len(value)) + 1 for value in params.values())
+        return cells, 0, False
+    shape = declared.table_shape()
+    rows, cols = shape if len(shape) == 2 else (1, shape[0])
+    expand = _declared_calls(declared)
+
+    if algorithm_type == 'recursive':
+        steps, _ = _recursive_steps(declared.root(), expand, options, MAX_ESTIMATE, 8 * rows * cols)
+        return steps, 0, False
+
+    if algorithm_type == 'memoization':
+        try:
+            steps, stored, hits = _declared_memo_steps(declared, expand)
+        except _TooManyStates:
+            stored = rows * cols
+            steps, hits = 8 * stored, stored
+        return steps, _snapshots(stored + hits, options) * (stored // 2) * MEMO_ENTRY_BYTES, False
+
+    if algorithm_type == 'tabulation':
+        filled = (rows - 1, cols - 1) if len(shape) == 2 else (1, max(cols - declared.first_cell, 0))
+        iterations, snapshots, spanned = _fill(*filled, options)
+        # the answer is read off in at most a step per row and column
+        steps = 1 + iterations + rows + cols + 1
+        table = rows * (cols * CELL_BYTES + 2)
+        return steps, (snapshots + 2) * table + spanned * CELL_BYTES, False
+
+    return rows * cols, 0, False
+
+
+ESTIMATORS = {
+    'fibonacci' : _fibonacci,
+    'knapsack' : _knapsack,
+    'lcs' : _lcs,
+}
+
+
+def _dimensions(problem):
+    # dimensions of the problem's tabulation table, 2 unless its declaration says otherwise
+    registered = PROBLEMS.get(problem)
+    if registered is None or registered.declaration is None:
+        return 2
+    return registered.declaration.dimensions
+
+
+def estimate(problem, algorithm_type, params, options=None):
+    '''
+    Predicts the cost of an execution: {'steps', 'bytes', 'seconds', 'exact'}. 'exact' is False when the
+    step count is an upper bound rather than the exact count.
+    The problem's estimator returns (steps, snapshot bytes, exact), followed by the seconds of untraced
+    work for algorithms that compute much more than they trace.
+    Raises a KeyError for an unknown problem, KeyError/TypeError for missing or malformed params and a
+    ValueError for options the tracer would reject.
+    Problems without an estimator in ESTIMATORS are estimated from their declaration (see _declared()).
+    '''
+    options = options or {}
+    check_encoding(options.get('encoding', 'full'), options.get('keyframe_interval', DEFAULT_KEYFRAME_INTERVAL))
+    check_explanations(options.get('explanations', 'text'))
+    check_dedup(options.get('dedup', False))
+    check_granularity(options.get('granularity', 'cell'), options.get('stride', DEFAULT_STRIDE),
+                      dimensions=_dimensions(problem))
+    estimator = ESTIMATORS.get(problem, partial(_declared, problem))
+    steps, snapshot_bytes, exact, *work = estimator(algorithm_type, params, options)
+    if options.get('explanations') == 'template':
+        snapshot_bytes -= steps * 40  # explanations are about 60 bytes of text, 20 as a template
+
+    steps = min(steps, MAX_ESTIMATE)
+    size = min(max(steps * STEP_BYTES + snapshot_bytes, 0), MAX_ESTIMATE)
+    return {
+        'steps' : steps,
+        'bytes' : size,
+        'seconds' : round(steps * SECONDS_PER_STEP + size * SECONDS_PER_BYTE + sum(work), 3),
+        'exact' : exact and steps < MAX_ESTIMATE
+    }
+
+
+class Budget:
+    '''
+    Limits an execution's estimate has to stay within to be admitted.
+    '''
+
+    def __init__(self, max_steps=DEFAULT_MAX_STEPS, max_bytes=DEFAULT_MAX_BYTES, max_seconds=DEFAULT_MAX_SECONDS):
+        self.max_steps = max_steps
+        self.max_bytes = max_bytes
+        self.max_seconds = max_seconds
+
+    def violations(self, cost):
+        '''
+        Messages for each limit the estimate goes over, empty if it fits.
+        '''
+        messages = []
+        if cost['steps'] > self.max_steps:
+            messages.append(f"about {cost['steps']} steps, over the limit of {self.max_steps}")
+        if cost['bytes'] > self.max_bytes:
+            messages.append(f"about {cost['bytes']} bytes, over the limit of {self.max_bytes}")
+        if cost['seconds'] > self.max_seconds:
+            messages.append(f"about {cost['seconds']} seconds, over the limit of {self.max_seconds}")
+        return messages
+
+    def to_dict(self):
+        return {'max_steps' : self.max_steps, 'max_bytes' : self.max_bytes, 'max_seconds' : self.max_seconds}
+
+
+def suggest_alternatives(problem, algorithm_type, params, options, budget, algorithms):
+    '''
+    Cheaper ways to run the same problem that fit the budget, cheapest first: the delta encoding for the
+    same algorithm (or subtree deduplication for a recursive one, a coarser granularity for tabulation),
+    then the other algorithms in 'algorithms'.
+    Each suggestion is {'algorithm', 'options', 'estimate'}.
+    '''
+    candidates = []
+    if algorithm_type in DELTA_ALGORITHMS and options.get('encoding', 'full') != 'delta':
+        candidates.append((algorithm_type, dict(options, encoding='delta')))
+    if algorithm_type == 'recursive' and not options.get('dedup'):
+        candidates.append((algorithm_type, dict(options, dedup=True)))
+    if algorithm_type == 'tabulation' and options.get('granularity', 'cell') == 'cell':
+        coarse = 'stride' if _dimensions(problem) == 1 else 'row'
+        candidates.append((algorithm_type, dict(options, encoding='delta', granularity=coarse)))
+    for other in algorithms:
+        if other != algorithm_type and other not in SOLVE_ALGORITHMS:
+            other_options = {'explanations' : options['explanations']} if 'explanations' in options else {}
+            if other in DELTA_ALGORITHMS:
+                other_options['encoding'] = 'delta'
+            candidates.append((other, other_options))
+
+    suggestions = []
+    for candidate, candidate_options in candidates:
+        cost = estimate(problem, candidate, params, candidate_options)
+        if not budget.violations(cost):
+            suggestions.append({'algorithm' : candidate, 'options' : candidate_options, 'estimate' : cost})
+    suggestions.sort(key=lambda suggestion: suggestion['estimate']['seconds'])
+    return suggestions
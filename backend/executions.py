@@ -0,0 +1,58 @@
+'''
+Registry of recent executions, so a client can come back to a trace it was sent.
+
+An Execution only remembers the request that produced the trace. The steps themselves live in the trace
+cache or the on-disk store and are looked up (or traced again) when the client seeks into them.
+'''
+import threading
+from collections import OrderedDict
+
+
+MAX_EXECUTIONS = 1024
+
+
+class Execution:
+    '''
+    The request behind one execution id, plus the keyframe positions found in its trace so far.
+    '''
+
+    def __init__(self, execution_id, problem, algorithm_type, params, options, storage='memory', wire_format='json',
+                 sid=None):
+        self.execution_id = execution_id
+        self.sid = sid
+        self.problem = problem
+        self.algorithm_type = algorithm_type
+        self.params = params
+        self.options = options
+        self.storage = storage
+        self.wire_format = wire_format
+        self.keyframes = {}  # 'table' / 'memo' -> sorted step indexes carrying it
+        self.running = True  # still being traced or sent
+
+
+class ExecutionRegistry:
+    '''
+    Keeps the most recent 'max_executions' executions by id, forgetting the oldest first.
+    '''
+
+    def __init__(self, max_executions=MAX_EXECUTIONS):
+        self.max_executions = max_executions
+        self._executions = OrderedDict()
+        self._lock = threading.Lock()
+
+    def add(self, execution):
+        with self._lock:
+            self._executions[execution.execution_id] = execution
+            self._executions.move_to_end(execution.execution_id)
+            while len(self._executions) > self.max_executions:
+                self._executions.popitem(last=False)
+
+    def get(self, execution_id):
+        with self._lock:
+            return self._executions.get(execution_id)
+
+    def __len__(self):
+        return len(self._executions)
+
+    def __contains__(self, execution_id):
+        return execution_id in self._executions
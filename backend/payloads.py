@@ -0,0 +1,117 @@
+'''
+Pre-serialized trace payloads.
+
+Every emit of a step dict makes Flask-SocketIO run json.dumps on it again, for every client. A PayloadBuffer
+holds a completed trace already serialized (as JSON text or as backend.wire binary steps) in one contiguous
+bytearray with an offset index, so it can be replayed to any number of clients as raw bytes. Batches are
+built by joining the stored payloads, which is a copy rather than another round of encoding.
+'''
+import json
+from array import array
+
+from backend.wire import StepCodec, COUNT
+
+
+_dumps = json.JSONEncoder(separators=(',', ':')).encode
+_codec = StepCodec()
+
+
+def encode_payloads(steps, wire_format='json'):
+    '''
+    Serializes each step on its own, yielding the bytes of one step at a time.
+    '''
+    if wire_format == 'binary':
+        for step in steps:
+            yield _codec.encode_step(step)
+    else:
+        for step in steps:
+            yield _dumps(step).encode('utf-8')
+
+
+def join_batch(payloads, wire_format='json'):
+    '''
+    Packs serialized steps into one batch: a JSON array, or a binary batch as written by StepCodec.encode_steps().
+    '''
+    if wire_format == 'binary':
+        return COUNT.pack(len(payloads)) + b''.join(payloads)
+    return b'[' + b','.join(payloads) + b']'
+
+
+def decode_payload(payload, wire_format='json'):
+    '''
+    Turns one serialized step back into a step dict.
+    '''
+    if wire_format == 'binary':
+        return _codec.decode_step(payload)[0]
+    return json.loads(payload)
+
+
+class DecodedTrace:
+    '''
+    Random access view over stored payloads (a PayloadBuffer or a DiskTrace) that decodes steps on access.
+    '''
+
+    def __init__(self, payloads, wire_format='json'):
+        self.payloads = payloads
+        self.wire_format = wire_format
+
+    def __len__(self):
+        return len(self.payloads)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [decode_payload(payload, self.wire_format) for payload in self.payloads[index]]
+        return decode_payload(self.payloads[index], self.wire_format)
+
+    def __iter__(self):
+        for payload in self.payloads:
+            yield decode_payload(payload, self.wire_format)
+
+
+class PayloadBuffer:
+    '''
+    Append-only store of serialized steps: one bytearray plus the offset where each step starts.
+    '''
+
+    def __init__(self, payloads=None):
+        self._data = bytearray()
+        self._offsets = array('Q', [0])
+
+        if payloads is not None:
+            self.extend(payloads)
+
+    def append(self, payload):
+        self._data += payload
+        self._offsets.append(len(self._data))
+
+    def extend(self, payloads):
+        for payload in payloads:
+            self.append(payload)
+
+    def payload(self, index):
+        '''
+        The serialized bytes of the step at 'index'.
+        '''
+        return bytes(self._data[self._offsets[index]:self._offsets[index + 1]])
+
+    def nbytes(self):
+        return len(self._data) + self._offsets.itemsize * len(self._offsets)
+
+    def clear(self):
+        self.__init__()
+
+    def __len__(self):
+        return len(self._offsets) - 1
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self.payload(k) for k in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError('PayloadBuffer index out of range')
+        return self.payload(index)
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self.payload(index)
@@ -0,0 +1,186 @@
+'''
+Server-side paced playback of a trace.
+
+Instead of sending the trace as fast as the socket allows and leaving the client to buffer and pace it,
+a Playback keeps a cursor into the already generated trace and sends the steps as they fall due at the
+client's speed (steps per second). The client only ever holds the steps it has been shown so far, and
+pausing, resuming or changing the speed just moves the cursor's schedule, nothing is traced again.
+
+Steps are sent at most every TICK seconds, so a fast playback sends a few steps at a time rather than
+waking up for every one.
+'''
+import threading
+import time
+
+
+DEFAULT_SPEED = 10
+MAX_SPEED = 10000
+TICK = 0.05
+MAX_STEPS_PER_TICK = 5000
+
+
+def check_speed(speed):
+    '''
+    Raises a ValueError unless speed is a number of steps per second between 0 and MAX_SPEED.
+    '''
+    if isinstance(speed, bool) or not isinstance(speed, (int, float)) or not 0 < speed <= MAX_SPEED:
+        raise ValueError(f'speed must be a number of steps per second greater than 0 and at most {MAX_SPEED}.')
+
+
+def parse_playback(data):
+    '''
+    Reads and validates 'playback_speed' from an execute_algorithm payload.
+    Returns None when the client didn't ask for playback.
+    '''
+    if 'playback_speed' not in data:
+        return None
+    speed = data['playback_speed']
+    check_speed(speed)
+    if 'batch_size' in data:
+        raise ValueError('playback_speed and batch_size can not be combined.')
+    if data.get('preserialized'):
+        raise ValueError('playback_speed and preserialized can not be combined.')
+    return speed
+
+
+class Playback:
+    '''
+    Cursor over one execution's trace that is sent to a client at 'speed' steps per second.
+
+    'steps' must support len() and slicing (a TraceBuffer or DecodedTrace). send(playback, start, steps)
+    emits the steps from position 'start' on, finish(playback, error) is called once the last step has
+    been sent (error is None) or sending failed. A stopped playback is not finished.
+    '''
+
+    def __init__(self, execution_id, sid, steps, send, finish, speed=DEFAULT_SPEED, wire_format='json',
+                 clock=time.monotonic):
+        check_speed(speed)
+        self.execution_id = execution_id
+        self.sid = sid
+        self.steps = steps
+        self.speed = speed
+        self.send = send
+        self.finish = finish
+        self.wire_format = wire_format
+        self.cursor = 0  # position of the next step to send
+        self.paused = False
+        self.done = False
+        self.stopped = False
+        self._clock = clock
+        self._base = (0, clock())  # cursor and time from which steps fall due at the current speed
+        self._condition = threading.Condition()
+        self._thread = None
+
+    def _due(self, now):
+        # position up to which steps should have been sent by now
+        base_cursor, base_time = self._base
+        return min(len(self.steps), base_cursor + int((now - base_time) * self.speed))
+
+    def _wait_time(self):
+        '''
+        Seconds until the next step falls due, 0 if one is due now, None while paused. Must hold the condition.
+        '''
+        if self.paused:
+            return None
+        now = self._clock()
+        if self._due(now) > self.cursor or self.cursor >= len(self.steps):
+            return 0
+        base_cursor, base_time = self._base
+        next_time = base_time + (self.cursor + 1 - base_cursor) / self.speed
+        return max(next_time - now, TICK)
+
+    def tick(self):
+        '''
+        Sends the steps that have fallen due since the last tick. Returns False once the playback is over.
+        '''
+        with self._condition:
+            if self.done:
+                return False
+            if self.paused:
+                return True
+            start = self.cursor
+            stop = min(self._due(self._clock()), start + MAX_STEPS_PER_TICK)
+            self.cursor = stop
+            last = stop >= len(self.steps)
+            if last:
+                self.done = True
+
+        if stop > start:
+            self.send(self, start, self.steps[start:stop])
+        if last and not self.stopped:
+            self.finish(self, None)
+        return not last
+
+    def _run(self):
+        while True:
+            with self._condition:
+                if self.done:
+                    return
+                wait = self._wait_time()
+                if wait != 0:
+                    self._condition.wait(wait)
+                    continue
+            try:
+                if not self.tick():
+                    return
+            except Exception as e:
+                with self._condition:
+                    self.done = True
+                if not self.stopped:
+                    self.finish(self, e)
+                return
+
+    def start(self):
+        '''
+        Starts sending from the cursor on a thread of its own.
+        '''
+        with self._condition:
+            self._base = (self.cursor, self._clock())
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def join(self, timeout=None):
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def pause(self):
+        with self._condition:
+            self.paused = True
+            self._condition.notify_all()
+
+    def resume(self):
+        with self._condition:
+            if self.paused:
+                # steps fall due from now on, the pause doesn't turn into a burst
+                self._base = (self.cursor, self._clock())
+            self.paused = False
+            self._condition.notify_all()
+
+    def set_speed(self, speed):
+        '''
+        Changes the speed from the current cursor on. Raises a ValueError for an invalid speed.
+        '''
+        check_speed(speed)
+        with self._condition:
+            self._base = (self.cursor, self._clock())
+            self.speed = speed
+            self._condition.notify_all()
+
+    def stop(self):
+        '''
+        Stops sending, without calling finish().
+        '''
+        with self._condition:
+            self.done = self.stopped = True
+            self._condition.notify_all()
+
+    def state(self):
+        with self._condition:
+            return {
+                'execution_id' : self.execution_id,
+                'cursor' : self.cursor,
+                'total_steps' : len(self.steps),
+                'speed' : self.speed,
+                'paused' : self.paused,
+                'done' : self.done
+            }
@@ -0,0 +1,255 @@
+'''
+Fair emission of concurrent trace streams.
+
+Every running execution is a TraceStream registered with the StreamScheduler. Taking a batch out of a
+stream can block (on a tracer worker, the disk, ...), so that is left to the thread of the client that
+owns the stream (see feed()), which hands the batch over and takes the next one once it has gone out.
+
+Sending is shared: one dispatcher at a time sends the batches that have been handed over, in deficit
+round robin order. On each turn a stream may send up to 'quantum' * weight steps before the next stream
+gets its turn, so a small trace started while a large one is streaming is done after a few turns instead
+of waiting behind it. Streams without a batch ready are skipped, never waited on.
+
+Flow controlled streams also count against their session's in-flight limit, the batches the client has
+been sent but not yet acknowledged across all of its streams.
+'''
+import threading
+from collections import deque
+
+
+DEFAULT_QUANTUM = 100
+DEFAULT_MAX_IN_FLIGHT = 16
+
+
+class _Entry:
+    '''
+    A registered stream with its weight, the steps it may still send on its current turn and the batch
+    waiting to be sent, if any.
+    '''
+
+    __slots__ = ('stream', 'weight', 'deficit', 'batch', 'sent')
+
+    def __init__(self, stream, weight):
+        self.stream = stream
+        self.weight = weight
+        self.deficit = 0
+        self.batch = None  # (seq, steps, error, last)
+        self.sent = threading.Event()  # set once 'batch' has gone out, or the stream was removed
+
+
+class StreamScheduler:
+    '''
+    Interleaves batches from every active stream, keyed by execution id.
+
+    send(stream, seq, steps) emits one batch. finish(stream, error) is called after a stream's last batch
+    has been sent (error is None) or once taking a batch from it failed.
+    '''
+
+    def __init__(self, send, finish, quantum=DEFAULT_QUANTUM, max_in_flight=DEFAULT_MAX_IN_FLIGHT):
+        if quantum < 1 or max_in_flight < 1:
+            raise ValueError('quantum and max_in_flight must be at least 1.')
+        self.send = send
+        self.finish = finish
+        self.quantum = quantum
+        self.max_in_flight = max_in_flight
+        self.batches_sent = 0
+        self.steps_sent = 0
+        self._entries = {}
+        self._order = deque()  # execution ids, the stream whose turn it is first
+        self._lock = threading.Lock()
+        self._dispatching = threading.Lock()
+
+    def add(self, stream, weight=1):
+        '''
+        Registers a stream. A stream with weight 2 gets twice as many steps per turn as one with weight 1.
+        Raises a ValueError if a stream with the same execution id is already registered.
+        '''
+        if weight <= 0:
+            raise ValueError('weight must be positive.')
+        with self._lock:
+            if stream.execution_id in self._entries:
+                raise ValueError(f"Execution '{stream.execution_id}' is already running.")
+            self._order.append(stream.execution_id)
+            self._entries[stream.execution_id] = _Entry(stream, weight)
+
+    def get(self, execution_id):
+        entry = self._entries.get(execution_id)
+        return entry.stream if entry is not None else None
+
+    def remove(self, execution_id):
+        '''
+        Unregisters a stream and returns it, or None if it wasn't registered. A batch it had waiting is dropped.
+        '''
+        with self._lock:
+            entry = self._entries.pop(execution_id, None)
+            if entry is None:
+                return None
+            self._order.remove(execution_id)
+        entry.sent.set()
+        return entry.stream
+
+    def remove_session(self, sid):
+        '''
+        Unregisters and returns every stream of a session.
+        '''
+        with self._lock:
+            execution_ids = [execution_id for execution_id, entry in self._entries.items() if entry.stream.sid == sid]
+        streams = (self.remove(execution_id) for execution_id in execution_ids)
+        return [stream for stream in streams if stream is not None]
+
+    def __contains__(self, execution_id):
+        return execution_id in self._entries
+
+    def __len__(self):
+        return len(self._entries)
+
+    def feed(self, stream):
+        '''
+        Takes batches from the stream while it has credits, handing each to the dispatcher, and returns
+        once the stream is out of credits or steps. Must be called from the thread of the client that owns
+        the stream, as taking a batch may block.
+
+        A stream without flow control is fed until its last batch has been sent. A flow controlled one
+        keeps at most one batch waiting: if it can't go out yet, the ack that frees it feeds the stream again.
+        '''
+        while True:
+            entry = self._entries.get(stream.execution_id)
+            if entry is None:
+                return
+            if entry.batch is not None:
+                if stream.window is not None:
+                    # the waiting batch may have been held back by the in-flight limit an ack just lowered
+                    self.run()
+                    return
+                entry.sent.wait()
+                continue
+
+            with stream.lock:
+                if not stream.ready():
+                    return
+                try:
+                    seq, steps = stream.next_batch()
+                    error = None
+                except Exception as e:
+                    seq, steps, error = None, [], e
+                with self._lock:
+                    if self._entries.get(stream.execution_id) is not entry:
+                        return
+                    entry.batch = (seq, steps, error, stream.done)
+                    entry.sent.clear()
+            self.run()
+
+    def _in_flight(self):
+        # batches sent but not yet acknowledged, per session
+        in_flight = {}
+        for entry in self._entries.values():
+            stream = entry.stream
+            sent = stream.in_flight
+            if entry.batch is not None and entry.batch[1] and stream.window is not None:
+                sent -= 1  # its credit is already used up, but it hasn't gone out
+            in_flight[stream.sid] = in_flight.get(stream.sid, 0) + sent
+        return in_flight
+
+    def _can_send(self, entry, in_flight):
+        if entry.batch is None:
+            return False
+        if entry.stream.window is None or not entry.batch[1]:
+            return True
+        return in_flight.get(entry.stream.sid, 0) < self.max_in_flight
+
+    def _next_entry(self):
+        '''
+        The entry whose turn it is, or None when no stream can send. Must hold self._lock.
+        '''
+        in_flight = self._in_flight()
+        while True:
+            found = False
+            for _ in range(len(self._order)):
+                entry = self._entries[self._order[0]]
+                if self._can_send(entry, in_flight):
+                    found = True
+                    if entry.deficit <= 0:
+                        entry.deficit += self.quantum * entry.weight
+                    if entry.deficit > 0:
+                        return entry
+                else:
+                    # a stream that can't send doesn't save up steps for later
+                    entry.deficit = min(entry.deficit, 0)
+                self._order.rotate(-1)
+            if not found:
+                return None
+
+    def pending(self):
+        '''
+        True if some stream has a batch that can be sent now.
+        '''
+        with self._lock:
+            in_flight = self._in_flight()
+            return any(self._can_send(entry, in_flight) for entry in self._entries.values())
+
+    def run(self):
+        '''
+        Sends waiting batches until there are none left that can go out. Only one thread dispatches at a
+        time. If another one already is, it also sends the batches just handed over, so this returns
+        straight away.
+        '''
+        while self._dispatching.acquire(blocking=False):
+            try:
+                self._dispatch()
+            finally:
+                self._dispatching.release()
+            # a batch may have been handed over just before the lock was released
+            if not self.pending():
+                return
+
+    def _dispatch(self):
+        while True:
+            with self._lock:
+                entry = self._next_entry()
+                if entry is None:
+                    return
+                seq, steps, error, last = entry.batch
+                entry.batch = None
+
+            stream = entry.stream
+            if steps and error is None:
+                try:
+                    self.send(stream, seq, steps)
+                except Exception as e:
+                    error = e
+
+            with self._lock:
+                entry.deficit -= len(steps)
+                self.batches_sent += 1
+                self.steps_sent += len(steps)
+                if entry.deficit <= 0 and self._order and self._order[0] == stream.execution_id:
+                    self._order.rotate(-1)
+
+            if (error is not None or last) and self.remove(stream.execution_id) is not None:
+                if error is not None:
+                    stream.close()
+                self.finish(stream, error)
+            entry.sent.set()
+
+    def stats(self):
+        '''
+        Queue depth and throughput counters.
+        '''
+        with self._lock:
+            in_flight = self._in_flight()
+            entries = list(self._entries.values())
+            return {
+                'streams' : len(entries),
+                'sessions' : len(in_flight),
+                'queued' : sum(entry.batch is not None for entry in entries),
+                'ready' : sum(self._can_send(entry, in_flight) for entry in entries),
+                'throttled' : sum(entry.batch is not None and not self._can_send(entry, in_flight) for entry in entries),
+                'waiting_for_ack' : sum(not entry.stream.done and not entry.stream.ready() and entry.batch is None
+                                        for entry in entries),
+                'in_flight' : sum(in_flight.values()),
+                'max_session_in_flight' : max(in_flight.values(), default=0),
+                'max_in_flight' : self.max_in_flight,
+                'quantum' : self.quantum,
+                'batches_sent' : self.batches_sent,
+                'steps_sent' : self.steps_sent
+            }
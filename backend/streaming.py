@@ -0,0 +1,108 @@
+'''
+Batched trace streaming with credit based flow control.
+
+Instead of one 'trace_step' packet per step, a TraceStream hands out batches of steps. The
+client starts with 'window' credits, every batch sent uses one up, and the client gives
+credits back by acknowledging the batches it has consumed. The server therefore never holds
+more than the tracer's own state plus the batch being sent for each stream (and, for a tracer running
+in a worker process, the bounded number of chunks it keeps in memory, see workers.py).
+'''
+import threading
+from itertools import islice
+
+
+DEFAULT_BATCH_SIZE = 100
+MAX_BATCH_SIZE = 5000
+DEFAULT_WINDOW = 4
+MAX_WINDOW = 64
+
+
+def parse_flow_control(data):
+    '''
+    Reads and validates 'batch_size' and 'window' from an execute_algorithm payload.
+    Raises a ValueError if either is out of range.
+    '''
+    batch_size = data.get('batch_size', DEFAULT_BATCH_SIZE)
+    window = data.get('window', DEFAULT_WINDOW)
+
+    if not isinstance(batch_size, int) or not 1 <= batch_size <= MAX_BATCH_SIZE:
+        raise ValueError(f'batch_size must be an integer between 1 and {MAX_BATCH_SIZE}.')
+    if not isinstance(window, int) or not 1 <= window <= MAX_WINDOW:
+        raise ValueError(f'window must be an integer between 1 and {MAX_WINDOW}.')
+    return batch_size, window
+
+
+class TraceStream:
+    '''
+    Cursor over one execution's trace that is being sent to a client in batches.
+    A stream with window=None isn't flow controlled: it is never out of credits and ignores acks.
+    '''
+
+    def __init__(self, execution_id, sid, steps, batch_size=DEFAULT_BATCH_SIZE, window=DEFAULT_WINDOW, wire_format='json',
+                 preserialized=False):
+        self.execution_id = execution_id
+        self.sid = sid
+        self.wire_format = wire_format
+        self.preserialized = preserialized  # steps are already encoded payloads
+        self.batch_size = batch_size
+        self.window = window
+        self.credits = window  # None when the stream isn't flow controlled
+        self.seq = 0  # sequence number of the next batch
+        self.steps_sent = 0
+        self.done = False
+        self.lock = threading.Lock()
+        self._steps = iter(steps)
+
+    def ready(self):
+        return not self.done and (self.window is None or self.credits > 0)
+
+    @property
+    def in_flight(self):
+        '''
+        Batches sent that the client hasn't acknowledged yet.
+        '''
+        return 0 if self.window is None else self.window - self.credits
+
+    def next_batch(self):
+        '''
+        Takes the next batch of steps from the trace, using up one credit.
+        Returns (seq, steps). Marks the stream done once the trace runs out.
+        '''
+        steps = list(islice(self._steps, self.batch_size))
+        if len(steps) < self.batch_size:
+            self.done = True
+        if not steps:
+            return None, steps
+
+        seq = self.seq
+        self.seq += 1
+        if self.window is not None:
+            self.credits -= 1
+        self.steps_sent += len(steps)
+        return seq, steps
+
+    def ack(self, credits=1):
+        '''
+        Gives back credits for batches the client has consumed. Never grows past the window.
+        '''
+        if self.window is None:
+            return
+        self.credits = min(self.window, self.credits + max(credits, 0))
+
+    def cancel(self):
+        '''
+        Stops the stream from another handler: no further batch is started, and the tracer is closed once
+        the batch being sent (if any) is out.
+        '''
+        self.done = True
+        with self.lock:
+            self.close()
+
+    def close(self):
+        '''
+        Stops the stream and closes the tracer generator behind it.
+        '''
+        self.done = True
+        close_steps = getattr(self._steps, 'close', None)
+        if close_steps is not None:
+            close_steps()
@@ -0,0 +1,610 @@
+'''
+The recursive (yield from) versions of the recursive and memoized tracers, kept as the reference the
+explicit stack tracers are checked against.
+'''
+from backend.algorithms.tracing import StepCounter, counted, check_encoding, DEFAULT_KEYFRAME_INTERVAL
+from backend.algorithms.explanations import explainer
+
+
+def fibonacci_recursive_trace_iter(n, explanations='text'):
+    '''
+    Computes the nth fibonacci number using pure recursion and generates an execution trace.
+    
+    The trace captures the call stack, showing how the function calls itself.
+    Steps are yielded as soon as they happen, so only the current call stack is held in memory.
+    
+    Trace events for this function include:
+    - 'call' : When a function 'fib(k)' is called.
+    - 'base_case': When a base case (n <= 1) is hit.
+    - 'return' : When a function returns a value.
+    
+    With explanations='template' each 'explanation' is [template_id, *args] (see explanations.py).
+    '''
+    explain = explainer(explanations)
+    counter = StepCounter()
+    
+    def fib(k, parent_id, depth):
+        #    Create a unique ID for this specific call
+        call_id = counter.count
+        
+        # Trace Event: Function Call
+        yield {
+            'type': 'call',
+            'id': call_id,
+            'parent': parent_id,
+            'depth' : depth,
+            'n' : k,
+            'explanation': explain('fib.call', k)
+        }
+        
+        # Base case
+        if k <= 1:
+            # Trace Event: Base Case
+            yield {
+                'type': 'base_case',
+                'id': call_id,
+                'n' : k,
+                'result' : k,
+                'explanation': explain('fib.base_case', k)
+            }
+            return k
+    
+        res1 = yield from fib(k - 1, call_id, depth + 1)
+        res2 = yield from fib(k - 2, call_id, depth + 1)
+        
+        result = res1 + res2
+        
+        # Trace Event: Return
+        yield {
+            'type': 'return',
+            'id': call_id,
+            'n' : k,
+            'result' : result,
+            'explanation': explain('fib.return', k, k - 1, k - 2, res1, res2, result)
+        }
+        return result
+    
+    yield from counted(fib(n, parent_id=None, depth=0), counter)
+
+
+def fibonacci_memo_trace_iter(n, encoding='full', keyframe_interval=DEFAULT_KEYFRAME_INTERVAL, explanations='text'):
+    '''
+    Computes the nth fibonacci number using memoization and generates an execution trace.
+    
+    The trace captures the memo cache is used to store and receive the results of sub-problems, avoiding
+    redundant computations.
+    
+    Trace events for this function include:
+    - 'call' : When a function 'fib(k)' is called.
+    - 'cache-hit' : When the result for 'fib(k)' is found in the cache.
+    - 'cache-miss' : When the result for 'fib(k)' is not found in the cache.
+    - 'store-result' : When a new result is stored in the cache.
+    - 'base_case': When a base case (n <= 1) is hit.
+    - 'return' : When a function returns a value.
+    
+    With encoding='delta' a 'store_result' carries only the new 'memo_entry' and a cache hit carries no
+    memo at all. A full 'memo' checkpoint is attached every 'keyframe_interval' stored entries.
+    
+    With explanations='template' each 'explanation' is [template_id, *args] (see explanations.py).
+    '''
+    
+    check_encoding(encoding, keyframe_interval)
+    explain = explainer(explanations)
+    delta = encoding == 'delta'
+    counter = StepCounter()
+    memo = {}
+    
+    def fib(k, parent_id, depth):
+        call_id = counter.count
+        
+        # Trace Event: Function Call
+        yield {
+            'type': 'call',
+            'id': call_id,
+            'parent': parent_id,
+            'depth' : depth,
+            'n' : k,
+            'explanation': explain('fib.memo_call', k)
+        }
+        
+        # Check Cache
+        if k in memo:
+            # Trace Event: Cache Hit
+            step = {
+                'type': 'cache-hit',
+                'id': call_id,
+                'n': k,
+                'result' : memo[k],
+                'explanation': explain('fib.cache_hit', k, memo[k])
+            }
+            if not delta:
+                step['memo'] = memo.copy()
+            yield step
+            return memo[k]
+        
+        # Trace Event: Cache Miss
+        yield {
+            'type': 'cache-miss',
+            'id': call_id,
+            'n' : k,
+            'explanation': explain('fib.cache_miss', k)
+        }
+        
+        # Base case
+        if k <= 1:
+            # Trace Event: Base Case
+            yield {
+                'type': 'base_case',
+                'id': call_id,
+                'n' : k,
+                'result' : k,
+                'explanation': explain('fib.base_case', k)
+            }
+            
+            # store the result in memo
+            memo[k] = k
+            step = {
+                'type': 'store_result',
+                'id': call_id,
+                'n' : k,
+                'result' : k,
+                'explanation': explain('fib.store_result', k, k)
+            }
+            if delta:
+                step['memo_entry'] = {'key' : k, 'value' : k}
+            if not delta or len(memo) % keyframe_interval == 0:
+                step['memo'] = memo.copy()
+            yield step
+            
+            return k
+        
+        res1 = yield from fib(k - 1, call_id, depth + 1)
+        res2 = yield from fib(k - 2, call_id, depth + 1)
+        result = res1 + res2
+        
+        memo[k] = result
+        step = {
+            'type': 'store_result',
+            'id': call_id,
+            'n' : k,
+            'result' : result,
+            'explanation': explain('fib.store_result', k, result)
+        }
+        if delta:
+            step['memo_entry'] = {'key' : k, 'value' : result}
+        if not delta or len(memo) % keyframe_interval == 0:
+            step['memo'] = memo.copy()
+        yield step
+        
+        # Trace Event: Return
+        yield {
+            'type': 'return',
+            'id': call_id,
+            'n' : k,
+            'result' : result,
+            'explanation': explain('fib.return', k, k - 1, k - 2, res1, res2, result)
+        }
+        return result
+    
+    yield from counted(fib(n, parent_id=None, depth=0), counter)
+
+
+def knapsack_recursive_trace_iter(weights, values, capacity, explanations='text'):
+    '''
+    Computes the 0/1 knapsack problem using pure recursion and generates an execution trace.
+    The trace captures the decision tree for each item, whether to include it or not.
+    Trace events for this function include:
+    - 'call' : When the function 'solve(index, capacity)' is called.
+    - 'base_case': When a base case (no items or capacity) is reached.
+    - 'decision' : When an item is skipped because its too heavy.
+    - 'decision_start' : Marks the beginning of exploring a branch
+    - 'decision_end' : Marks the end of exploring a branch.
+    - 'return' : When a function returns a value.
+    
+    With explanations='template' each 'explanation' is [template_id, *args] (see explanations.py).
+    '''
+    explain = explainer(explanations)
+    counter = StepCounter()
+    n = len(weights)
+    
+    def solve(index, current_capacity, parent_id, depth):
+        #    Create a unique ID for this specific call
+        call_id = counter.count
+        
+        # Trace Event: Function Call
+        yield {
+            'type': 'call',
+            'id': call_id,
+            'parent': parent_id,
+            'depth' : depth,
+            'index' : index,
+            'capacity' : current_capacity,
+            'explanation': explain('knapsack.call', index, current_capacity)
+        }
+        
+        # Base case
+        if index < 0 or current_capacity <= 0:
+            # Trace Event: Base Case
+            yield {
+                'type': 'base_case',
+                'id': call_id,
+                'result' : 0,
+                'explanation': explain('knapsack.base_case')
+            }
+            return 0
+        
+        # Item too heavy
+        if weights[index] > current_capacity:
+            # Trace Event: Skip Decision
+            yield {
+                'type': 'decision',
+                'id': call_id,
+                'decision' : 'skip',
+                'explanation': explain('knapsack.skip', index, weights[index])
+            }
+    
+            result = yield from solve(index - 1, current_capacity, call_id, depth + 1)
+        else:
+            # Don't include the current item
+            # Trace Event: Exclude Decision Start
+            yield {
+                'type': 'decision_start',
+                'id': call_id,
+                'branch' : 'exclude'
+            }
+            value_without_item = yield from solve(index - 1, current_capacity, call_id, depth + 1)
+            # Trace Event: Exclude Decision End
+            yield {
+                'type': 'decision_end',
+                'id': call_id,
+                'branch' : 'exclude',
+                'value' : value_without_item
+            }
+            
+            # Include the current item
+            # Trace Event: Exclude Decision Start
+            yield {
+                'type': 'decision_start',
+                'id': call_id,
+                'branch' : 'exclude'
+            }
+            included = yield from solve(index - 1, current_capacity - weights[index], call_id, depth + 1)
+            value_with_item = values[index] + included
+            # Trace Event: Exclude Decision End
+            yield {
+                'type': 'decision_end',
+                'id': call_id,
+                'branch' : 'exclude',
+                'value' : value_with_item
+            }
+            
+            result = max(value_without_item, value_with_item)
+        
+        # Trace Event: Return
+        yield {
+            'type': 'return',
+            'id': call_id,
+            'result' : result,
+            'explanation': explain('knapsack.return', index, current_capacity, result)
+        }
+        return result
+    
+    yield from counted(solve(n - 1, capacity,  parent_id=None, depth=0), counter)
+
+
+def knapsack_memo_trace_iter(weights, values, capacity, encoding='full', keyframe_interval=DEFAULT_KEYFRAME_INTERVAL,
+                             explanations='text'):
+    '''
+    Computes the 0/1 knapsack problem using pure recursion and generates an execution trace.
+    The trace captures the decision tree for each item, whether to include it or not.
+    
+    Trace events for this function include:
+    - 'call' : When a function 'fib(k)' is called.
+    - 'cache_hit' : When the result for a state is found in the cache.
+    - 'cache_miss' : When the result for a state is not found in the cache.
+    - 'store_result' : When a new result is stored in the cache.
+    - 'base_case': When a base case is reached.
+    - 'return' : When a function returns a value.
+    
+    With encoding='delta' a 'store_result' carries only the new 'memo_entry' and a cache hit carries no
+    memo at all. A full 'memo' checkpoint is attached every 'keyframe_interval' stored entries.
+    
+    With explanations='template' each 'explanation' is [template_id, *args] (see explanations.py).
+    '''
+    check_encoding(encoding, keyframe_interval)
+    explain = explainer(explanations)
+    delta = encoding == 'delta'
+    counter = StepCounter()
+    n = len(weights)
+    memo = {}
+    json_memo = {}  # memo with string keys, kept alongside so it is JSON Serializable for frontend
+    
+    def solve(index, current_capacity, parent_id, depth):
+        #  Create a unique ID for this specific call
+        call_id = counter.count
+        state = (index, current_capacity)
+        
+        # Trace Event: Function Call
+        yield {
+            'type': 'call',
+            'id': call_id,
+            'parent': parent_id,
+            'depth' : depth,
+            'index' : index,
+            'capacity' : current_capacity,
+            'explanation': explain('knapsack.memo_call', index, current_capacity)
+        }
+        
+        if state in memo:
+            # Trace Event: Cache Hit
+            step = {
+                'type': 'cache_hit',
+                'id': call_id,
+                'state': state,
+                'result' : memo[state],
+                'explanation': explain('knapsack.cache_hit', index, current_capacity)
+            }
+            if not delta:
+                step['memo'] = json_memo.copy()
+            yield step
+            return memo[state]
+        
+        # Trace Event: Cache Miss
+        yield {
+            'type': 'cache_miss',
+            'id': call_id,
+            'state' : state,
+            'explanation': explain('knapsack.cache_miss', index, current_capacity)
+        }
+        
+        # Base case
+        if index < 0 or current_capacity <= 0:
+            # Trace Event: Base Case
+            yield {
+                'type': 'base_case',
+                'id': call_id,
+                'result' : 0,
+                'explanation': explain('knapsack.base_case')
+            }
+            return 0
+        
+        # Item too heavy
+        if weights[index] > current_capacity:
+            # Trace Event: Skip Decision
+            yield {
+                'type': 'decision',
+                'id': call_id,
+                'decision' : 'skip',
+                'explanation': explain('knapsack.skip', index, weights[index])
+            }
+    
+            result = yield from solve(index - 1, current_capacity, call_id, depth + 1)
+        else:
+            # Don't include the current item
+            # Trace Event: Exclude Decision Start
+            yield {
+                'type': 'decision_start',
+                'id': call_id,
+                'branch' : 'exclude'
+            }
+            value_without_item = yield from solve(index - 1, current_capacity, call_id, depth + 1)
+            # Trace Event: Exclude Decision End
+            yield {
+                'type': 'decision_end',
+                'id': call_id,
+                'branch' : 'exclude',
+                'value' : value_without_item
+            }
+            
+            # Include the current item
+            # Trace Event: Exclude Decision Start
+            yield {
+                'type': 'decision_start',
+                'id': call_id,
+                'branch' : 'exclude'
+            }
+            included = yield from solve(index - 1, current_capacity - weights[index], call_id, depth + 1)
+            value_with_item = values[index] + included
+            # Trace Event: Exclude Decision End
+            yield {
+                'type': 'decision_end',
+                'id': call_id,
+                'branch' : 'exclude',
+                'value' : value_with_item
+            }
+            
+            result = max(value_without_item, value_with_item)
+            memo[state] = result
+            json_memo[str(state)] = result
+            step = {
+                'type': 'store_result',
+                'id': call_id,
+                'result' : result,
+                'explanation': explain('knapsack.store_result', index, current_capacity)
+            }
+            if delta:
+                step['memo_entry'] = {'key' : str(state), 'value' : result}
+            if not delta or len(memo) % keyframe_interval == 0:
+                step['memo'] = json_memo.copy()
+            yield step
+        
+        # Trace Event: Return
+        yield {
+            'type': 'return',
+            'id': call_id,
+            'result' : result,
+            'explanation': explain('knapsack.return', index, current_capacity, result)
+        }
+        return result
+    
+    yield from counted(solve(n - 1, capacity,  parent_id=None, depth=0), counter)
+
+
+def lcs_recursive_trace_iter(s1, s2, explanations='text'):
+    '''
+    Finds the length of the longest common subsequence using pure recursion and generates an execution trace
+    
+    Trace events for this function include:
+    - 'call' : When the function 'solve(index, capacity)' is called.
+    - 'base_case': When a base case (no items or capacity) is reached.
+    - 'match' : When characters s1[i] and s2[j] are the same
+    - 'mismatch' : When characters do not match, initiated two recursive branches.
+    - 'return' : When a function returns a value.
+    
+    With explanations='template' each 'explanation' is [template_id, *args] (see explanations.py).
+    '''
+    
+    explain = explainer(explanations)
+    counter = StepCounter()
+    
+    def solve(i, j, parent_id, depth):
+        call_id = counter.count
+        
+        # Trace Event: Function Call
+        yield {
+            'type': 'call',
+            'id': call_id,
+            'parent': parent_id,
+            'depth' : depth,
+            'i' : i,
+            'j' : j,
+            'explanation': explain('lcs.call', i, j)
+        }
+        
+        # Base Case
+        if i < 0 or j < 0:
+            # Trace Event: Base Case
+            yield {
+                'type' : 'base_case',
+                'id' : call_id,
+                'result' : 0
+            }
+            return 0
+        
+        # Match Case
+        if s1[i] == s2[j]:
+            # Trace Event: Match
+            yield {
+                'type' : 'match',
+                'id' : call_id,
+                'char' : s1[i]
+            }
+            result = 1 + (yield from solve(i - 1, j - 1, call_id, depth + 1))
+            
+        else:
+            # Trace Event: Mismatch
+            yield {'type' : 'mismatch', 'id' : call_id}
+            res1 = yield from solve(i - 1, j, call_id, depth + 1)
+            res2 = yield from solve(i, j - 1, call_id, depth + 1)
+            result = max(res1, res2)
+
+        yield {
+            'type' : 'return',
+            'id' : call_id,
+            'result' : result
+        }
+        
+        return result
+    
+    yield from counted(solve(len(s1) - 1, len(s2) - 1, parent_id=None, depth=0), counter)
+
+
+def lcs_memo_trace_iter(s1, s2, encoding='full', keyframe_interval=DEFAULT_KEYFRAME_INTERVAL, explanations='text'):
+    '''
+    Finds the length of the longest common subsequence using pure recursion and generates an execution trace
+    
+    Trace events for this function include:
+    - 'cache_hit' : When the result for the state (i, j) is found in the cache.
+    - 'cache_miss' : When the result for the state (i, j) is not found in the cache.
+    - 'store_result' : When a new result is stored in the cache.
+    
+    With encoding='delta' a 'store_result' carries only the new 'memo_entry' and a cache hit carries no
+    memo at all. A full 'memo' checkpoint is attached every 'keyframe_interval' stored entries.
+    
+    With explanations='template' each 'explanation' is [template_id, *args] (see explanations.py).
+    '''
+    check_encoding(encoding, keyframe_interval)
+    explain = explainer(explanations)
+    delta = encoding == 'delta'
+    counter = StepCounter()
+    memo = {}
+    json_memo = {}  # memo with string keys, kept alongside so it is JSON Serializable for frontend
+    
+    def solve(i, j, parent_id, depth):
+        call_id = counter.count
+        state = (i, j)
+        
+        # Trace Event: Function Call
+        yield {
+            'type': 'call',
+            'id': call_id,
+            'parent': parent_id,
+            'depth' : depth,
+            'i' : i,
+            'j' : j,
+            'explanation': explain('lcs.memo_call', i, j)
+        }
+        
+        # Checking Cache
+        if state in memo:
+            # Trace Event: Cache Hit
+            step = {
+                'type': 'cache_hit',
+                'id': call_id,
+                'state': state,
+                'result' : memo[state],
+            }
+            if not delta:
+                step['memo'] = json_memo.copy()
+            yield step
+            return memo[state]
+        
+        # Trace Event: Mismatch
+        yield {
+            'type': 'cache_miss',
+            'id': call_id,
+            'state' : state,
+        }
+        
+        # Base Case
+        if i < 0 or j < 0:
+            yield {
+                'type' : 'base_case',
+                'id' : call_id,
+                'result' : 0
+            }
+            return 0
+        
+        # Match Case
+        if s1[i] == s2[j]:
+            yield {
+                'type' : 'match',
+                'id' : call_id,
+                'char' : s1[i]
+            }
+            result = 1 + (yield from solve(i - 1, j - 1, call_id, depth + 1))
+            
+        else:
+            # Trace Event: Mismatch
+            yield {'type' : 'mismatch', 'id' : call_id}
+            res1 = yield from solve(i - 1, j, call_id, depth + 1)
+            res2 = yield from solve(i, j - 1, call_id, depth + 1)
+            result = max(res1, res2)
+        
+        memo[state] = result
+        json_memo[str(state)] = result
+        step = {
+            'type': 'store_result',
+            'id': call_id,
+            'state': state,
+            'result' : result
+        }
+        if delta:
+            step['memo_entry'] = {'key' : str(state), 'value' : result}
+        if not delta or len(memo) % keyframe_interval == 0:
+            step['memo'] = json_memo.copy()
+        yield step
+        
+        return result
+    
+    yield from counted(solve(len(s1) - 1, len(s2) - 1, parent_id=None, depth=0), counter)
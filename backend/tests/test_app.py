@@ -1,5 +1,15 @@
+import json
+import os
+import tempfile
 import unittest
-from backend.app import app, socketio
+import backend.app as app_module
+from backend.app import app, socketio, STREAM_SCHEDULER, TRACE_CACHE, PLAYBACKS
+from backend.algorithms.knapsack import knapsack_tab_trace, knapsack_recursive_trace, knapsack_tab_1d_trace
+from backend.algorithms.fibonacci import fibonacci_recursive_trace, fibonacci_tab_trace
+from backend.algorithms.lcs import lcs_tab_trace
+from backend.wire import StepCodec, schemas_from_wire
+from backend.trace_store import TraceStore
+from backend.workers import TracerPool
 
 class TestSocketIOAPP(unittest.TestCase):
     
@@ -100,4 +110,472 @@ class TestSocketIOAPP(unittest.TestCase):
         self.assertEqual(final_step['result'], "GTAB")
     
     
-    
\ No newline at end of file
+    def test_execute_delta_encoding(self):
+        request_data = {
+            'problem' : 'knapsack',
+            'algorithm' : 'tabulation',
+            'params' : {
+                'weights' : [10, 20, 30],
+                'values' : [60, 100, 120],
+                'capacity' : 50
+                },
+            'encoding' : 'delta',
+            'keyframe_interval' : 16
+        }
+        self.socketio_client.emit('execute_algorithm', request_data)
+        
+        received_events = self.socketio_client.get_received()
+        steps = [event['args'][0] for event in received_events if event['name'] == 'trace_step']
+        iterations = [step for step in steps if step['type'] == 'iteration']
+        
+        self.assertTrue(all('cell' in step for step in iterations))
+        self.assertLess(sum('table' in step for step in iterations), len(iterations))
+        self.assertEqual(received_events[-1]['name'], 'execution_complete')
+    
+    
+    def test_execute_batched_with_flow_control(self):
+        request_data = {
+            'problem' : 'knapsack',
+            'algorithm' : 'tabulation',
+            'params' : {
+                'weights' : [10, 20, 30],
+                'values' : [60, 100, 120],
+                'capacity' : 50
+                },
+            'batch_size' : 10,
+            'window' : 2
+        }
+        self.socketio_client.get_received()
+        self.socketio_client.emit('execute_algorithm', request_data)
+        
+        received_events = self.socketio_client.get_received()
+        self.assertEqual(received_events[0]['name'], 'execution_started')
+        execution_id = received_events[0]['args'][0]['execution_id']
+        
+        # Only the first window of batches is sent before any ack
+        batches = [event['args'][0] for event in received_events if event['name'] == 'trace_batch']
+        self.assertEqual([batch['seq'] for batch in batches], [0, 1])
+        self.assertTrue(all(len(batch['steps']) == 10 for batch in batches))
+        
+        steps = [step for batch in batches for step in batch['steps']]
+        finished = False
+        while not finished:
+            self.socketio_client.emit('trace_ack', {'execution_id' : execution_id})
+            received_events = self.socketio_client.get_received()
+            batches = [event['args'][0] for event in received_events if event['name'] == 'trace_batch']
+            self.assertLessEqual(len(batches), 1)
+            steps.extend(step for batch in batches for step in batch['steps'])
+            finished = received_events[-1]['name'] == 'execution_complete'
+        
+        self.assertEqual(steps, knapsack_tab_trace([10, 20, 30], [60, 100, 120], 50))
+        self.assertEqual(received_events[-1]['args'][0]['steps'], len(steps))
+        self.assertNotIn(execution_id, STREAM_SCHEDULER)
+    
+    
+    def test_execute_batched_invalid_batch_size(self):
+        request_data = {
+            'problem' : 'fibonacci',
+            'algorithm' : 'tabulation',
+            'params' : {'n' : 5},
+            'batch_size' : 0
+        }
+        self.socketio_client.get_received()
+        self.socketio_client.emit('execute_algorithm', request_data)
+        
+        received_events = self.socketio_client.get_received()
+        self.assertEqual(len(received_events), 1)
+        self.assertEqual(received_events[0]['name'], 'error')
+    
+    
+    def test_execute_binary_wire_format(self):
+        request_data = {
+            'problem' : 'knapsack',
+            'algorithm' : 'tabulation',
+            'params' : {
+                'weights' : [10, 20, 30],
+                'values' : [60, 100, 120],
+                'capacity' : 50
+                },
+            'wire_format' : 'binary',
+            'batch_size' : 1000
+        }
+        self.socketio_client.get_received()
+        self.socketio_client.emit('execute_algorithm', request_data)
+        
+        received_events = self.socketio_client.get_received()
+        self.assertEqual(received_events[0]['args'][0]['wire_format'], 'binary')
+        self.assertEqual(received_events[1]['name'], 'trace_schema')
+        
+        codec = StepCodec(schemas_from_wire(received_events[1]['args'][0]))
+        batches = [event['args'][0] for event in received_events if event['name'] == 'trace_batch']
+        steps = [step for batch in batches for step in codec.decode_steps(batch['steps'])]
+        
+        expected = json.loads(json.dumps(knapsack_tab_trace([10, 20, 30], [60, 100, 120], 50)))
+        self.assertEqual(steps, expected)
+        self.assertEqual(received_events[-1]['name'], 'execution_complete')
+    
+    
+    def test_repeated_request_served_from_cache(self):
+        TRACE_CACHE.clear()
+        request_data = {'problem' : 'lcs', 'algorithm' : 'memoization', 'params' : {'s1' : "ABCBDAB", 's2' : "BDCABA"}}
+        
+        hits = TRACE_CACHE.hits
+        self.socketio_client.emit('execute_algorithm', request_data)
+        first = self.socketio_client.get_received()
+        self.socketio_client.emit('execute_algorithm', request_data)
+        second = self.socketio_client.get_received()
+        
+        self.assertEqual(TRACE_CACHE.hits, hits + 1)
+        steps = [event['args'] for event in first if event['name'] == 'trace_step']
+        self.assertEqual(steps, [event['args'] for event in second if event['name'] == 'trace_step'])
+        
+        self.socketio_client.emit('get_cache_stats')
+        stats = self.socketio_client.get_received()[0]['args'][0]
+        self.assertEqual(stats['entries'], 1)
+    
+    
+    def test_execute_preserialized(self):
+        TRACE_CACHE.clear()
+        request_data = {
+            'problem' : 'fibonacci',
+            'algorithm' : 'recursive',
+            'params' : {'n' : 6},
+            'preserialized' : True,
+            'batch_size' : 8,
+            'window' : 64
+        }
+        expected = json.loads(json.dumps(fibonacci_recursive_trace(6)))
+        hits = TRACE_CACHE.hits
+        self.socketio_client.get_received()
+        
+        for _ in range(2):
+            self.socketio_client.emit('execute_algorithm', request_data)
+            received_events = self.socketio_client.get_received()
+            batches = [event['args'][0] for event in received_events if event['name'] == 'trace_batch']
+            steps = [step for batch in batches for step in json.loads(batch['steps'])]
+            self.assertEqual(steps, expected)
+            self.assertEqual(received_events[-1]['name'], 'execution_complete')
+        
+        self.assertEqual(TRACE_CACHE.hits, hits + 1)
+    
+    
+    def test_execute_disk_storage(self):
+        request_data = {
+            'problem' : 'knapsack',
+            'algorithm' : 'recursive',
+            'params' : {'weights' : [10, 20, 30], 'values' : [60, 100, 120], 'capacity' : 50},
+            'storage' : 'disk'
+        }
+        expected = json.loads(json.dumps(knapsack_recursive_trace([10, 20, 30], [60, 100, 120], 50)))
+        
+        with tempfile.TemporaryDirectory() as directory:
+            store = app_module.TRACE_STORE
+            app_module.TRACE_STORE = TraceStore(directory)
+            try:
+                self.socketio_client.get_received()
+                for _ in range(2):
+                    self.socketio_client.emit('execute_algorithm', request_data)
+                    received_events = self.socketio_client.get_received()
+                    steps = [event['args'][0] for event in received_events if event['name'] == 'trace_step']
+                    self.assertEqual(steps, expected)
+                    self.assertEqual(received_events[-1]['name'], 'execution_complete')
+                self.assertEqual(len(os.listdir(directory)), 2)
+            finally:
+                app_module.TRACE_STORE.close()
+                app_module.TRACE_STORE = store
+    
+    
+    def test_seek_step_rebuilds_delta_table(self):
+        params = {'weights' : [10, 20, 30], 'values' : [60, 100, 120], 'capacity' : 50}
+        for algorithm_type, tracer in (('tabulation', knapsack_tab_trace), ('tabulation_1d', knapsack_tab_1d_trace)):
+            request_data = {
+                'problem' : 'knapsack',
+                'algorithm' : algorithm_type,
+                'params' : params,
+                'encoding' : 'delta',
+                'keyframe_interval' : 16
+            }
+            self.socketio_client.emit('execute_algorithm', request_data)
+            execution_id = self.socketio_client.get_received()[-1]['args'][0]['execution_id']
+            full = tracer(params['weights'], params['values'], params['capacity'])
+            
+            for k in (1, 40, 90, len(full) - 5):
+                self.socketio_client.emit('seek_step', {'execution_id' : execution_id, 'step' : k})
+                state = self.socketio_client.get_received()[0]['args'][0]
+                self.assertEqual(state['step'], k)
+                self.assertEqual(state['total_steps'], len(full))
+                self.assertEqual(state['data']['type'], full[k]['type'])
+                if 'table' in full[k]:
+                    self.assertEqual(state['table'], full[k]['table'])
+            
+            self.socketio_client.emit('seek_step', {'execution_id' : execution_id, 'step' : len(full)})
+            self.assertEqual(self.socketio_client.get_received()[0]['name'], 'error')
+    
+    
+    def test_get_range(self):
+        request_data = {'problem' : 'fibonacci', 'algorithm' : 'recursive', 'params' : {'n' : 7}, 'execution_id' : 'fib-7'}
+        self.socketio_client.emit('execute_algorithm', request_data)
+        self.socketio_client.get_received()
+        
+        self.socketio_client.emit('get_range', {'execution_id' : 'fib-7', 'start' : 10, 'stop' : 20})
+        result = self.socketio_client.get_received()[0]['args'][0]
+        self.assertEqual(result['steps'], fibonacci_recursive_trace(7)[10:20])
+        
+        self.socketio_client.emit('get_range', {'execution_id' : 'unknown', 'start' : 0, 'stop' : 1})
+        self.assertEqual(self.socketio_client.get_received()[0]['name'], 'error')
+        
+        # other clients can't read it
+        other_client = socketio.test_client(app)
+        try:
+            other_client.get_received()
+            other_client.emit('get_range', {'execution_id' : 'fib-7', 'start' : 0, 'stop' : 5})
+            other_client.emit('seek_step', {'execution_id' : 'fib-7', 'step' : 3})
+            self.assertEqual([event['name'] for event in other_client.get_received()], ['error', 'error'])
+        finally:
+            other_client.disconnect()
+    
+    
+    def test_execute_templated_explanations(self):
+        request_data = {'problem' : 'fibonacci', 'algorithm' : 'tabulation', 'params' : {'n' : 5}, 'explanations' : 'template'}
+        self.socketio_client.get_received()
+        
+        self.socketio_client.emit('execute_algorithm', request_data)
+        received_events = self.socketio_client.get_received()
+        self.assertEqual(received_events[0]['name'], 'explanation_templates')
+        explanations = [event['args'][0]['explanation'] for event in received_events if event['name'] == 'trace_step']
+        
+        # The catalog is only sent once per session
+        self.socketio_client.emit('execute_algorithm', request_data)
+        self.assertNotIn('explanation_templates', [event['name'] for event in self.socketio_client.get_received()])
+        
+        self.socketio_client.emit('render_explanations', {'explanations' : explanations})
+        rendered = self.socketio_client.get_received()[0]['args'][0]['explanations']
+        self.assertEqual(rendered, [step['explanation'] for step in fibonacci_tab_trace(5)])
+    
+    
+    def test_execution_over_step_limit(self):
+        pool = app_module.TRACER_POOL
+        app_module.TRACER_POOL = TracerPool(1, max_steps=500)
+        try:
+            self.socketio_client.get_received()
+            self.socketio_client.emit('execute_algorithm',
+                                      {'problem' : 'fibonacci', 'algorithm' : 'recursive', 'params' : {'n' : 21}})
+            received_events = self.socketio_client.get_received()
+            self.assertEqual(received_events[-1]['name'], 'error')
+            self.assertIn('500 steps', received_events[-1]['args'][0]['message'])
+        finally:
+            app_module.TRACER_POOL.close()
+            app_module.TRACER_POOL = pool
+    
+    
+    def test_cancel_execution(self):
+        request_data = {
+            'problem' : 'fibonacci',
+            'algorithm' : 'recursive',
+            'params' : {'n' : 18},
+            'batch_size' : 10,
+            'window' : 1,
+            'execution_id' : 'to-cancel'
+        }
+        self.socketio_client.get_received()
+        self.socketio_client.emit('execute_algorithm', request_data)
+        self.socketio_client.get_received()
+        
+        self.socketio_client.emit('cancel_execution', {'execution_id' : 'to-cancel'})
+        received_events = self.socketio_client.get_received()
+        self.assertEqual([event['name'] for event in received_events], ['execution_cancelled'])
+        self.assertNotIn('to-cancel', STREAM_SCHEDULER)
+        
+        # No more batches after cancelling, and it can't be cancelled twice
+        self.socketio_client.emit('trace_ack', {'execution_id' : 'to-cancel'})
+        self.assertEqual(self.socketio_client.get_received()[0]['name'], 'error')
+        self.socketio_client.emit('cancel_execution', {'execution_id' : 'to-cancel'})
+        self.assertEqual(self.socketio_client.get_received()[0]['name'], 'error')
+    
+    
+    def test_new_execution_cancels_previous(self):
+        request_data = {'problem' : 'fibonacci', 'algorithm' : 'recursive', 'params' : {'n' : 18},
+                        'batch_size' : 10, 'window' : 1}
+        self.socketio_client.get_received()
+        self.socketio_client.emit('execute_algorithm', dict(request_data, execution_id='first'))
+        self.socketio_client.get_received()
+        
+        self.socketio_client.emit('execute_algorithm', dict(request_data, execution_id='second'))
+        received_events = self.socketio_client.get_received()
+        self.assertEqual(received_events[0]['name'], 'execution_cancelled')
+        self.assertEqual(received_events[0]['args'][0], {'execution_id' : 'first', 'reason' : 'replaced'})
+        self.assertNotIn('first', STREAM_SCHEDULER)
+        self.assertIn('second', STREAM_SCHEDULER)
+    
+    
+    def test_estimate_and_reject_over_budget(self):
+        request_data = {'problem' : 'fibonacci', 'algorithm' : 'recursive', 'params' : {'n' : 60}}
+        self.socketio_client.get_received()
+        
+        self.socketio_client.emit('estimate_execution', request_data)
+        assessment = self.socketio_client.get_received()[0]['args'][0]
+        self.assertFalse(assessment['admitted'])
+        self.assertIn('tabulation', [suggestion['algorithm'] for suggestion in assessment['suggestions']])
+        
+        self.socketio_client.emit('execute_algorithm', request_data)
+        received_events = self.socketio_client.get_received()
+        self.assertEqual([event['name'] for event in received_events], ['execution_rejected'])
+        
+        self.socketio_client.emit('estimate_execution', dict(request_data, params={'n' : 10}))
+        assessment = self.socketio_client.get_received()[0]['args'][0]
+        self.assertTrue(assessment['admitted'])
+        self.assertEqual(assessment['estimate']['steps'], len(fibonacci_recursive_trace(10)))
+    
+    
+    def test_streams_of_other_clients_are_interleaved(self):
+        other_client = socketio.test_client(app)
+        try:
+            other_client.emit('execute_algorithm', {'problem' : 'fibonacci', 'algorithm' : 'recursive', 'params' : {'n' : 18},
+                                                    'batch_size' : 10, 'window' : 1, 'execution_id' : 'large'})
+            self.socketio_client.get_received()
+            self.socketio_client.emit('execute_algorithm',
+                                      {'problem' : 'fibonacci', 'algorithm' : 'tabulation', 'params' : {'n' : 5}})
+            received_events = self.socketio_client.get_received()
+            steps = [event['args'][0] for event in received_events if event['name'] == 'trace_step']
+            self.assertEqual(steps, fibonacci_tab_trace(5))
+            self.assertEqual(received_events[-1]['name'], 'execution_complete')
+            
+            self.socketio_client.emit('get_stream_stats')
+            stats = self.socketio_client.get_received()[0]['args'][0]
+            self.assertEqual(stats['streams'], 1)
+            self.assertEqual(stats['waiting_for_ack'], 1)
+            self.assertEqual(stats['ready'], 0)
+        finally:
+            other_client.disconnect()
+        self.assertNotIn('large', STREAM_SCHEDULER)
+    
+    
+    def test_execution_id_of_another_client_is_rejected(self):
+        request_data = {'problem' : 'fibonacci', 'algorithm' : 'recursive', 'params' : {'n' : 18}, 'batch_size' : 10,
+                        'window' : 1, 'execution_id' : 'taken'}
+        self.socketio_client.get_received()
+        self.socketio_client.emit('execute_algorithm', request_data)
+        self.socketio_client.get_received()
+        
+        other_client = socketio.test_client(app)
+        try:
+            other_client.get_received()
+            other_client.emit('execute_algorithm', request_data)
+            received_events = other_client.get_received()
+            self.assertEqual([event['name'] for event in received_events], ['error'])
+            self.assertIn('already in use', received_events[0]['args'][0]['message'])
+        finally:
+            other_client.disconnect()
+        
+        # the owner's stream is untouched
+        self.socketio_client.emit('trace_ack', {'execution_id' : 'taken'})
+        received_events = self.socketio_client.get_received()
+        self.assertEqual(received_events[0]['name'], 'trace_batch')
+        self.assertEqual(received_events[0]['args'][0]['seq'], 1)
+    
+    
+    def test_paced_playback(self):
+        request_data = {'problem' : 'fibonacci', 'algorithm' : 'tabulation', 'params' : {'n' : 8}, 'playback_speed' : 1,
+                        'execution_id' : 'paced'}
+        self.socketio_client.get_received()
+        self.socketio_client.emit('execute_algorithm', request_data)
+        received_events = self.socketio_client.get_received()
+        self.assertEqual([event['name'] for event in received_events], ['execution_started'])
+        total_steps = len(fibonacci_tab_trace(8))
+        self.assertEqual(received_events[0]['args'][0]['playback']['total_steps'], total_steps)
+        playback = PLAYBACKS['paced']
+        
+        self.socketio_client.emit('pause_playback', {'execution_id' : 'paced'})
+        state = self.socketio_client.get_received()[-1]
+        self.assertEqual(state['name'], 'playback_state')
+        self.assertTrue(state['args'][0]['paused'])
+        
+        self.socketio_client.emit('set_playback_speed', {'execution_id' : 'paced', 'speed' : -1})
+        self.assertEqual(self.socketio_client.get_received()[-1]['name'], 'error')
+        self.socketio_client.emit('set_playback_speed', {'execution_id' : 'paced', 'speed' : 10000})
+        self.socketio_client.emit('resume_playback', {'execution_id' : 'paced'})
+        playback.join(5)
+        
+        received_events = self.socketio_client.get_received()
+        sent = [event['args'][0] for event in received_events if event['name'] == 'playback_steps']
+        self.assertEqual([step for batch in sent for step in batch['steps']], json.loads(json.dumps(fibonacci_tab_trace(8))))
+        self.assertEqual(received_events[-1]['name'], 'execution_complete')
+        self.assertEqual(received_events[-1]['args'][0]['steps'], total_steps)
+        self.assertNotIn('paced', PLAYBACKS)
+        
+        # the finished playback can't be controlled, but can still be seeked into
+        self.socketio_client.emit('pause_playback', {'execution_id' : 'paced'})
+        self.assertEqual(self.socketio_client.get_received()[-1]['name'], 'error')
+        self.socketio_client.emit('seek_step', {'execution_id' : 'paced', 'step' : 3})
+        self.assertEqual(self.socketio_client.get_received()[-1]['name'], 'step_state')
+    
+    
+    def test_playback_belongs_to_its_client(self):
+        request_data = {'problem' : 'fibonacci', 'algorithm' : 'tabulation', 'params' : {'n' : 8}, 'playback_speed' : 1,
+                        'execution_id' : 'mine'}
+        self.socketio_client.emit('execute_algorithm', request_data)
+        playback = PLAYBACKS['mine']
+        
+        other_client = socketio.test_client(app)
+        try:
+            other_client.emit('pause_playback', {'execution_id' : 'mine'})
+            self.assertEqual(other_client.get_received()[-1]['name'], 'error')
+            self.assertFalse(playback.paused)
+        finally:
+            other_client.disconnect()
+        
+        self.socketio_client.get_received()
+        self.socketio_client.emit('cancel_execution', {'execution_id' : 'mine'})
+        self.assertEqual(self.socketio_client.get_received()[-1]['name'], 'execution_cancelled')
+        playback.join(5)
+        self.assertTrue(playback.stopped)
+        self.assertNotIn('mine', PLAYBACKS)
+    
+    
+    def test_playback_options_are_validated(self):
+        request_data = {'problem' : 'fibonacci', 'algorithm' : 'tabulation', 'params' : {'n' : 8}, 'playback_speed' : 1,
+                        'batch_size' : 10}
+        self.socketio_client.get_received()
+        self.socketio_client.emit('execute_algorithm', request_data)
+        received_events = self.socketio_client.get_received()
+        self.assertEqual([event['name'] for event in received_events], ['error'])
+        self.assertIn('batch_size', received_events[0]['args'][0]['message'])
+    
+    
+    def test_execute_with_dedup(self):
+        request_data = {'problem' : 'fibonacci', 'algorithm' : 'recursive', 'params' : {'n' : 10}, 'dedup' : True}
+        self.socketio_client.get_received()
+        self.socketio_client.emit('execute_algorithm', request_data)
+        received_events = self.socketio_client.get_received()
+        steps = [event['args'][0] for event in received_events if event['name'] == 'trace_step']
+        self.assertEqual(steps, json.loads(json.dumps(fibonacci_recursive_trace(10, dedup=True))))
+        self.assertEqual(len(steps), 30)
+        self.assertEqual(received_events[-1]['name'], 'execution_complete')
+        
+        self.socketio_client.emit('execute_algorithm', dict(request_data, dedup='yes'))
+        self.assertEqual(self.socketio_client.get_received()[-1]['name'], 'error')
+    
+    
+    def test_execute_solve_only(self):
+        params = {'weights' : [10, 20, 30], 'values' : [60, 100, 120], 'capacity' : 50}
+        self.socketio_client.get_received()
+        self.socketio_client.emit('execute_algorithm', {'problem' : 'knapsack', 'algorithm' : 'solve', 'params' : params})
+        received_events = self.socketio_client.get_received()
+        steps = [event['args'][0] for event in received_events if event['name'] == 'trace_step']
+        self.assertEqual(steps, [knapsack_tab_trace(**params)[-1]])
+        self.assertEqual(received_events[-1]['name'], 'execution_complete')
+    
+    
+    def test_execute_with_granularity(self):
+        params = {'s1' : "AGGTAB", 's2' : "GXTXAYB"}
+        request_data = {'problem' : 'lcs', 'algorithm' : 'tabulation', 'params' : params, 'granularity' : 'row'}
+        self.socketio_client.get_received()
+        self.socketio_client.emit('execute_algorithm', request_data)
+        received_events = self.socketio_client.get_received()
+        steps = [event['args'][0] for event in received_events if event['name'] == 'trace_step']
+        self.assertEqual(steps, json.loads(json.dumps(lcs_tab_trace(**params, granularity='row'))))
+        self.assertEqual(sum(step['type'] == 'iteration_block' for step in steps), 6)
+        self.assertEqual(received_events[-1]['name'], 'execution_complete')
+        
+        self.socketio_client.emit('execute_algorithm', dict(request_data, granularity='stride', stride=0))
+        self.assertEqual(self.socketio_client.get_received()[-1]['name'], 'error')
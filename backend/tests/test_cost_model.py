@@ -0,0 +1,153 @@
+import time
+import unittest
+from backend.cost_model import estimate, Budget, suggest_alternatives
+from backend.algorithms.fibonacci import fibonacci_recursive_trace, fibonacci_memo_trace, fibonacci_tab_trace
+from backend.algorithms.fibonacci import fibonacci_fast_doubling_trace
+from backend.algorithms.knapsack import knapsack_recursive_trace, knapsack_memo_trace, knapsack_tab_trace
+from backend.algorithms.knapsack import knapsack_tab_1d_trace
+from backend.algorithms.lcs import lcs_recursive_trace, lcs_memo_trace, lcs_tab_trace
+from backend.algorithms.lcs import lcs_hirschberg_trace, lcs_bitparallel_trace
+
+
+class CostModelTest(unittest.TestCase):
+    
+    '''Tests for the execution cost estimates'''
+    
+    def test_exact_step_counts(self):
+        knapsack = {'weights' : [3, 4, 5, 9, 2], 'values' : [4, 5, 6, 7, 8], 'capacity' : 12}
+        lcs = {'s1' : "ABCBDAB", 's2' : "BDCABA"}
+        cases = [
+            ('fibonacci', 'recursive', {'n' : 12}, fibonacci_recursive_trace(12)),
+            ('fibonacci', 'memoization', {'n' : 12}, fibonacci_memo_trace(12)),
+            ('fibonacci', 'memoization', {'n' : 1}, fibonacci_memo_trace(1)),
+            ('fibonacci', 'tabulation', {'n' : 12}, fibonacci_tab_trace(12)),
+            ('fibonacci', 'tabulation', {'n' : 0}, fibonacci_tab_trace(0)),
+            ('fibonacci', 'fast_doubling', {'n' : 0}, fibonacci_fast_doubling_trace(0)),
+            ('fibonacci', 'fast_doubling', {'n' : 10 ** 6}, fibonacci_fast_doubling_trace(10 ** 6)),
+            ('knapsack', 'recursive', knapsack, knapsack_recursive_trace(**knapsack)),
+            ('knapsack', 'memoization', knapsack, knapsack_memo_trace(**knapsack)),
+            ('lcs', 'recursive', lcs, lcs_recursive_trace(**lcs)),
+            ('lcs', 'memoization', lcs, lcs_memo_trace(**lcs)),
+            ('lcs', 'bitparallel', lcs, lcs_bitparallel_trace(**lcs)),
+        ]
+        for problem, algorithm_type, params, trace in cases:
+            with self.subTest(problem=problem, algorithm=algorithm_type, params=params):
+                cost = estimate(problem, algorithm_type, params)
+                self.assertTrue(cost['exact'])
+                self.assertEqual(cost['steps'], len(trace))
+    
+    
+    def test_deduplicated_step_counts(self):
+        knapsack = {'weights' : [3, 4, 5, 9, 2, 1, 1], 'values' : [4, 5, 6, 7, 8, 1, 2], 'capacity' : 12}
+        lcs = {'s1' : "ABCBDAB", 's2' : "BDCABA"}
+        cases = [
+            ('fibonacci', {'n' : 0}, fibonacci_recursive_trace(0, dedup=True)),
+            ('fibonacci', {'n' : 15}, fibonacci_recursive_trace(15, dedup=True)),
+            ('knapsack', knapsack, knapsack_recursive_trace(**knapsack, dedup=True)),
+            ('lcs', lcs, lcs_recursive_trace(**lcs, dedup=True)),
+        ]
+        for problem, params, trace in cases:
+            with self.subTest(problem=problem, params=params):
+                cost = estimate(problem, 'recursive', params, {'dedup' : True})
+                self.assertTrue(cost['exact'])
+                self.assertEqual(cost['steps'], len(trace))
+    
+    
+    def test_tabulation_steps_are_an_upper_bound(self):
+        knapsack = {'weights' : [10, 20, 30], 'values' : [60, 100, 120], 'capacity' : 50}
+        self.assertGreaterEqual(estimate('knapsack', 'tabulation', knapsack)['steps'], len(knapsack_tab_trace(**knapsack)))
+        self.assertGreaterEqual(estimate('lcs', 'tabulation', {'s1' : "AGGTAB", 's2' : "GXTXAYB"})['steps'],
+                                len(lcs_tab_trace("AGGTAB", "GXTXAYB")))
+        for s1, s2 in (("", ""), ("AGGTAB", "GXTXAYB"), ("ACGT" * 40, "GATTACA" * 10)):
+            self.assertGreaterEqual(estimate('lcs', 'hirschberg', {'s1' : s1, 's2' : s2})['steps'],
+                                    len(lcs_hirschberg_trace(s1, s2)))
+        rolling = estimate('knapsack', 'tabulation_1d', knapsack)
+        self.assertGreaterEqual(rolling['steps'], len(knapsack_tab_1d_trace(**knapsack)))
+        self.assertLess(rolling['bytes'], estimate('knapsack', 'tabulation', knapsack)['bytes'])
+    
+    
+    def test_granularity_step_counts(self):
+        knapsack = {'weights' : [3, 4, 5, 9, 2], 'values' : [4, 5, 6, 7, 8], 'capacity' : 12}
+        for options in ({'granularity' : 'row'}, {'granularity' : 'diagonal'}, {'granularity' : 'stride', 'stride' : 5}):
+            with self.subTest(options=options):
+                cost = estimate('knapsack', 'tabulation', knapsack, options)
+                self.assertGreaterEqual(cost['steps'], len(knapsack_tab_trace(**knapsack, **options)))
+                self.assertLess(cost['steps'], estimate('knapsack', 'tabulation', knapsack)['steps'])
+        cost = estimate('fibonacci', 'tabulation', {'n' : 30}, {'granularity' : 'stride', 'stride' : 4})
+        self.assertEqual(cost['steps'], len(fibonacci_tab_trace(30, granularity='stride', stride=4)))
+    
+    
+    def test_coarser_granularity_is_suggested(self):
+        params = {'weights' : list(range(1, 201)), 'values' : [1] * 200, 'capacity' : 30_000}
+        suggestions = suggest_alternatives('knapsack', 'tabulation', params, {}, Budget(), ['tabulation'])
+        self.assertEqual([suggestion['options'] for suggestion in suggestions],
+                         [{'encoding' : 'delta', 'granularity' : 'row'}])
+    
+    
+    def test_delta_encoding_is_cheaper(self):
+        knapsack = {'weights' : list(range(1, 21)), 'values' : list(range(1, 21)), 'capacity' : 500}
+        full = estimate('knapsack', 'tabulation', knapsack)
+        delta = estimate('knapsack', 'tabulation', knapsack, {'encoding' : 'delta'})
+        self.assertEqual(full['steps'], delta['steps'])
+        self.assertLess(delta['bytes'] * 10, full['bytes'])
+    
+    
+    def test_exponential_inputs_are_cheap_to_estimate(self):
+        cost = estimate('knapsack', 'recursive', {'weights' : list(range(1, 41)), 'values' : [1] * 40, 'capacity' : 5000})
+        self.assertGreater(cost['steps'], 10 ** 12)
+        self.assertGreater(estimate('fibonacci', 'recursive', {'n' : 500})['steps'], 10 ** 12)
+        
+        started = time.monotonic()
+        cost = estimate('fibonacci', 'recursive', {'n' : 10 ** 8})
+        self.assertLess(time.monotonic() - started, 0.1)
+        self.assertFalse(cost['exact'])
+        self.assertGreater(estimate('lcs', 'recursive', {'s1' : 'A' * 300 + 'B', 's2' : 'C' * 300})['steps'], 10 ** 12)
+    
+    
+    def test_untraced_work_is_charged(self):
+        # solve sends one step whatever the capacity, but fills an n x capacity table first
+        small = estimate('knapsack', 'solve', {'weights' : [5] * 100, 'values' : [1] * 100, 'capacity' : 100})
+        large = estimate('knapsack', 'solve', {'weights' : [5] * 100, 'values' : [1] * 100, 'capacity' : 10 ** 9})
+        self.assertEqual(small['steps'], large['steps'])
+        self.assertGreater(large['seconds'], 100 * small['seconds'])
+        self.assertTrue(Budget().violations(large))
+        
+        # Hirschberg traces about a step per character but scores every cell of the m x n table
+        cost = estimate('lcs', 'hirschberg', {'s1' : 'AC' * 20_000, 's2' : 'GT' * 20_000})
+        self.assertLess(cost['steps'], 10 ** 5)
+        self.assertGreater(cost['seconds'], Budget().max_seconds)
+        
+        # fast doubling takes a step per bit of n, but its multiplications grow with the digits of F(n)
+        cost = estimate('fibonacci', 'fast_doubling', {'n' : 10 ** 8})
+        self.assertLess(cost['steps'], 30)
+        self.assertGreater(cost['seconds'], Budget().max_seconds)
+        self.assertFalse(Budget().violations(estimate('fibonacci', 'fast_doubling', {'n' : 10 ** 6})))
+    
+    
+    def test_budget_and_suggestions(self):
+        budget = Budget(max_steps=10_000)
+        cost = estimate('fibonacci', 'recursive', {'n' : 25})
+        self.assertEqual(len(budget.violations(cost)), 1)
+        
+        suggestions = suggest_alternatives('fibonacci', 'recursive', {'n' : 25}, {}, budget,
+                                           ['recursive', 'memoization', 'tabulation'])
+        # the same recursion with repeated subtrees deduplicated fits as well
+        self.assertEqual([suggestion['algorithm'] for suggestion in suggestions], ['tabulation', 'recursive', 'memoization'])
+        self.assertEqual(suggestions[1]['options'], {'dedup' : True})
+        self.assertTrue(all(not budget.violations(suggestion['estimate']) for suggestion in suggestions))
+    
+    
+    def test_dedup_is_suggested(self):
+        params = {'weights' : [1] * 30, 'values' : [1] * 30, 'capacity' : 15}
+        suggestions = suggest_alternatives('knapsack', 'recursive', params, {}, Budget(), ['recursive'])
+        self.assertEqual(suggestions[0]['options'], {'dedup' : True})
+    
+    
+    def test_invalid_options(self):
+        for options in ({'encoding' : 'delta', 'keyframe_interval' : 0}, {'encoding' : 'zip'}, {'explanations' : 'emoji'},
+                        {'dedup' : 'yes'}, {'granularity' : 'column'}, {'granularity' : 'stride', 'stride' : 0}):
+            with self.subTest(options=options):
+                with self.assertRaises(ValueError):
+                    estimate('knapsack', 'tabulation', {'weights' : [1], 'values' : [1], 'capacity' : 1}, options)
+        with self.assertRaises(ValueError):
+            estimate('fibonacci', 'tabulation', {'n' : 5}, {'granularity' : 'row'})
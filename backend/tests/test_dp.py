@@ -0,0 +1,150 @@
+import math
+import unittest
+from backend.algorithms.dp import DPProblem, recursive_trace_iter, memo_trace_iter, tab_trace_iter
+from backend.algorithms.registry import PROBLEMS, register_problem, declare, tracer_args
+from backend.algorithms.tracing import expand_subtrees, expand_memo_deltas, expand_table_deltas
+from backend.algorithms.lcs import lcs_bitparallel_trace_iter
+from backend.algorithms.lcs import LCS
+from backend.app import ALGORITHM_MAPPING
+from backend.cost_model import estimate
+
+
+class GridPaths(DPProblem):
+    
+    '''Number of right/down paths to the far corner of a grid, declared with only the engine's defaults'''
+    
+    def __init__(self, rows, cols):
+        self.rows = rows
+        self.cols = cols
+    
+    
+    def root(self):
+        return (self.rows - 1, self.cols - 1)
+    
+    
+    def is_base(self, state):
+        return state[0] == 0 or state[1] == 0
+    
+    
+    def base_value(self, state):
+        return 1
+    
+    
+    def subproblems(self, state):
+        i, j = state
+        return ((i - 1, j), (i, j - 1))
+    
+    
+    def combine(self, state, results):
+        return sum(results)
+    
+    
+    def new_table(self):
+        return [[1] * self.cols] + [[1] + [0] * (self.cols - 1) for _ in range(self.rows - 1)]
+    
+    
+    def fill(self, dp, i, j):
+        dp[i][j] = dp[i - 1][j] + dp[i][j - 1]
+
+
+class DPEngineTest(unittest.TestCase):
+    
+    '''Tests for the tracers derived from a declared problem'''
+    
+    def setUp(self):
+        self.grids = [(1, 1), (1, 4), (3, 3), (4, 6), (6, 2)]
+    
+    
+    def test_every_tracer_finds_the_answer(self):
+        for rows, cols in self.grids:
+            with self.subTest(rows=rows, cols=cols):
+                expected = math.comb(rows + cols - 2, rows - 1)
+                recursive = list(recursive_trace_iter(GridPaths(rows, cols)))
+                memo = list(memo_trace_iter(GridPaths(rows, cols)))
+                tab = list(tab_trace_iter(GridPaths(rows, cols)))
+                
+                self.assertEqual(recursive[-1]['result'], expected)
+                self.assertEqual(memo[-1]['result'], expected)
+                self.assertEqual(tab[-1]['result'], expected)
+                self.assertEqual(sum(step['type'] == 'call' for step in recursive), 2 * expected - 1)
+    
+    
+    def test_default_events(self):
+        trace = list(memo_trace_iter(GridPaths(2, 2)))
+        self.assertEqual(trace[0], {'type' : 'call', 'id' : 0, 'parent' : None, 'depth' : 0, 'state' : (1, 1)})
+        self.assertEqual([step['type'] for step in trace[:4]], ['call', 'cache_miss', 'call', 'cache_miss'])
+        self.assertEqual(trace[-2]['memo'], {'(1, 0)' : 1, '(0, 1)' : 1, '(1, 1)' : 2})
+        self.assertEqual(trace[-1], {'type' : 'return', 'id' : 0, 'result' : 2})
+    
+    
+    def test_call_ids_are_step_positions(self):
+        trace = list(recursive_trace_iter(GridPaths(4, 4)))
+        for index, step in enumerate(trace):
+            if step['type'] == 'call':
+                self.assertEqual(step['id'], index)
+    
+    
+    def test_dedup_and_delta_expand_to_the_full_traces(self):
+        for rows, cols in self.grids:
+            with self.subTest(rows=rows, cols=cols):
+                full = list(recursive_trace_iter(GridPaths(rows, cols)))
+                self.assertEqual(list(expand_subtrees(recursive_trace_iter(GridPaths(rows, cols), dedup=True))), full)
+                
+                delta = memo_trace_iter(GridPaths(rows, cols), encoding='delta', keyframe_interval=2)
+                self.assertEqual(list(expand_memo_deltas(delta)), list(memo_trace_iter(GridPaths(rows, cols))))
+                
+                for granularity in ('cell', 'row', 'diagonal', 'stride'):
+                    delta = tab_trace_iter(GridPaths(rows, cols), 'delta', 3, granularity=granularity, stride=4)
+                    full = list(tab_trace_iter(GridPaths(rows, cols), granularity=granularity, stride=4))
+                    self.assertEqual(list(expand_table_deltas(delta)), full)
+    
+    
+    def test_deeper_than_the_recursion_limit(self):
+        trace = list(memo_trace_iter(GridPaths(2, 3000), encoding='delta'))
+        self.assertEqual(trace[-1]['result'], 3000)
+
+
+class RegistryTest(unittest.TestCase):
+    
+    '''Tests for the problem and tracer registry'''
+    
+    def test_registered_problems(self):
+        self.assertEqual(set(PROBLEMS), {'fibonacci', 'knapsack', 'lcs'})
+        self.assertIs(ALGORITHM_MAPPING['lcs']['bitparallel'], lcs_bitparallel_trace_iter)
+        self.assertEqual(set(ALGORITHM_MAPPING['fibonacci']),
+                         {'recursive', 'memoization', 'tabulation', 'fast_doubling'})
+    
+    
+    def test_tracer_args(self):
+        params = {'capacity' : 5, 'values' : [3], 'weights' : [2]}
+        self.assertEqual(tracer_args('knapsack', params), ([2], [3], 5))
+        self.assertEqual(tracer_args('lcs', {'s1' : 'AB', 's2' : 'B'}), ('AB', 'B'))
+        with self.assertRaises(KeyError):
+            tracer_args('unknown', {})
+    
+    
+    def test_conflicting_params(self):
+        self.assertIs(register_problem('lcs', ('s1', 's2')), PROBLEMS['lcs'])
+        with self.assertRaises(ValueError):
+            register_problem('lcs', ('s1',))
+    
+    
+    def test_new_problems_are_estimated_from_their_declaration(self):
+        self.assertIs(PROBLEMS['lcs'].declaration, LCS)
+        register_problem('grid_paths', ('rows', 'cols'))
+        self.addCleanup(PROBLEMS.pop, 'grid_paths')
+        declare('grid_paths')(GridPaths)
+        
+        params = {'rows' : 5, 'cols' : 7}
+        for algorithm, tracer in (('recursive', recursive_trace_iter), ('memoization', memo_trace_iter),
+                                  ('tabulation', tab_trace_iter)):
+            with self.subTest(algorithm=algorithm):
+                steps = len(list(tracer(GridPaths(5, 7))))
+                cost = estimate('grid_paths', algorithm, params)
+                self.assertGreaterEqual(cost['steps'], steps)
+                self.assertLess(cost['steps'], 4 * steps)
+                self.assertFalse(cost['exact'])
+        
+        # without a declaration the table is as large as the params
+        PROBLEMS['grid_paths'].declaration = None
+        self.assertEqual(estimate('grid_paths', 'tabulation', params)['steps'], 6 * 8)
@@ -0,0 +1,42 @@
+import unittest
+from backend.algorithms.explanations import explainer, render_explanation, render_explanations, template_catalog
+from backend.algorithms.fibonacci import fibonacci_recursive_trace, fibonacci_memo_trace, fibonacci_tab_trace
+from backend.algorithms.knapsack import knapsack_recursive_trace, knapsack_memo_trace, knapsack_tab_trace
+from backend.algorithms.lcs import lcs_recursive_trace, lcs_memo_trace, lcs_tab_trace
+
+
+class ExplanationTemplateTest(unittest.TestCase):
+    
+    '''Tests for templated, lazily rendered explanations'''
+    
+    def test_rendered_templates_match_text(self):
+        cases = [
+            (fibonacci_recursive_trace, (6,)), (fibonacci_memo_trace, (6,)), (fibonacci_tab_trace, (6,)),
+            (knapsack_recursive_trace, ([10, 20, 30], [60, 100, 120], 50)),
+            (knapsack_memo_trace, ([10, 20, 30], [60, 100, 120], 50)),
+            (knapsack_tab_trace, ([10, 20, 30], [60, 100, 120], 50)),
+            (lcs_recursive_trace, ("AGGTAB", "GXTXAYB")), (lcs_memo_trace, ("AGGTAB", "GXTXAYB")),
+            (lcs_tab_trace, ("AGGTAB", "GXTXAYB")),
+        ]
+        for tracer, args in cases:
+            with self.subTest(tracer=tracer.__name__):
+                templated = tracer(*args, explanations='template')
+                self.assertFalse(any(isinstance(step.get('explanation'), str) for step in templated))
+                self.assertEqual(list(render_explanations(templated)), tracer(*args))
+    
+    
+    def test_explainer_modes(self):
+        self.assertEqual(explainer('text')('fib.call', 4), 'Calling fib(4).')
+        templated = explainer('template')('fib.call', 4)
+        self.assertEqual(render_explanation(templated), 'Calling fib(4).')
+        self.assertEqual(render_explanation('plain text'), 'plain text')
+        
+        with self.assertRaises(ValueError):
+            explainer('html')
+    
+    
+    def test_catalog_ids_are_positions(self):
+        templates = template_catalog()['templates']
+        self.assertEqual([template['id'] for template in templates], list(range(len(templates))))
+        template = explainer('template')('lcs.traceback_step', 2, 3)
+        self.assertEqual(templates[template[0]]['text'].format(*template[1:]), 'Tracing back from dp[2][3].')
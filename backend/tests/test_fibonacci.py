@@ -1,5 +1,8 @@
 import unittest
 from backend.algorithms.fibonacci import fibonacci_recursive_trace, fibonacci_memo_trace, fibonacci_tab_trace
+from backend.algorithms.fibonacci import fibonacci_recursive_trace_iter, fibonacci_memo_trace_iter, fibonacci_tab_trace_iter
+from backend.algorithms.fibonacci import fibonacci_fast_doubling_trace, fibonacci_fast_doubling_trace_iter
+from backend.algorithms.tracing import summarize_int, digit_count
 
 
 FIBONACCI_TEST_CASES = [
@@ -47,4 +50,71 @@ class fibonacciTest(unittest.TestCase):
                trace = fibonacci_tab_trace(n)
                self.assertEqual(trace[-1]['result'], expected_result)
                self.assertIsInstance(trace, list)
-               self.assertTrue(all(isinstance(item, dict) for item in trace))
\ No newline at end of file
+               self.assertTrue(all(isinstance(item, dict) for item in trace))
+    
+    
+    def test_fibonacci_iter_matches_list(self):
+        for n, _ in FIBONACCI_TEST_CASES:
+            with self.subTest(n=n):
+                self.assertEqual(list(fibonacci_recursive_trace_iter(n)), fibonacci_recursive_trace(n))
+                self.assertEqual(list(fibonacci_memo_trace_iter(n)), fibonacci_memo_trace(n))
+                self.assertEqual(list(fibonacci_tab_trace_iter(n)), fibonacci_tab_trace(n))
+                self.assertEqual(list(fibonacci_fast_doubling_trace_iter(n)), fibonacci_fast_doubling_trace(n))
+    
+    
+    def test_fibonacci_fast_doubling(self):
+        for n, expected_result in FIBONACCI_TEST_CASES:
+            with self.subTest(n=n):
+                self.assertEqual(fibonacci_fast_doubling_trace(n)[-1]['result'], expected_result)
+        
+        for n in range(200):
+            with self.subTest(n=n):
+                trace = fibonacci_fast_doubling_trace(n, max_digits=100)
+                self.assertEqual(trace[-1]['result'], fibonacci_tab_trace(n)[-1]['result'])
+        
+        # one step per bit of n, each doubling k and adding the bit
+        trace = fibonacci_fast_doubling_trace(10)
+        self.assertEqual(trace[0]['bits'], '1010')
+        steps = [step for step in trace if step['type'] == 'doubling_step']
+        self.assertEqual([step['k'] for step in steps], [1, 2, 5, 10])
+        self.assertEqual([(step['value'], step['next_value']) for step in steps], [(1, 1), (1, 2), (5, 8), (55, 89)])
+        
+        for n in (-1, -10, 2.0):
+            with self.subTest(n=n), self.assertRaises(ValueError):
+                fibonacci_fast_doubling_trace(n)
+    
+    
+    def test_fibonacci_fast_doubling_summarizes_huge_values(self):
+        trace = fibonacci_fast_doubling_trace(100_000)
+        self.assertEqual(len(trace), 17 + 2)
+        self.assertEqual(trace[-1]['result'], {'digits' : 20899, 'prefix' : '2597406934', 'suffix' : '3428746875'})
+        self.assertTrue(trace[-1]['explanation'].endswith('(20899 digits).'))
+        self.assertEqual(fibonacci_fast_doubling_trace(300, max_digits=100)[-1]['result'],
+                         fibonacci_tab_trace(300)[-1]['result'])
+        
+        for value in (0, 9, 10, 99, 10 ** 40 - 1, 10 ** 40, 2 ** 200, 10 ** 5000 + 7):
+            with self.subTest(value=value):
+                self.assertEqual(digit_count(value), len(str(value)) if value < 10 ** 4000 else 5001)
+        self.assertEqual(summarize_int(10 ** 40 - 1), 10 ** 40 - 1)
+        self.assertEqual(summarize_int(10 ** 40 + 7), {'digits' : 41, 'prefix' : '1000000000', 'suffix' : '0000000007'})
+        # leading digits of large values are approximated, values next to a power of 10 are still exact
+        for value, expected in ((10 ** 5000 - 1, (5000, '9999999999', '9999999999')),
+                                (10 ** 5000, (5001, '1000000000', '0000000000')),
+                                (2 * 10 ** 300 - 1, (301, '1999999999', '9999999999')),
+                                (3 ** 5000, (2386, '4038997629', '8276100001'))):
+            with self.subTest(value=expected):
+                summary = summarize_int(value)
+                self.assertEqual((summary['digits'], summary['prefix'], summary['suffix']), expected)
+    
+    
+    def test_fibonacci_iter_is_lazy(self):
+        # fib(30) has millions of steps, the first one should still come back straight away
+        steps = fibonacci_recursive_trace_iter(30)
+        first = next(steps)
+        self.assertEqual(first['type'], 'call')
+        self.assertEqual(first['id'], 0)
+        
+        second = next(steps)
+        self.assertEqual(second['id'], 1)
+        self.assertEqual(second['parent'], 0)
+        steps.close()
@@ -0,0 +1,78 @@
+import random
+import sys
+import unittest
+from backend.tests import recursive_reference as reference
+from backend.algorithms.fibonacci import fibonacci_recursive_trace, fibonacci_memo_trace
+from backend.algorithms.knapsack import knapsack_recursive_trace, knapsack_memo_trace
+from backend.algorithms.lcs import lcs_recursive_trace, lcs_memo_trace
+
+
+class IterativeEquivalenceTest(unittest.TestCase):
+
+    '''Checks the explicit stack tracers against the recursive versions they replaced'''
+    
+    def setUp(self):
+        self.rng = random.Random(15)
+    
+    
+    def assertSameTrace(self, trace, reference_iter):
+        self.assertEqual(trace, list(reference_iter))
+    
+    
+    def test_fibonacci(self):
+        for n in range(12):
+            for explanations in ('text', 'template'):
+                with self.subTest(n=n, explanations=explanations):
+                    self.assertSameTrace(fibonacci_recursive_trace(n, explanations),
+                                         reference.fibonacci_recursive_trace_iter(n, explanations))
+                    for encoding in ('full', 'delta'):
+                        self.assertSameTrace(fibonacci_memo_trace(n, encoding, 3, explanations),
+                                             reference.fibonacci_memo_trace_iter(n, encoding, 3, explanations))
+    
+    
+    def test_knapsack(self):
+        cases = [([10, 20, 30], [60, 100, 120], 50), ([1, 3, 4, 5], [1, 4, 5, 7], 7), ([], [], 5), ([4], [9], 0)]
+        for _ in range(20):
+            count = self.rng.randint(1, 6)
+            cases.append(([self.rng.randint(1, 8) for _ in range(count)],
+                          [self.rng.randint(1, 20) for _ in range(count)], self.rng.randint(0, 15)))
+        
+        for weights, values, capacity in cases:
+            for explanations in ('text', 'template'):
+                with self.subTest(weights=weights, values=values, capacity=capacity, explanations=explanations):
+                    self.assertSameTrace(knapsack_recursive_trace(weights, values, capacity, explanations),
+                                         reference.knapsack_recursive_trace_iter(weights, values, capacity, explanations))
+                    for encoding in ('full', 'delta'):
+                        self.assertSameTrace(
+                            knapsack_memo_trace(weights, values, capacity, encoding, 4, explanations),
+                            reference.knapsack_memo_trace_iter(weights, values, capacity, encoding, 4, explanations))
+    
+    
+    def test_lcs(self):
+        cases = [("AGGTAB", "GXTXAYB"), ("", "ABC"), ("ABC", "ABC"), ("AB", "BA")]
+        for _ in range(20):
+            cases.append((''.join(self.rng.choice('ABC') for _ in range(self.rng.randint(0, 6))),
+                          ''.join(self.rng.choice('ABC') for _ in range(self.rng.randint(0, 6)))))
+        
+        for s1, s2 in cases:
+            for explanations in ('text', 'template'):
+                with self.subTest(s1=s1, s2=s2, explanations=explanations):
+                    self.assertSameTrace(lcs_recursive_trace(s1, s2, explanations),
+                                         reference.lcs_recursive_trace_iter(s1, s2, explanations))
+                    for encoding in ('full', 'delta'):
+                        self.assertSameTrace(lcs_memo_trace(s1, s2, encoding, 4, explanations),
+                                             reference.lcs_memo_trace_iter(s1, s2, encoding, 4, explanations))
+    
+    
+    def test_deeper_than_the_recursion_limit(self):
+        depth = sys.getrecursionlimit() + 500
+        
+        trace = lcs_memo_trace('A' * depth, 'B' + 'A' * (depth - 1), encoding='delta')
+        self.assertEqual(trace[-1]['result'], depth - 1)
+        self.assertEqual(max(step.get('depth', 0) for step in trace), depth)
+        
+        trace = fibonacci_memo_trace(depth, encoding='delta')
+        self.assertEqual(trace[-1]['n'], depth)
+        
+        trace = knapsack_memo_trace([1] * depth, [1] * depth, 1, encoding='delta')
+        self.assertEqual(trace[-1]['result'], 1)
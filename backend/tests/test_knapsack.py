@@ -1,5 +1,10 @@
 import unittest
 from backend.algorithms.knapsack import knapsack_recursive_trace, knapsack_memo_trace, knapsack_tab_trace
+from backend.algorithms.knapsack import knapsack_recursive_trace_iter, knapsack_memo_trace_iter, knapsack_tab_trace_iter
+from backend.algorithms.knapsack import knapsack_tab_1d_trace, knapsack_tab_1d_trace_iter
+from backend.algorithms.knapsack import knapsack_solve, knapsack_solve_trace_iter, _knapsack_solve_python, np
+from backend.algorithms.tracing import expand_table_deltas
+import random
 
 
 class knapsackTest(unittest.TestCase):
@@ -58,4 +63,76 @@ class knapsackTest(unittest.TestCase):
        trace = knapsack_tab_trace(self.weights, self.values, self.capacity)
        self.assertEqual(trace[-1]['result'], self.expected_max_value)
        self.assertEqual(trace[-1]['type'], 'traceback_complete')
-       self.assertListEqual(sorted(trace[-1]['included_items']), sorted(self.expected_items))
\ No newline at end of file
+       self.assertListEqual(sorted(trace[-1]['included_items']), sorted(self.expected_items))
+    
+    
+    def test_knapsack_iter_matches_list(self):
+        args = (self.weights, self.values, self.capacity)
+        self.assertEqual(list(knapsack_recursive_trace_iter(*args)), knapsack_recursive_trace(*args))
+        self.assertEqual(list(knapsack_memo_trace_iter(*args)), knapsack_memo_trace(*args))
+        self.assertEqual(list(knapsack_tab_trace_iter(*args)), knapsack_tab_trace(*args))
+        self.assertEqual(list(knapsack_tab_1d_trace_iter(*args)), knapsack_tab_1d_trace(*args))
+    
+    
+    def test_knapsack_tab_1d(self):
+        trace = knapsack_tab_1d_trace(self.weights, self.values, self.capacity)
+        self.assertEqual(trace[-1]['result'], self.expected_max_value)
+        self.assertEqual(trace[-1]['included_items'], self.expected_items)
+        # one row of capacity + 1 values, only the capacities an item fits are updated
+        self.assertEqual(len(trace[0]['table']), self.capacity + 1)
+        iterations = [step for step in trace if step['type'] == 'iteration']
+        self.assertEqual(len(iterations), 41 + 31 + 21)
+        self.assertEqual([step['w'] for step in iterations[:2]], [50, 49])
+        self.assertEqual(iterations[0]['decision'], 'include')
+        self.assertEqual(knapsack_tab_1d_trace([], [], self.capacity)[-1]['included_items'], [])
+        self.assertEqual(knapsack_tab_1d_trace(self.weights, self.values, 0)[-1]['result'], 0)
+    
+    
+    def test_knapsack_tab_1d_matches_the_full_table(self):
+        rng = random.Random(20)
+        for _ in range(30):
+            count = rng.randint(1, 8)
+            args = ([rng.randint(1, 10) for _ in range(count)], [rng.randint(1, 20) for _ in range(count)],
+                    rng.randint(0, 25))
+            with self.subTest(args=args):
+                rolling, full = knapsack_tab_1d_trace(*args), knapsack_tab_trace(*args)
+                self.assertEqual(rolling[-1]['result'], full[-1]['result'])
+                self.assertEqual(rolling[-1]['included_items'], full[-1]['included_items'])
+                # the rolling row ends up as the last row of the full table
+                final = [step for step in rolling if step['type'] == 'final_result'][0]
+                self.assertEqual(final['table'], [step for step in full if step['type'] == 'final_result'][0]['table'][-1])
+                delta = knapsack_tab_1d_trace(*args, encoding='delta', keyframe_interval=3)
+                self.assertEqual(list(expand_table_deltas(delta)), rolling)
+    
+    
+    def test_knapsack_solve_matches_the_traced_answer(self):
+        rng = random.Random(21)
+        cases = [(self.weights, self.values, self.capacity), ([], [], 5), ([4], [9], 0), ([60], [5], 50)]
+        for _ in range(50):
+            count = rng.randint(1, 8)
+            cases.append(([rng.randint(1, 10) for _ in range(count)], [rng.randint(0, 20) for _ in range(count)],
+                          rng.randint(0, 25)))
+        
+        for args in cases:
+            with self.subTest(args=args):
+                traced = knapsack_tab_trace(*args)[-1]
+                expected = (traced['result'], traced['included_items'])
+                self.assertEqual(knapsack_solve(*args), expected)
+                self.assertEqual(_knapsack_solve_python(*args), expected)
+        
+        # values past int64 are solved in pure Python
+        self.assertEqual(knapsack_solve([1, 1], [2 ** 70, 1], 1), (2 ** 70, [0]))
+    
+    
+    @unittest.skipIf(np is None, 'numpy is not installed')
+    def test_knapsack_solve_numpy(self):
+        rng = random.Random(21)
+        weights = [rng.randint(1, 500) for _ in range(40)]
+        values = [rng.randint(1, 1000) for _ in range(40)]
+        self.assertEqual(knapsack_solve(weights, values, 5000), _knapsack_solve_python(weights, values, 5000))
+    
+    
+    def test_knapsack_solve_trace(self):
+        trace = list(knapsack_solve_trace_iter(self.weights, self.values, self.capacity))
+        self.assertEqual(len(trace), 1)
+        self.assertEqual(trace[0], knapsack_tab_trace(self.weights, self.values, self.capacity)[-1])
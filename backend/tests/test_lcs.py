@@ -1,5 +1,15 @@
 import unittest
 from backend.algorithms.lcs import lcs_recursive_trace, lcs_memo_trace, lcs_tab_trace
+from backend.algorithms.lcs import lcs_recursive_trace_iter, lcs_memo_trace_iter, lcs_tab_trace_iter
+from backend.algorithms.lcs import lcs_hirschberg_trace, lcs_hirschberg_trace_iter
+from backend.algorithms.lcs import lcs_bitparallel_trace, lcs_bitparallel_trace_iter, lcs_length_bitparallel
+import random
+import time
+
+
+def is_subsequence(sub, s):
+    chars = iter(s)
+    return all(char in chars for char in sub)
 
 
 class LCSTest(unittest.TestCase):
@@ -79,4 +89,80 @@ class LCSTest(unittest.TestCase):
        self.assertEqual(trace[-1]['result'], self.expected_lcs)
        
        self.assertIsInstance(trace, list)
-       self.assertTrue(all(isinstance(item, dict) for item in trace))
\ No newline at end of file
+       self.assertTrue(all(isinstance(item, dict) for item in trace))
+    
+    
+    def test_lcs_iter_matches_list(self):
+        self.assertEqual(list(lcs_recursive_trace_iter(self.s1, self.s2)), lcs_recursive_trace(self.s1, self.s2))
+        self.assertEqual(list(lcs_memo_trace_iter(self.s1, self.s2)), lcs_memo_trace(self.s1, self.s2))
+        self.assertEqual(list(lcs_tab_trace_iter(self.s1, self.s2)), lcs_tab_trace(self.s1, self.s2))
+    
+    
+    def test_lcs_hirschberg(self):
+        trace = lcs_hirschberg_trace(self.s1, self.s2)
+        self.assertEqual(trace[-1]['result'], self.expected_lcs)
+        self.assertEqual(trace[-1]['result_length'], self.expected_lcs_len)
+        self.assertEqual(list(lcs_hirschberg_trace_iter(self.s1, self.s2)), trace)
+        
+        # the longer string is split, score rows only span the shorter one
+        self.assertEqual(trace[0]['row_string'], 's2')
+        splits = [step for step in trace if step['type'] == 'hirschberg_split']
+        self.assertEqual(len(splits[0]['forward']), len(self.s1) + 1)
+        self.assertEqual(splits[0]['score'], self.expected_lcs_len)
+        for step in trace[1:-1]:
+            self.assertEqual(trace[step['id']], step)
+            if step['parent'] is not None:
+                self.assertEqual(trace[step['parent']]['type'], 'hirschberg_split')
+                self.assertEqual(step['depth'], trace[step['parent']]['depth'] + 1)
+    
+    
+    def test_lcs_hirschberg_matches_tabulation(self):
+        rng = random.Random(22)
+        cases = [("", ""), ("", "ABC"), ("A", "A"), ("ABC", "DEF"), ("ABCBDAB", "BDCABA")]
+        for _ in range(200):
+            cases.append((''.join(rng.choice('ABC') for _ in range(rng.randint(0, 12))),
+                          ''.join(rng.choice('ABC') for _ in range(rng.randint(0, 12)))))
+        
+        for s1, s2 in cases:
+            with self.subTest(s1=s1, s2=s2):
+                result = lcs_hirschberg_trace(s1, s2)[-1]['result']
+                self.assertEqual(len(result), lcs_tab_trace(s1, s2)[-1]['result_length'])
+                self.assertTrue(is_subsequence(result, s1) and is_subsequence(result, s2))
+    
+    
+    def test_lcs_bitparallel(self):
+        trace = lcs_bitparallel_trace(self.s1, self.s2)
+        self.assertEqual(list(lcs_bitparallel_trace_iter(self.s1, self.s2)), trace)
+        self.assertEqual(trace[-1]['result'], self.expected_lcs_len)
+        # the shorter s1 = "AGGTAB" is packed into the bits
+        self.assertEqual(trace[0]['row_string'], 's2')
+        self.assertEqual(trace[0]['masks']['G'], format(0b110, 'x'))
+        
+        # one row per character of the longer string, with the LCS length of the prefix read so far
+        rows = [step for step in trace if step['type'] == 'bitparallel_row']
+        self.assertEqual(len(rows), len(self.s2))
+        for row in rows:
+            zeros = len(self.s1) - bin(int(row['bits'], 16)).count('1')
+            self.assertEqual(row['length'], zeros)
+            self.assertEqual(row['length'], lcs_tab_trace(self.s2[:row['i'] + 1], self.s1)[-1]['result_length'])
+    
+    
+    def test_lcs_bitparallel_matches_tabulation(self):
+        rng = random.Random(23)
+        cases = [("", ""), ("", "ABC"), ("A", "A"), ("ABC", "DEF"), ("ABCBDAB", "BDCABA"), ("A" * 70, "A" * 65)]
+        for _ in range(300):
+            cases.append((''.join(rng.choice('ABCD') for _ in range(rng.randint(0, 15))),
+                          ''.join(rng.choice('ABCD') for _ in range(rng.randint(0, 15)))))
+        
+        for s1, s2 in cases:
+            with self.subTest(s1=s1, s2=s2):
+                expected = lcs_tab_trace(s1, s2)[-1]['result_length']
+                self.assertEqual(lcs_length_bitparallel(s1, s2), expected)
+                self.assertEqual(lcs_bitparallel_trace(s1, s2)[-1]['result'], expected)
+        
+        # long strings take milliseconds, not the seconds a cell by cell table would
+        s1, s2 = ''.join(rng.choice('ACGT') for _ in range(10_000)), ''.join(rng.choice('ACGT') for _ in range(10_000))
+        started = time.monotonic()
+        length = lcs_length_bitparallel(s1, s2)
+        self.assertLess(time.monotonic() - started, 0.5)
+        self.assertEqual(length, lcs_length_bitparallel(s2, s1))
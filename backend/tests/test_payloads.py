@@ -0,0 +1,37 @@
+import json
+import unittest
+from backend.payloads import PayloadBuffer, encode_payloads, join_batch
+from backend.wire import StepCodec
+from backend.algorithms.knapsack import knapsack_tab_trace
+from backend.algorithms.lcs import lcs_recursive_trace
+
+
+class PayloadBufferTest(unittest.TestCase):
+    
+    '''Tests for pre-serialized step payloads'''
+    
+    def test_json_payloads_round_trip(self):
+        trace = lcs_recursive_trace("AGGTAB", "GXTXAYB")
+        buffer = PayloadBuffer(encode_payloads(trace))
+        
+        self.assertEqual(len(buffer), len(trace))
+        self.assertEqual([json.loads(payload) for payload in buffer], json.loads(json.dumps(trace)))
+        self.assertEqual(json.loads(buffer[-1]), json.loads(json.dumps(trace[-1])))
+        self.assertEqual(json.loads(join_batch(buffer[3:7])), json.loads(json.dumps(trace[3:7])))
+        
+        with self.assertRaises(IndexError):
+            buffer[len(trace)]
+    
+    
+    def test_binary_batch_matches_codec(self):
+        trace = knapsack_tab_trace([10, 20, 30], [60, 100, 120], 50, encoding='delta')
+        buffer = PayloadBuffer(encode_payloads(trace, 'binary'))
+        codec = StepCodec()
+        self.assertEqual(join_batch(buffer[:10], 'binary'), codec.encode_steps(trace[:10]))
+    
+    
+    def test_nbytes_counts_data_and_index(self):
+        buffer = PayloadBuffer([b'{}', b'[1]'])
+        self.assertEqual(buffer.nbytes(), 5 + 3 * 8)
+        buffer.clear()
+        self.assertEqual(len(buffer), 0)
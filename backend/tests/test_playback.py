@@ -0,0 +1,142 @@
+import unittest
+from backend.playback import Playback, parse_playback, TICK, MAX_SPEED
+
+
+class FakeClock:
+    
+    def __init__(self):
+        self.now = 100.0
+    
+    
+    def __call__(self):
+        return self.now
+
+
+class PlaybackTest(unittest.TestCase):
+    
+    '''Tests for sending a trace at the client's pace'''
+    
+    def setUp(self):
+        self.clock = FakeClock()
+        self.sent = []
+        self.finished = []
+    
+    
+    def send(self, playback, start, steps):
+        self.sent.append((start, list(steps)))
+    
+    
+    def finish(self, playback, error):
+        self.finished.append((playback.execution_id, error))
+    
+    
+    def playback(self, steps, speed):
+        return Playback('exec', 'a', steps, self.send, self.finish, speed, clock=self.clock)
+    
+    
+    def test_steps_are_sent_as_they_fall_due(self):
+        playback = self.playback(list(range(10)), speed=4)
+        playback.tick()
+        self.assertEqual(self.sent, [])
+        self.assertEqual(playback._wait_time(), 0.25)
+        
+        self.clock.now += 0.6
+        playback.tick()
+        self.assertEqual(self.sent, [(0, [0, 1])])
+        
+        self.clock.now += 1
+        self.assertEqual(playback._wait_time(), 0)
+        self.assertTrue(playback.tick())
+        self.assertEqual(self.sent[-1], (2, [2, 3, 4, 5]))
+        self.assertEqual(playback.cursor, 6)
+        self.assertEqual(self.finished, [])
+    
+    
+    def test_finishes_at_the_end(self):
+        playback = self.playback(list(range(3)), speed=10)
+        self.clock.now += 1
+        self.assertFalse(playback.tick())
+        self.assertEqual(self.sent, [(0, [0, 1, 2])])
+        self.assertEqual(self.finished, [('exec', None)])
+        self.assertFalse(playback.tick())
+        self.assertEqual(playback.state()['done'], True)
+        
+        empty = self.playback([], speed=1)
+        self.assertFalse(empty.tick())
+        self.assertEqual(len(self.finished), 2)
+    
+    
+    def test_pause_and_resume(self):
+        playback = self.playback(list(range(100)), speed=10)
+        self.clock.now += 0.5
+        playback.tick()
+        playback.pause()
+        self.assertIsNone(playback._wait_time())
+        
+        # nothing piles up while paused
+        self.clock.now += 60
+        playback.tick()
+        self.assertEqual(playback.cursor, 5)
+        playback.resume()
+        playback.tick()
+        self.assertEqual(playback.cursor, 5)
+        self.clock.now += 0.3
+        playback.tick()
+        self.assertEqual(playback.cursor, 8)
+        self.assertEqual([start for start, _ in self.sent], [0, 5])
+    
+    
+    def test_set_speed(self):
+        playback = self.playback(list(range(1000)), speed=2)
+        self.clock.now += 1
+        playback.tick()
+        self.assertEqual(playback.cursor, 2)
+        
+        playback.set_speed(100)
+        self.clock.now += 0.5
+        playback.tick()
+        self.assertEqual(playback.cursor, 52)
+        # fast playbacks send a tick's worth of steps at a time
+        self.assertEqual(playback._wait_time(), TICK)
+        
+        with self.assertRaises(ValueError):
+            playback.set_speed(0)
+        self.assertEqual(playback.speed, 100)
+    
+    
+    def test_runs_on_its_own_thread(self):
+        playback = Playback('exec', 'a', list(range(50)), self.send, self.finish, MAX_SPEED)
+        playback.start()
+        playback.join(5)
+        self.assertEqual([step for _, steps in self.sent for step in steps], list(range(50)))
+        self.assertEqual(self.finished, [('exec', None)])
+    
+    
+    def test_stopped_playback_is_not_finished(self):
+        playback = Playback('exec', 'a', list(range(50)), self.send, self.finish, 1)
+        playback.start()
+        playback.stop()
+        playback.join(5)
+        self.assertEqual(self.sent, [])
+        self.assertEqual(self.finished, [])
+    
+    
+    def test_failed_send(self):
+        def send(playback, start, steps):
+            raise OSError('socket closed')
+        
+        playback = Playback('exec', 'a', list(range(50)), send, self.finish, MAX_SPEED)
+        playback.start()
+        playback.join(5)
+        self.assertIsInstance(self.finished[0][1], OSError)
+    
+    
+    def test_parse_playback(self):
+        self.assertIsNone(parse_playback({}))
+        self.assertEqual(parse_playback({'playback_speed' : 2.5}), 2.5)
+        for data in ({'playback_speed' : 0}, {'playback_speed' : True}, {'playback_speed' : '5'},
+                     {'playback_speed' : MAX_SPEED + 1}, {'playback_speed' : 5, 'batch_size' : 10},
+                     {'playback_speed' : 5, 'preserialized' : True}):
+            with self.subTest(data=data):
+                with self.assertRaises(ValueError):
+                    parse_playback(data)
@@ -0,0 +1,188 @@
+import threading
+import unittest
+from backend.scheduler import StreamScheduler
+from backend.streaming import TraceStream
+
+
+def failing_steps():
+    yield 1
+    raise RuntimeError('tracer failed')
+
+
+class StreamSchedulerTest(unittest.TestCase):
+
+    '''Tests for interleaving batches of concurrent streams'''
+    
+    def setUp(self):
+        self.sent = []
+        self.finished = []
+    
+    
+    def send(self, stream, seq, steps):
+        self.sent.append((stream.execution_id, len(steps)))
+    
+    
+    def finish(self, stream, error):
+        self.finished.append((stream.execution_id, error))
+    
+    
+    def refilling_scheduler(self, **kwargs):
+        # A scheduler whose streams hand over their next batch as soon as one is sent, as if every
+        # client's thread kept up with the dispatcher
+        def send(stream, seq, steps):
+            self.send(stream, seq, steps)
+            if not stream.done:
+                self.hand_over(scheduler, stream)
+        
+        scheduler = StreamScheduler(send, self.finish, **kwargs)
+        return scheduler
+    
+    
+    def hand_over(self, scheduler, stream):
+        entry = scheduler._entries[stream.execution_id]
+        seq, steps = stream.next_batch()
+        entry.batch = (seq, steps, None, stream.done)
+    
+    
+    def test_small_stream_is_not_stuck_behind_a_large_one(self):
+        scheduler = self.refilling_scheduler(quantum=100)
+        large = TraceStream('large', 'a', range(10000), batch_size=100, window=None)
+        small = TraceStream('small', 'b', range(150), batch_size=100, window=None)
+        for stream in (large, small):
+            scheduler.add(stream)
+            self.hand_over(scheduler, stream)
+        scheduler.run()
+        
+        self.assertEqual(self.sent[:4], [('large', 100), ('small', 100), ('large', 100), ('small', 50)])
+        self.assertEqual(self.finished, [('small', None), ('large', None)])
+        self.assertEqual(scheduler.steps_sent, 10150)
+        self.assertEqual(len(scheduler), 0)
+    
+    
+    def test_turns_are_measured_in_steps(self):
+        scheduler = self.refilling_scheduler(quantum=100)
+        streams = [
+            (TraceStream('big_batches', 'a', range(1000), batch_size=300, window=None), 1),
+            (TraceStream('small_batches', 'b', range(1000), batch_size=100, window=None), 1),
+            (TraceStream('weighted', 'c', range(1000), batch_size=100, window=None), 2),
+        ]
+        for stream, weight in streams:
+            scheduler.add(stream, weight)
+            self.hand_over(scheduler, stream)
+        scheduler.run()
+        
+        # A 300 step batch uses up three turns, a weight of 2 sends two batches per turn
+        self.assertEqual(self.sent[:10], [
+            ('big_batches', 300), ('small_batches', 100), ('weighted', 100), ('weighted', 100),
+            ('small_batches', 100), ('weighted', 100), ('weighted', 100),
+            ('small_batches', 100), ('weighted', 100), ('weighted', 100),
+        ])
+    
+    
+    def test_feed_sends_whole_trace(self):
+        scheduler = StreamScheduler(self.send, self.finish, quantum=10)
+        stream = TraceStream('exec', 'a', range(25), batch_size=10, window=None)
+        scheduler.add(stream)
+        scheduler.feed(stream)
+        
+        self.assertEqual(self.sent, [('exec', 10), ('exec', 10), ('exec', 5)])
+        self.assertEqual(self.finished, [('exec', None)])
+        with self.assertRaises(ValueError):
+            scheduler.add(TraceStream('same', 'a', range(5)))
+            scheduler.add(TraceStream('same', 'b', range(5)))
+    
+    
+    def test_blocked_stream_does_not_hold_up_others(self):
+        scheduler = StreamScheduler(self.send, self.finish)
+        release = threading.Event()
+        
+        def slow_steps():
+            yield 1
+            release.wait(5)
+            yield 2
+        
+        slow = TraceStream('slow', 'a', slow_steps(), batch_size=10, window=None)
+        fast = TraceStream('fast', 'b', range(30), batch_size=10, window=None)
+        scheduler.add(slow)
+        scheduler.add(fast)
+        
+        # the slow client's thread blocks on its tracer, the fast client is still served in full
+        feeder = threading.Thread(target=scheduler.feed, args=(slow,))
+        feeder.start()
+        scheduler.feed(fast)
+        self.assertIn(('fast', None), self.finished)
+        self.assertNotIn('slow', [execution_id for execution_id, _ in self.sent])
+        
+        release.set()
+        feeder.join(5)
+        self.assertEqual(self.finished[-1], ('slow', None))
+        self.assertEqual(len(scheduler), 0)
+    
+    
+    def test_session_in_flight_limit(self):
+        scheduler = StreamScheduler(self.send, self.finish, max_in_flight=5)
+        first = TraceStream('first', 'a', range(1000), batch_size=10, window=4)
+        second = TraceStream('second', 'a', range(1000), batch_size=10, window=4)
+        other = TraceStream('other', 'b', range(1000), batch_size=10, window=4)
+        for stream in (first, second, other):
+            scheduler.add(stream)
+            scheduler.feed(stream)
+        
+        self.assertEqual(self.sent.count(('first', 10)) + self.sent.count(('second', 10)), 5)
+        self.assertEqual(self.sent.count(('other', 10)), 4)
+        stats = scheduler.stats()
+        self.assertEqual(stats['queued'], 1)
+        self.assertEqual(stats['throttled'], 1)
+        self.assertEqual(stats['ready'], 0)
+        self.assertEqual(stats['max_session_in_flight'], 5)
+        
+        # an ack for either of the session's streams lets the held back batch out
+        first.ack()
+        scheduler.feed(first)
+        self.assertEqual(self.sent.count(('first', 10)) + self.sent.count(('second', 10)), 6)
+        self.assertEqual(scheduler.stats()['max_session_in_flight'], 5)
+    
+    
+    def test_stream_wider_than_in_flight_limit_completes_on_its_own_acks(self):
+        scheduler = StreamScheduler(self.send, self.finish, max_in_flight=16)
+        stream = TraceStream('wide', 'a', range(1000), batch_size=10, window=20)
+        scheduler.add(stream)
+        scheduler.feed(stream)
+        self.assertEqual(len(self.sent), 16)
+        
+        # the client acks every batch it receives, the batch held back by the limit must go out too
+        acked = 0
+        while acked < len(self.sent):
+            acked += 1
+            stream.ack()
+            scheduler.feed(stream)
+        
+        self.assertEqual(len(self.sent), 100)
+        self.assertEqual(self.finished, [('wide', None)])
+        self.assertEqual(len(scheduler), 0)
+    
+    
+    def test_failed_tracer(self):
+        scheduler = StreamScheduler(self.send, self.finish)
+        stream = TraceStream('failing', 'a', failing_steps(), batch_size=10, window=None)
+        scheduler.add(stream)
+        scheduler.feed(stream)
+        
+        self.assertEqual(self.sent, [])
+        self.assertEqual(self.finished[0][0], 'failing')
+        self.assertIsInstance(self.finished[0][1], RuntimeError)
+        self.assertNotIn('failing', scheduler)
+    
+    
+    def test_removed_stream_stops_feeding(self):
+        scheduler = StreamScheduler(self.send, self.finish)
+        stream = TraceStream('exec', 'a', range(100), batch_size=10, window=2)
+        scheduler.add(stream)
+        scheduler.feed(stream)
+        self.assertEqual(len(self.sent), 2)
+        
+        scheduler.remove('exec')
+        stream.ack(2)
+        scheduler.feed(stream)
+        self.assertEqual(len(self.sent), 2)
+        self.assertEqual(self.finished, [])
@@ -0,0 +1,58 @@
+import unittest
+from backend.streaming import TraceStream, parse_flow_control
+from backend.algorithms.fibonacci import fibonacci_recursive_trace_iter
+
+
+class TraceStreamTest(unittest.TestCase):
+    
+    '''Tests for batched streaming and its credit accounting'''
+    
+    def test_batches_stop_when_credits_run_out(self):
+        stream = TraceStream('exec', 'sid', range(25), batch_size=10, window=2)
+        
+        self.assertEqual(stream.next_batch(), (0, list(range(10))))
+        self.assertEqual(stream.next_batch(), (1, list(range(10, 20))))
+        self.assertFalse(stream.ready())
+        
+        stream.ack(5)
+        self.assertEqual(stream.credits, 2)
+        self.assertEqual(stream.next_batch(), (2, list(range(20, 25))))
+        self.assertTrue(stream.done)
+        self.assertEqual(stream.steps_sent, 25)
+    
+    
+    def test_exact_multiple_of_batch_size(self):
+        stream = TraceStream('exec', 'sid', range(10), batch_size=5, window=4)
+        stream.next_batch()
+        stream.next_batch()
+        self.assertFalse(stream.done)
+        self.assertEqual(stream.next_batch(), (None, []))
+        self.assertTrue(stream.done)
+    
+    
+    def test_close_stops_tracer(self):
+        steps = fibonacci_recursive_trace_iter(25)
+        stream = TraceStream('exec', 'sid', steps, batch_size=10)
+        stream.next_batch()
+        stream.close()
+        
+        self.assertFalse(stream.ready())
+        self.assertEqual(list(steps), [])
+    
+    
+    def test_cancel_stops_tracer(self):
+        steps = fibonacci_recursive_trace_iter(25)
+        stream = TraceStream('exec', 'sid', steps, batch_size=10)
+        stream.next_batch()
+        stream.cancel()
+        
+        self.assertTrue(stream.done)
+        self.assertEqual(list(steps), [])
+    
+    
+    def test_parse_flow_control(self):
+        self.assertEqual(parse_flow_control({'batch_size' : 50, 'window' : 8}), (50, 8))
+        for bad in ({'batch_size' : 0}, {'batch_size' : 'ten'}, {'window' : 0}, {'window' : 10 ** 6}):
+            with self.subTest(data=bad):
+                with self.assertRaises(ValueError):
+                    parse_flow_control(bad)
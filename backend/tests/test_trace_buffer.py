@@ -0,0 +1,53 @@
+import unittest
+from backend.algorithms.trace_buffer import TraceBuffer, _sizeof
+from backend.algorithms.fibonacci import fibonacci_recursive_trace, fibonacci_memo_trace, fibonacci_tab_trace
+from backend.algorithms.fibonacci import fibonacci_recursive_trace_iter
+from backend.algorithms.knapsack import knapsack_recursive_trace, knapsack_memo_trace, knapsack_tab_trace
+from backend.algorithms.lcs import lcs_recursive_trace, lcs_memo_trace, lcs_tab_trace
+
+
+class TraceBufferTest(unittest.TestCase):
+    
+    '''Tests for the columnar trace storage'''
+    
+    def test_round_trip_all_tracers(self):
+        traces = [
+            fibonacci_recursive_trace(8), fibonacci_memo_trace(8), fibonacci_tab_trace(8),
+            fibonacci_memo_trace(8, encoding='delta'), fibonacci_tab_trace(0),
+            knapsack_recursive_trace([10, 20, 30], [60, 100, 120], 50),
+            knapsack_memo_trace([10, 20, 30], [60, 100, 120], 50),
+            knapsack_tab_trace([10, 20, 30], [60, 100, 120], 50, encoding='delta'),
+            lcs_recursive_trace("AGGTAB", "GXTXAYB"), lcs_memo_trace("AGGTAB", "GXTXAYB"),
+            lcs_tab_trace("AGGTAB", "GXTXAYB"),
+        ]
+        for trace in traces:
+            with self.subTest(first=trace[0]['type'], length=len(trace)):
+                buffer = TraceBuffer(trace)
+                self.assertEqual(len(buffer), len(trace))
+                self.assertEqual(list(buffer), trace)
+                self.assertEqual(buffer[-1], trace[-1])
+                self.assertEqual(buffer[2:5], trace[2:5])
+    
+    
+    def test_values_without_a_column(self):
+        huge = 2 ** 80
+        buffer = TraceBuffer([
+            {'type' : 'call', 'id' : 0, 'parent' : None, 'depth' : 0, 'n' : 3},
+            {'type' : 'return', 'id' : 0, 'result' : huge},
+            {'type' : 'traceback_complete', 'result' : 'GTAB', 'result_length' : 4},
+            {'type' : 'custom_event', 'i' : -1},
+        ])
+        self.assertIsNone(buffer[0]['parent'])
+        self.assertEqual(buffer[1]['result'], huge)
+        self.assertEqual(buffer[2]['result'], 'GTAB')
+        self.assertEqual(buffer[3], {'type' : 'custom_event', 'i' : -1})
+        self.assertEqual(buffer.event_types[buffer.type_code(3)], 'custom_event')
+        
+        with self.assertRaises(IndexError):
+            buffer[4]
+    
+    
+    def test_smaller_than_list_of_dicts(self):
+        buffer = TraceBuffer(fibonacci_recursive_trace_iter(15))
+        trace = fibonacci_recursive_trace(15)
+        self.assertLess(buffer.nbytes(), _sizeof(trace) / 2)
@@ -0,0 +1,64 @@
+import unittest
+from backend.trace_cache import TraceCache, cache_key
+from backend.algorithms.trace_buffer import TraceBuffer
+from backend.algorithms.fibonacci import fibonacci_recursive_trace, fibonacci_recursive_trace_iter
+
+
+class TraceCacheTest(unittest.TestCase):
+    
+    '''Tests for the shared LRU trace cache'''
+    
+    def test_key_is_canonical(self):
+        self.assertEqual(
+            cache_key('knapsack', 'tabulation', {'weights' : [1], 'values' : [2], 'capacity' : 3}),
+            cache_key('knapsack', 'tabulation', {'capacity' : 3, 'values' : [2], 'weights' : [1]}, {})
+        )
+        self.assertNotEqual(
+            cache_key('fibonacci', 'tabulation', {'n' : 5}),
+            cache_key('fibonacci', 'tabulation', {'n' : 5}, {'encoding' : 'delta'})
+        )
+    
+    
+    def test_hit_replays_without_tracing(self):
+        cache = TraceCache()
+        calls = []
+        
+        def create():
+            calls.append(1)
+            return fibonacci_recursive_trace_iter(6)
+        
+        self.assertEqual(list(cache.steps('fib6', create)), fibonacci_recursive_trace(6))
+        self.assertEqual(list(cache.steps('fib6', create)), fibonacci_recursive_trace(6))
+        self.assertEqual(len(calls), 1)
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+    
+    
+    def test_abandoned_trace_is_not_stored(self):
+        cache = TraceCache()
+        steps = cache.steps('fib6', lambda: fibonacci_recursive_trace_iter(6))
+        next(steps)
+        steps.close()
+        self.assertNotIn('fib6', cache)
+    
+    
+    def test_lru_eviction_by_bytes(self):
+        size = TraceBuffer(fibonacci_recursive_trace(6)).nbytes()
+        cache = TraceCache(max_bytes=size * 2)
+        for key in ('a', 'b'):
+            list(cache.steps(key, lambda: fibonacci_recursive_trace_iter(6)))
+        
+        cache.get('a')
+        list(cache.steps('c', lambda: fibonacci_recursive_trace_iter(6)))
+        
+        self.assertIn('a', cache)
+        self.assertNotIn('b', cache)
+        self.assertIn('c', cache)
+        self.assertEqual(cache.evictions, 1)
+        self.assertLessEqual(cache.stats()['bytes'], size * 2)
+    
+    
+    def test_trace_over_budget_is_not_stored(self):
+        cache = TraceCache(max_bytes=1024)
+        self.assertEqual(len(list(cache.steps('fib12', lambda: fibonacci_recursive_trace_iter(12)))),
+                         len(fibonacci_recursive_trace(12)))
+        self.assertEqual(len(cache), 0)
@@ -0,0 +1,181 @@
+import json
+import os
+import tempfile
+import unittest
+from backend.trace_store import TraceStore
+from backend.payloads import encode_payloads
+from backend.algorithms.knapsack import knapsack_recursive_trace, knapsack_recursive_trace_iter
+
+
+class TraceStoreTest(unittest.TestCase):
+    
+    '''Tests for the memory mapped on-disk trace store'''
+    
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.store = TraceStore(self.directory.name)
+    
+    
+    def tearDown(self):
+        self.store.close()
+        self.directory.cleanup()
+    
+    
+    def test_record_and_read_back(self):
+        trace = knapsack_recursive_trace([10, 20, 30], [60, 100, 120], 50)
+        payloads = list(encode_payloads(trace))
+        
+        self.assertIsNone(self.store.get('key'))
+        self.assertEqual(list(self.store.record('key', iter(payloads))), payloads)
+        
+        stored = self.store.get('key')
+        self.assertEqual(len(stored), len(trace))
+        self.assertEqual(list(stored), payloads)
+        self.assertEqual(json.loads(stored[-1]), json.loads(json.dumps(trace[-1])))
+        self.assertEqual(stored[5:8], payloads[5:8])
+        with self.assertRaises(IndexError):
+            stored[len(trace)]
+    
+    
+    def test_survives_restart(self):
+        payloads = encode_payloads(knapsack_recursive_trace_iter([1, 2], [3, 4], 3))
+        expected = list(self.store.record('key', payloads))
+        self.store.close()
+        
+        self.store = TraceStore(self.directory.name)
+        self.assertEqual(list(self.store.get('key')), expected)
+    
+    
+    def test_abandoned_trace_leaves_no_files(self):
+        recording = self.store.record('key', encode_payloads(knapsack_recursive_trace_iter([1, 2], [3, 4], 3)))
+        next(recording)
+        recording.close()
+        
+        self.assertIsNone(self.store.get('key'))
+        self.assertEqual(os.listdir(self.directory.name), [])
+    
+    
+    def test_empty_trace(self):
+        self.assertEqual(list(self.store.record('empty', iter([]))), [])
+        self.assertEqual(len(self.store.get('empty')), 0)
+    
+    
+    def record(self, key, store=None):
+        payloads = encode_payloads(knapsack_recursive_trace_iter([1, 2], [3, 4], 3))
+        return list((store or self.store).record(key, payloads))
+    
+    
+    def test_open_traces_are_bounded(self):
+        self.store.close()
+        self.store = TraceStore(self.directory.name, max_open=2)
+        expected = {key : self.record(key) for key in ('a', 'b', 'c')}
+        
+        a = self.store.get('a')
+        self.store.get('b')
+        self.store.get('a')
+        self.store.get('c')
+        # 'b' was read least recently, so it is the one closed
+        self.assertEqual(list(self.store._open), ['a', 'c'])
+        
+        b = self.store.get('b')
+        self.assertEqual(list(self.store._open), ['c', 'b'])
+        self.assertTrue(a.closed)
+        self.assertFalse(b.closed)
+        # a stream still reading a closed trace maps it again
+        self.assertEqual(list(a), expected['a'])
+    
+    
+    def test_store_is_pruned_to_max_bytes(self):
+        self.record('a')
+        size = sum(os.path.getsize(os.path.join(self.directory.name, name)) for name in os.listdir(self.directory.name))
+        self.store.close()
+        self.store = TraceStore(self.directory.name, max_bytes=2 * size)
+        
+        self.record('b')
+        for key, mtime in (('a', 100), ('b', 200)):
+            os.utime(os.path.join(self.directory.name, key + '.data'), (mtime, mtime))
+        self.record('c')
+        
+        # the least recently read trace makes room
+        self.assertIsNone(self.store.get('a'))
+        self.assertIsNotNone(self.store.get('b'))
+        self.assertIsNotNone(self.store.get('c'))
+        self.assertEqual(len(os.listdir(self.directory.name)), 4)
+        
+        # mapped traces and the one just recorded are kept
+        self.record('d')
+        self.assertEqual(sorted(os.listdir(self.directory.name)),
+                         ['b.data', 'b.index', 'c.data', 'c.index', 'd.data', 'd.index'])
+        self.assertEqual(self.store.prune(), ['d'])
+    
+    
+    def test_old_traces_are_pruned(self):
+        self.record('old')
+        self.record('new')
+        os.utime(os.path.join(self.directory.name, 'old.data'), (100, 100))
+        self.store.close()
+        
+        self.store = TraceStore(self.directory.name, max_age=3600)
+        self.assertIsNone(self.store.get('old'))
+        self.assertIsNotNone(self.store.get('new'))
+    
+    
+    def test_concurrent_recordings_of_a_key_use_their_own_files(self):
+        payloads = list(encode_payloads(knapsack_recursive_trace_iter([1, 2], [3, 4], 3)))
+        first = self.store.record('key', iter(payloads))
+        second = self.store.record('key', iter(payloads))
+        # both on the same thread, interleaved
+        next(first)
+        next(second)
+        self.assertEqual(len([name for name in os.listdir(self.directory.name) if name.endswith('.tmp')]), 4)
+        
+        self.assertEqual(list(first), payloads[1:])
+        self.assertEqual(list(second), payloads[1:])
+        self.assertEqual(list(self.store.get('key')), payloads)
+        self.assertEqual(sorted(os.listdir(self.directory.name)), ['key.data', 'key.index'])
+    
+    
+    def test_stale_temporary_files_are_pruned(self):
+        stale = os.path.join(self.directory.name, 'crashed.data.x.tmp')
+        fresh = os.path.join(self.directory.name, 'running.data.y.tmp')
+        for path in (stale, fresh):
+            open(path, 'wb').close()
+        os.utime(stale, (100, 100))
+        
+        recording = self.store.record('key', encode_payloads(knapsack_recursive_trace_iter([1, 2], [3, 4], 3)))
+        next(recording)
+        for path in self.store._recording:
+            os.utime(path, (100, 100))
+        
+        self.store.prune()
+        self.assertFalse(os.path.exists(stale))
+        self.assertTrue(os.path.exists(fresh))
+        # a recording still in progress keeps its files however long it has been paused
+        self.assertEqual(len([name for name in os.listdir(self.directory.name) if name.startswith('key.')]), 2)
+        recording.close()
+    
+    
+    def test_reopened_traces_are_tracked(self):
+        self.store.close()
+        self.store = TraceStore(self.directory.name, max_open=1)
+        expected = {key : self.record(key) for key in ('a', 'b')}
+        
+        a = self.store.get('a')
+        b = self.store.get('b')
+        self.assertTrue(a.closed)
+        self.assertEqual(list(self.store._open), ['b'])
+        
+        # reading 'a' again maps it again, and the store closes 'b' to stay within max_open
+        self.assertEqual(list(a), expected['a'])
+        self.assertEqual(list(self.store._open), ['a'])
+        self.assertTrue(b.closed)
+        self.assertIs(self.store.get('a'), a)
+        
+        # 'b' is unmapped but still held, so pruning leaves its files for the reader
+        self.store.max_bytes = 1
+        self.assertEqual(self.store.prune(), [])
+        self.assertEqual(list(b), expected['b'])
+        
+        del a, b
+        self.store.close()
+        self.assertEqual(sorted(self.store.prune()), ['a', 'b'])
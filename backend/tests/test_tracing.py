@@ -0,0 +1,226 @@
+import unittest
+from backend.algorithms.tracing import expand_table_deltas, table_at, expand_memo_deltas, memo_at, expand_deltas
+from backend.algorithms.tracing import keyframe_positions, expand_subtrees, table_blocks
+from backend.algorithms.trace_buffer import TraceBuffer
+from backend.algorithms.explanations import TEMPLATE_IDS, render_explanation
+from backend.algorithms.fibonacci import fibonacci_memo_trace, fibonacci_tab_trace, fibonacci_recursive_trace
+from backend.algorithms.knapsack import knapsack_memo_trace, knapsack_tab_trace, knapsack_recursive_trace
+from backend.algorithms.lcs import lcs_memo_trace, lcs_tab_trace, lcs_recursive_trace
+
+
+class TableEncodingTest(unittest.TestCase):
+    
+    '''Tests for the delta table encoding shared by the tabulation tracers'''
+    
+    def setUp(self):
+        self.cases = [
+            (fibonacci_tab_trace, (12,)),
+            (knapsack_tab_trace, ([10, 20, 30], [60, 100, 120], 50)),
+            (lcs_tab_trace, ("AGGTAB", "GXTXAYB")),
+        ]
+    
+    
+    def test_delta_steps_carry_cells_not_tables(self):
+        trace = knapsack_tab_trace([10, 20, 30], [60, 100, 120], 50, encoding='delta', keyframe_interval=10)
+        iterations = [step for step in trace if step['type'] == 'iteration']
+        
+        self.assertTrue(all('cell' in step for step in iterations))
+        self.assertEqual(sum('table' in step for step in iterations), len(iterations) // 10)
+        self.assertEqual(trace[-1]['result'], 220)
+    
+    
+    def test_expand_matches_full_encoding(self):
+        for tracer, args in self.cases:
+            for interval in (1, 3, 64):
+                with self.subTest(tracer=tracer.__name__, interval=interval):
+                    delta = tracer(*args, encoding='delta', keyframe_interval=interval)
+                    self.assertEqual(list(expand_table_deltas(delta)), tracer(*args))
+    
+    
+    def test_table_at_rebuilds_every_snapshot(self):
+        for tracer, args in self.cases:
+            with self.subTest(tracer=tracer.__name__):
+                full = tracer(*args)
+                delta = tracer(*args, encoding='delta', keyframe_interval=7)
+                for k, step in enumerate(full):
+                    if 'table' in step:
+                        self.assertEqual(table_at(delta, k), step['table'])
+    
+    
+    def test_table_at_with_keyframe_index(self):
+        for tracer, args in self.cases:
+            with self.subTest(tracer=tracer.__name__):
+                full = tracer(*args)
+                delta = TraceBuffer(tracer(*args, encoding='delta', keyframe_interval=7))
+                keyframes = keyframe_positions(delta, 'table')
+                self.assertEqual(keyframes, [k for k, step in enumerate(delta) if 'table' in step])
+                for k, step in enumerate(full):
+                    if 'table' in step:
+                        self.assertEqual(table_at(delta, k, keyframes), step['table'])
+    
+    
+    def test_unknown_encoding(self):
+        with self.assertRaises(ValueError):
+            lcs_tab_trace("AB", "BA", encoding='zip')
+
+
+class MemoEncodingTest(unittest.TestCase):
+    
+    '''Tests for the delta memo encoding shared by the memoized tracers'''
+    
+    def setUp(self):
+        self.cases = [
+            (fibonacci_memo_trace, (12,)),
+            (knapsack_memo_trace, ([1, 3, 4, 5], [1, 4, 5, 7], 7)),
+            (lcs_memo_trace, ("AGGTAB", "GXTXAYB")),
+        ]
+    
+    
+    def test_delta_steps_carry_entries_not_memos(self):
+        trace = lcs_memo_trace("AGGTAB", "GXTXAYB", encoding='delta', keyframe_interval=1000)
+        stores = [step for step in trace if step['type'] == 'store_result']
+        
+        self.assertTrue(all('memo_entry' in step and 'memo' not in step for step in stores))
+        self.assertFalse(any('memo' in step for step in trace if step['type'] == 'cache_hit'))
+        self.assertEqual(trace[-1]['result'], 4)
+    
+    
+    def test_expand_matches_full_encoding(self):
+        for tracer, args in self.cases:
+            for interval in (1, 4, 64):
+                with self.subTest(tracer=tracer.__name__, interval=interval):
+                    delta = tracer(*args, encoding='delta', keyframe_interval=interval)
+                    self.assertEqual(list(expand_memo_deltas(delta)), tracer(*args))
+                    self.assertEqual(list(expand_deltas(delta)), tracer(*args))
+    
+    
+    def test_memo_at_rebuilds_every_snapshot(self):
+        for tracer, args in self.cases:
+            with self.subTest(tracer=tracer.__name__):
+                full = tracer(*args)
+                delta = tracer(*args, encoding='delta', keyframe_interval=5)
+                for k, step in enumerate(full):
+                    if 'memo' in step:
+                        self.assertEqual(memo_at(delta, k), step['memo'])
+                        self.assertEqual(memo_at(delta, k, keyframe_positions(delta, 'memo')), step['memo'])
+
+
+class SubtreeDedupTest(unittest.TestCase):
+    
+    '''Tests for the recursive traces with repeated subtrees sent as references'''
+    
+    def test_expands_to_the_full_trace(self):
+        cases = [
+            (fibonacci_recursive_trace, (0,)), (fibonacci_recursive_trace, (12,)),
+            (knapsack_recursive_trace, ([3, 4, 5, 9, 2, 1, 1], [4, 5, 6, 7, 8, 1, 2], 12)),
+            (knapsack_recursive_trace, ([1] * 8, [1] * 8, 4)),
+            (lcs_recursive_trace, ("ABCBDAB", "BDCABA")), (lcs_recursive_trace, ("", "AB")),
+        ]
+        for tracer, args in cases:
+            for explanations in ('text', 'template'):
+                with self.subTest(tracer=tracer.__name__, args=args, explanations=explanations):
+                    full = tracer(*args, explanations)
+                    compressed = tracer(*args, explanations, dedup=True)
+                    self.assertEqual(list(expand_subtrees(compressed)), full)
+                    self.assertEqual(compressed[-1]['result'], full[-1]['result'])
+    
+    
+    def test_references_stand_for_earlier_subtrees(self):
+        full = fibonacci_recursive_trace(6)
+        compressed = fibonacci_recursive_trace(6, dedup=True)
+        self.assertEqual(len(compressed), 18)
+        self.assertEqual(len(full), 50)
+        
+        ref = next(step for step in compressed if step['type'] == 'subtree_ref' and step['n'] == 4)
+        original = full[ref['ref']]
+        self.assertEqual((original['type'], original['n']), ('call', 4))
+        # ids are still the positions of the steps in the full trace
+        self.assertEqual(full[ref['id']]['n'], 4)
+        self.assertEqual(ref['id'] - ref['ref'], ref['id_offset'])
+        self.assertEqual(ref['result'], 3)
+        self.assertEqual(full[ref['id'] + ref['length']]['id'], full[ref['id']]['parent'])
+    
+    
+    def test_invalid_dedup(self):
+        with self.assertRaises(ValueError):
+            list(fibonacci_recursive_trace(3, dedup='yes'))
+
+
+class GranularityTest(unittest.TestCase):
+    
+    '''Tests for tabulation traces with one event per row, anti-diagonal or stride of cells'''
+    
+    def setUp(self):
+        self.cases = [
+            (knapsack_tab_trace, ([3, 4, 5, 9, 2], [4, 5, 6, 7, 8], 12)),
+            (knapsack_tab_trace, ([4], [9], 0)),
+            (lcs_tab_trace, ("AGGTAB", "GXTXAYB")),
+            (lcs_tab_trace, ("", "ABC")),
+        ]
+    
+    
+    def test_blocks_cover_every_cell_once_in_fill_order(self):
+        for granularity, stride in (('row', 1), ('diagonal', 1), ('stride', 1), ('stride', 4), ('stride', 100)):
+            with self.subTest(granularity=granularity, stride=stride):
+                cells = []
+                for block in table_blocks(3, 5, granularity, stride):
+                    for row, col, length, diagonal in block:
+                        cells += [(row + k, col - k) if diagonal else (row, col + k) for k in range(length)]
+                self.assertEqual(sorted(cells), [(i, j) for i in range(1, 4) for j in range(1, 6)])
+                # every cell's upper and left neighbours are filled before it
+                position = {cell : k for k, cell in enumerate(cells)}
+                for (i, j), k in position.items():
+                    self.assertLess(position.get((i - 1, j), -1), k)
+                    self.assertLess(position.get((i, j - 1), -1), k)
+    
+    
+    def test_coarse_traces_reach_the_same_tables(self):
+        for tracer, args in self.cases:
+            cell = tracer(*args)
+            for granularity in ('row', 'diagonal', 'stride'):
+                with self.subTest(tracer=tracer.__name__, args=args, granularity=granularity):
+                    coarse = tracer(*args, granularity=granularity, stride=5)
+                    blocks = [step for step in coarse if step['type'] == 'iteration_block']
+                    self.assertNotIn('iteration', [step['type'] for step in coarse])
+                    self.assertEqual(sum(step['count'] for step in blocks),
+                                     sum(step['type'] == 'iteration' for step in cell))
+                    # the blocks leave off where the cells do, and the rest of the trace is the same
+                    if blocks:
+                        last_cell = [step for step in cell if step['type'] == 'iteration'][-1]
+                        self.assertEqual(blocks[-1]['table'], last_cell['table'])
+                    self.assertEqual([step for step in coarse if step['type'] != 'iteration_block'],
+                                     [step for step in cell if step['type'] != 'iteration'])
+    
+    
+    def test_delta_spans_rebuild_every_table(self):
+        cases = self.cases + [(fibonacci_tab_trace, (30,)), (fibonacci_tab_trace, (1,))]
+        for tracer, args in cases:
+            for granularity in (('stride',) if tracer is fibonacci_tab_trace else ('row', 'diagonal', 'stride')):
+                for interval in (1, 3, 64):
+                    with self.subTest(tracer=tracer.__name__, args=args, granularity=granularity, interval=interval):
+                        full = tracer(*args, granularity=granularity, stride=4)
+                        delta = tracer(*args, encoding='delta', keyframe_interval=interval, granularity=granularity,
+                                       stride=4)
+                        self.assertEqual(list(expand_table_deltas(delta)), full)
+                        for k, step in enumerate(full):
+                            if 'table' in step:
+                                self.assertEqual(table_at(delta, k), step['table'])
+    
+    
+    def test_row_blocks(self):
+        trace = lcs_tab_trace("ABCB", "BDCAB", explanations='template', granularity='row')
+        blocks = [step for step in trace if step['type'] == 'iteration_block']
+        self.assertEqual(len(blocks), 4)
+        self.assertEqual(blocks[1]['highlight'], {'row' : 2, 'col' : 5})
+        self.assertEqual(blocks[1]['explanation'], [TEMPLATE_IDS['table.fill_row'], 2, 5])
+        self.assertEqual(render_explanation(blocks[1]['explanation']), 'Filled row 2 of the DP table (5 cells).')
+        self.assertEqual(fibonacci_tab_trace(10, granularity='stride', stride=4)[-1]['result'], 55)
+    
+    
+    def test_invalid_granularity(self):
+        with self.assertRaises(ValueError):
+            list(lcs_tab_trace("AB", "BA", granularity='column'))
+        with self.assertRaises(ValueError):
+            list(knapsack_tab_trace([1], [1], 2, granularity='stride', stride=0))
+        with self.assertRaises(ValueError):
+            list(fibonacci_tab_trace(5, granularity='row'))
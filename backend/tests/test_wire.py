@@ -0,0 +1,145 @@
+import json
+import unittest
+from backend.wire import StepCodec, wire_schema, schemas_from_wire, parse_wire_format, EXTRA_BIT, HEADER
+from backend.algorithms.fibonacci import fibonacci_recursive_trace, fibonacci_memo_trace, fibonacci_tab_trace
+from backend.algorithms.fibonacci import fibonacci_fast_doubling_trace
+from backend.algorithms.knapsack import knapsack_recursive_trace, knapsack_memo_trace, knapsack_tab_trace
+from backend.algorithms.knapsack import knapsack_tab_1d_trace
+from backend.algorithms.lcs import lcs_recursive_trace, lcs_memo_trace, lcs_tab_trace
+from backend.algorithms.lcs import lcs_hirschberg_trace, lcs_bitparallel_trace
+
+
+def as_json(trace):
+    # what a JSON client receives: tuples become lists, memo keys become strings
+    return json.loads(json.dumps(trace))
+
+
+class StepCodecTest(unittest.TestCase):
+    
+    '''Tests for the binary wire format'''
+    
+    def test_round_trip_all_tracers(self):
+        codec = StepCodec()
+        traces = [
+            fibonacci_recursive_trace(8), fibonacci_memo_trace(8), fibonacci_tab_trace(8),
+            fibonacci_memo_trace(8, encoding='delta'), fibonacci_tab_trace(0),
+            knapsack_recursive_trace([10, 20, 30], [60, 100, 120], 50),
+            knapsack_memo_trace([10, 20, 30], [60, 100, 120], 50, encoding='delta'),
+            knapsack_tab_trace([10, 20, 30], [60, 100, 120], 50),
+            lcs_recursive_trace("AGGTAB", "GXTXAYB"), lcs_memo_trace("AGGTAB", "GXTXAYB"),
+            lcs_tab_trace("AGGTAB", "GXTXAYB", encoding='delta'),
+            knapsack_tab_trace([10, 20, 30], [60, 100, 120], 50, explanations='template'),
+            lcs_tab_trace("AGGTAB", "GXTXAYB", encoding='delta', explanations='template'),
+            fibonacci_tab_trace(100), lcs_recursive_trace("AGGTAB", "GXTXAYB", explanations='template'),
+            knapsack_recursive_trace([1] * 8, [1] * 8, 4, dedup=True),
+            knapsack_tab_trace([10, 20, 30], [60, 100, 120], 50, granularity='row'),
+            lcs_tab_trace("AGGTAB", "GXTXAYB", encoding='delta', granularity='diagonal', explanations='template'),
+            fibonacci_tab_trace(40, encoding='delta', granularity='stride', stride=7),
+            knapsack_tab_1d_trace([10, 20, 30], [60, 100, 120], 50, encoding='delta', explanations='template'),
+            lcs_hirschberg_trace("AGGTAB", "GXTXAYB"), lcs_hirschberg_trace("ACGT" * 40, "GATTACA" * 10, 'template'),
+            lcs_bitparallel_trace("ACGT" * 40, "GATTACA" * 10, 'template'),
+            fibonacci_fast_doubling_trace(100), fibonacci_fast_doubling_trace(50_000, 'template'),
+        ]
+        for trace in traces:
+            with self.subTest(first=trace[0]['type'], length=len(trace)):
+                self.assertEqual(codec.decode_steps(codec.encode_steps(trace)), as_json(trace))
+    
+    
+    def test_values_outside_the_schema(self):
+        codec = StepCodec()
+        steps = [
+            {'type' : 'call', 'id' : 0, 'parent' : None, 'depth' : 0, 'n' : 3, 'explanation' : 'fib(3) ✓'},
+            {'type' : 'return', 'id' : 0, 'result' : 2 ** 80},
+            {'type' : 'traceback_complete', 'result' : 'GTAB', 'result_length' : 4},
+            {'type' : 'mismatch', 'id' : 1, 'note' : [1, 2]},
+            {'type' : 'custom_event', 'i' : -1},
+        ]
+        self.assertEqual(codec.decode_steps(codec.encode_steps(steps)), steps)
+        
+        step, offset = codec.decode_step(codec.encode_step(steps[0]))
+        self.assertEqual(step, steps[0])
+        self.assertEqual(offset, len(codec.encode_step(steps[0])))
+    
+    
+    def test_schema_sent_to_client_decodes(self):
+        trace = knapsack_tab_trace([10, 20, 30], [60, 100, 120], 50, encoding='delta')
+        blob = StepCodec().encode_steps(trace)
+        
+        client = StepCodec(schemas_from_wire(json.loads(json.dumps(wire_schema()))))
+        self.assertEqual(client.decode_steps(blob), as_json(trace))
+    
+    
+    def test_smaller_than_json(self):
+        trace = lcs_recursive_trace("ABCBDAB", "BDCABA")
+        self.assertLess(len(StepCodec().encode_steps(trace)), len(json.dumps(trace).encode('utf-8')) / 2)
+    
+    
+    def test_packed_kinds(self):
+        codec = StepCodec()
+        steps = [
+            {'type' : 'iteration', 'i' : 1, 'w' : 5, 'highlight' : {'row' : 1, 'col' : 5}, 'explanation' : [21, 1, 5, 4],
+             'cell' : {'row' : 1, 'col' : 5, 'value' : 4}},
+            {'type' : 'set_base_case', 'cell' : {'index' : 1, 'value' : 1}, 'explanation' : [9]},
+            {'type' : 'traceback_match', 'char' : 'B', 'explanation' : [33, 'B']},
+            {'type' : 'init_table', 'table' : [[0, -200, 70000], [1, 2, 3]], 'explanation' : 'Initialized.'},
+            {'type' : 'final_result', 'table' : [0, 1, 1, 2, 3, 5], 'result' : 5},
+            {'type' : 'init_table', 'table' : [], 'explanation' : [28, 1, 1]},
+            {'type' : 'init_table', 'table' : [[], []]},
+            {'type' : 'iteration', 'cell' : {'row' : 300, 'col' : -2, 'value' : -2 ** 63}},
+            {'type' : 'init_table', 'table' : [[2 ** 63 - 1, -2 ** 63, 0], [40000, 40001, 40003]]},
+            {'type' : 'store_result', 'memo' : {'(0, 5)' : 1, '(10, -6)' : 2 ** 40, '(1, 2)' : -3}},
+            {'type' : 'store_result', 'memo' : {'(0, 5, 1)' : 1}},
+            {'type' : 'cache_hit', 'memo' : {'x' : 1, '(1, 2)' : 2, '(1,2)' : 3}},
+            {'type' : 'store_result', 'memo' : {}},
+        ]
+        for step in steps:
+            with self.subTest(step=step):
+                blob = codec.encode_step(step)
+                # templated explanations, cells, highlights and integer tables all fit the schema
+                self.assertFalse(HEADER.unpack_from(blob)[1] & EXTRA_BIT)
+                self.assertEqual(codec.decode_step(blob), (step, len(blob)))
+        
+        # a table of small integers takes one byte per cell
+        table = [[row * col % 100 for col in range(50)] for row in range(50)]
+        self.assertLess(len(codec.encode_step({'type' : 'init_table', 'table' : table})), 2600)
+        
+        # and so does a table of wide integers that grow slowly along its rows, as DP tables do
+        table = [[row * 100000 + col for col in range(50)] for row in range(50)]
+        self.assertLess(len(codec.encode_step({'type' : 'init_table', 'table' : table})), 2700)
+        
+        # memo keys that are ints or tuples of ints are sent as varints, and come back as JSON keys
+        memo = {(i, j) : i * j for i in range(20) for j in range(20)}
+        step = {'type' : 'store_result', 'memo' : {str(key) : value for key, value in memo.items()}}
+        blob = codec.encode_step(step)
+        self.assertLess(len(blob), 4 * len(memo) + 20)
+        self.assertEqual(codec.decode_step(blob)[0], step)
+        step = {'type' : 'cache-hit', 'memo' : {n : n * n for n in range(100)}}
+        self.assertEqual(codec.decode_step(codec.encode_step(step))[0], as_json(step))
+    
+    
+    def test_packed_kinds_fall_back_to_extra(self):
+        codec = StepCodec()
+        steps = [
+            {'type' : 'final_result', 'table' : [0, 1, 2 ** 70], 'result' : 2 ** 70},
+            {'type' : 'init_table', 'table' : [[1, 2], [3]]},
+            {'type' : 'init_table', 'table' : [[1.5]]},
+            {'type' : 'iteration', 'cell' : {'row' : 1, 'value' : 2}, 'highlight' : {'row' : 1}},
+            {'type' : 'iteration', 'cell' : {'row' : 1, 'col' : 1, 'value' : 2 ** 64}},
+            {'type' : 'traceback_step', 'explanation' : [70000, 1]},
+            {'type' : 'traceback_step', 'explanation' : None},
+            {'type' : 'store_result', 'memo' : {'(0, 5)' : 2 ** 64}},
+            {'type' : 'store_result', 'memo' : {'(0, 5)' : True}},
+            {'type' : 'store_result', 'memo' : {'(0, 5)' : [1, 2]}},
+        ]
+        for step in steps:
+            with self.subTest(step=step):
+                blob = codec.encode_step(step)
+                self.assertTrue(HEADER.unpack_from(blob)[1] & EXTRA_BIT)
+                self.assertEqual(codec.decode_step(blob), (step, len(blob)))
+    
+    
+    def test_parse_wire_format(self):
+        self.assertEqual(parse_wire_format({}), 'json')
+        self.assertEqual(parse_wire_format({'wire_format' : 'binary'}), 'binary')
+        with self.assertRaises(ValueError):
+            parse_wire_format({'wire_format' : 'msgpack'})
@@ -0,0 +1,91 @@
+import time
+import unittest
+from backend.workers import TracerPool, TraceLimitExceeded, WorkersBusy
+from backend.algorithms.fibonacci import fibonacci_recursive_trace_iter, fibonacci_recursive_trace
+from backend.algorithms.knapsack import knapsack_tab_trace_iter, knapsack_tab_trace
+
+
+class TracerPoolTest(unittest.TestCase):
+    
+    '''Tests for running tracers in worker processes'''
+    
+    def setUp(self):
+        self.pool = TracerPool(max_workers=1, timeout=5, chunk_size=16)
+    
+    
+    def tearDown(self):
+        self.pool.close()
+    
+    
+    def test_steps_match_inline_tracer(self):
+        self.assertEqual(list(self.pool.run(fibonacci_recursive_trace_iter, (10,))), fibonacci_recursive_trace(10))
+        
+        args = ([10, 20, 30], [60, 100, 120], 50)
+        steps = list(self.pool.run(knapsack_tab_trace_iter, args, {'encoding' : 'delta'}))
+        self.assertEqual(steps, knapsack_tab_trace(*args, encoding='delta'))
+    
+    
+    def test_tracer_errors_are_raised(self):
+        with self.assertRaises(ValueError):
+            list(self.pool.run(knapsack_tab_trace_iter, ([1], [1], 1), {'encoding' : 'zip'}))
+        # the worker is still usable afterwards
+        self.assertEqual(len(list(self.pool.run(fibonacci_recursive_trace_iter, (5,)))), len(fibonacci_recursive_trace(5)))
+    
+    
+    def test_timeout_stops_job(self):
+        started = time.monotonic()
+        with self.assertRaises(TraceLimitExceeded):
+            list(self.pool.run(fibonacci_recursive_trace_iter, (40,), timeout=0.3))
+        self.assertLess(time.monotonic() - started, 3)
+        self.assertEqual(list(self.pool.run(fibonacci_recursive_trace_iter, (6,))), fibonacci_recursive_trace(6))
+    
+    
+    def test_step_limit_stops_job(self):
+        with self.assertRaises(TraceLimitExceeded):
+            list(self.pool.run(fibonacci_recursive_trace_iter, (20,), max_steps=100))
+    
+    
+    def test_closing_generator_frees_worker(self):
+        steps = self.pool.run(fibonacci_recursive_trace_iter, (40,))
+        next(steps)
+        steps.close()
+        # with a single worker this would block if the slot had not been released
+        self.assertEqual(list(self.pool.run(fibonacci_recursive_trace_iter, (6,))), fibonacci_recursive_trace(6))
+    
+    
+    def test_parked_job_frees_worker(self):
+        # a client that stops reading doesn't keep the worker once its tracer is done
+        parked = self.pool.run(fibonacci_recursive_trace_iter, (12,))
+        first = next(parked)
+        self.assertEqual(list(self.pool.run(fibonacci_recursive_trace_iter, (6,))), fibonacci_recursive_trace(6))
+        self.assertEqual([first] + list(parked), fibonacci_recursive_trace(12))
+    
+    
+    def test_buffered_chunks_are_bounded(self):
+        pool = TracerPool(max_workers=1, timeout=5, chunk_size=16, max_buffered=4)
+        try:
+            steps = pool.run(fibonacci_recursive_trace_iter, (20,))
+            first = next(steps)
+            # the consumer is paused: the rest of the trace is spilled rather than held in memory, and the
+            # worker is still handed back once the tracer is done
+            self.assertEqual(list(pool.run(fibonacci_recursive_trace_iter, (6,))), fibonacci_recursive_trace(6))
+            self.assertLessEqual(pool.buffered(), 4)
+            
+            self.assertEqual([first] + list(steps), fibonacci_recursive_trace(20))
+            self.assertEqual(pool.buffered(), 0)
+        finally:
+            pool.close()
+    
+    
+    def test_waiting_for_a_worker_times_out(self):
+        pool = TracerPool(max_workers=1, timeout=5, acquire_timeout=0.2)
+        try:
+            running = pool.run(fibonacci_recursive_trace_iter, (40,))
+            next(running)
+            started = time.monotonic()
+            with self.assertRaises(WorkersBusy):
+                next(pool.run(fibonacci_recursive_trace_iter, (6,)))
+            self.assertLess(time.monotonic() - started, 2)
+            running.close()
+        finally:
+            pool.close()
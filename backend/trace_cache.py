@@ -0,0 +1,125 @@
+'''
+Process wide cache of completed traces.
+
+Classroom sessions keep asking for the same presets, so a finished trace is kept in a TraceBuffer (or a
+PayloadBuffer of pre-serialized steps) keyed by a canonical hash of (problem, algorithm, params, options).
+Entries are evicted least recently used first once the buffers together go over a byte budget. A cache
+hit replays the stored steps without running the tracer again.
+'''
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+
+from backend.algorithms.trace_buffer import TraceBuffer
+
+
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+
+def cache_key(problem, algorithm_type, params, options=None):
+    '''
+    Canonical hash of a request: the same problem, algorithm, params and options always give the same key,
+    whatever order the client sent the keys in.
+    '''
+    text = json.dumps([problem, algorithm_type, params, options or {}], sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+class TraceCache:
+    '''
+    LRU cache of TraceBuffers with a byte budget and hit/miss/eviction counters.
+    '''
+
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()  # key -> (buffer, nbytes), least recently used first
+        self._nbytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        '''
+        Returns the cached TraceBuffer for the key, or None. Counts a hit or a miss.
+        '''
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, buffer):
+        '''
+        Stores a completed trace, evicting the least recently used entries until it fits.
+        Traces bigger than the whole budget are not stored. Returns True if the trace was stored.
+        '''
+        nbytes = buffer.nbytes()
+        if nbytes > self.max_bytes:
+            return False
+
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._nbytes -= old[1]
+            while self._entries and self._nbytes + nbytes > self.max_bytes:
+                _, (_, evicted_bytes) = self._entries.popitem(last=False)
+                self._nbytes -= evicted_bytes
+                self.evictions += 1
+            self._entries[key] = (buffer, nbytes)
+            self._nbytes += nbytes
+        return True
+
+    def steps(self, key, create):
+        '''
+        Returns the steps for the key, replayed from the cache on a hit. On a miss the steps come from
+        create() and are recorded as they are yielded, see record().
+        '''
+        buffer = self.get(key)
+        if buffer is not None:
+            return iter(buffer)
+        return self.record(key, create())
+
+    def record(self, key, steps, buffer=None):
+        '''
+        Re-yields the steps while copying them into a buffer (a TraceBuffer unless another one is given),
+        which is stored once the steps run out.
+        A trace that is abandoned part way, or that outgrows the budget, is not stored.
+        '''
+        buffer = TraceBuffer() if buffer is None else buffer
+        recording = True
+        for step in steps:
+            if recording:
+                buffer.append(step)
+                if len(buffer) % 1024 == 0 and buffer.nbytes() > self.max_bytes:
+                    recording = False
+                    buffer.clear()
+            yield step
+        if recording:
+            self.put(key, buffer)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'entries' : len(self._entries),
+                'bytes' : self._nbytes,
+                'max_bytes' : self.max_bytes,
+                'hits' : self.hits,
+                'misses' : self.misses,
+                'evictions' : self.evictions
+            }
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._nbytes = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
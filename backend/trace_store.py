@@ -0,0 +1,277 @@
+'''
+Append-only on-disk store for traces too large to keep in memory.
+
+A trace is written as two files named after its cache key:
+- '<key>.data' : the serialized step payloads, one after another
+- '<key>.index' : one little endian uint64 per step, the offset where the step ends in the data file
+
+Both are written to uniquely named '.tmp' files and renamed once the trace is complete, so only finished
+traces are ever read, and they are still there for replay after a worker restart. Temporary files a
+crashed process left behind are deleted by prune() once they are STALE_TMP_AGE seconds old. Reads go through mmap, so
+serving a trace costs page cache rather than process memory however large it is.
+
+The store keeps at most 'max_open' traces mapped, and once its files grow past 'max_bytes' (or get older
+than 'max_age' seconds) the least recently read traces are deleted. Traces handed out by get() are
+never deleted while something still holds them.
+'''
+import mmap
+import os
+import struct
+import tempfile
+import threading
+import time
+import weakref
+from collections import OrderedDict
+from functools import partial
+
+
+OFFSET = struct.Struct('<Q')
+TMP_SUFFIX = '.tmp'
+DEFAULT_MAX_OPEN = 32
+DEFAULT_MAX_STORE_BYTES = 1 << 30
+STALE_TMP_AGE = 3600
+
+
+class DiskTrace:
+    '''
+    Read-only view of a completed trace on disk. Indexing returns the payload bytes of a step.
+
+    close() unmaps the files. A closed trace that is read again maps them again, so a stream still reading
+    a trace the store has let go of keeps working, and calls 'on_reopen' with itself so the store tracks
+    the new maps.
+    '''
+
+    def __init__(self, data_path, index_path, on_reopen=None):
+        self.data_path = data_path
+        self.index_path = index_path
+        self.on_reopen = on_reopen
+        self._data = self._index = None
+        self.closed = True
+        self._open_maps()
+        self._length = len(self._index) // OFFSET.size if self._index is not None else 0
+
+    def _open_maps(self):
+        self._data = self._map(self.data_path)
+        self._index = self._map(self.index_path)
+        self.closed = False
+
+    @staticmethod
+    def _map(path):
+        # mmap can't map an empty file
+        with open(path, 'rb') as file:
+            if os.fstat(file.fileno()).st_size == 0:
+                return None
+            return mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def _end(self, index):
+        return OFFSET.unpack_from(self._index, index * OFFSET.size)[0]
+
+    def payload(self, index):
+        if self.closed:
+            self._open_maps()
+            if self.on_reopen is not None:
+                self.on_reopen(self)
+        start = self._end(index - 1) if index > 0 else 0
+        return self._data[start:self._end(index)]
+
+    def nbytes(self):
+        return os.path.getsize(self.data_path) + os.path.getsize(self.index_path)
+
+    def close(self):
+        for mapped in (self._data, self._index):
+            if mapped is not None:
+                mapped.close()
+        self._data = self._index = None
+        self.closed = True
+
+    def __len__(self):
+        return self._length
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self.payload(k) for k in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError('DiskTrace index out of range')
+        return self.payload(index)
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self.payload(index)
+
+
+class TraceStore:
+    '''
+    Directory of DiskTraces keyed by cache key (see backend.trace_cache.cache_key).
+
+    Up to 'max_open' traces stay mapped, the least recently read one is closed when another is opened or a
+    closed one is read again.
+    After each recording the store is pruned down to 'max_bytes' and traces not read for 'max_age' seconds
+    are deleted (see prune()). Either limit can be None.
+    '''
+
+    def __init__(self, directory, max_open=DEFAULT_MAX_OPEN, max_bytes=DEFAULT_MAX_STORE_BYTES, max_age=None):
+        if max_open < 1:
+            raise ValueError('max_open must be at least 1.')
+        self.directory = directory
+        self.max_open = max_open
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        self._open = OrderedDict()  # key -> DiskTrace, least recently read first
+        # every trace still referenced somewhere, mapped or not, so get() hands out one DiskTrace per key
+        # and prune() doesn't delete the files of a trace a stream is still reading
+        self._traces = weakref.WeakValueDictionary()
+        # temporary files being written by this store
+        self._recording = set()
+        os.makedirs(directory, exist_ok=True)
+        self.prune()
+
+    def _paths(self, key):
+        base = os.path.join(self.directory, key)
+        return base + '.data', base + '.index'
+
+    def get(self, key):
+        '''
+        Returns the completed trace stored under the key, or None.
+        '''
+        with self._lock:
+            trace = self._traces.get(key)
+            if trace is None:
+                data_path, index_path = self._paths(key)
+                try:
+                    trace = DiskTrace(data_path, index_path, on_reopen=partial(self._reopened, key))
+                except FileNotFoundError:
+                    return None
+                self._traces[key] = trace
+            elif trace.closed:
+                trace._open_maps()
+            self._track(key, trace)
+            # the data file's mtime is when the trace was last read, prune() goes by it
+            try:
+                os.utime(trace.data_path)
+            except FileNotFoundError:
+                pass
+            return trace
+
+    def _track(self, key, trace):
+        # marks the trace as the most recently read mapped one, closing the least recently read beyond max_open
+        self._open[key] = trace
+        self._open.move_to_end(key)
+        while len(self._open) > self.max_open:
+            _, evicted = self._open.popitem(last=False)
+            evicted.close()
+
+    def _reopened(self, key, trace):
+        with self._lock:
+            self._track(key, trace)
+
+    def record(self, key, payloads):
+        '''
+        Re-yields the payloads while appending them to the store. The trace becomes visible to get() only
+        once the payloads run out; an abandoned trace leaves no files behind.
+        '''
+        data_path, index_path = self._paths(key)
+        # each recording gets its own temporary files, two clients may be tracing the same key at once
+        temporary = []
+        complete = False
+        try:
+            for path in (data_path, index_path):
+                fd, tmp_path = tempfile.mkstemp(dir=self.directory, prefix=os.path.basename(path) + '.',
+                                                suffix=TMP_SUFFIX)
+                os.close(fd)
+                temporary.append(tmp_path)
+                self._recording.add(tmp_path)
+            data_tmp, index_tmp = temporary
+            with open(data_tmp, 'wb') as data_file, open(index_tmp, 'wb') as index_file:
+                end = 0
+                for payload in payloads:
+                    data_file.write(payload)
+                    end += len(payload)
+                    index_file.write(OFFSET.pack(end))
+                    yield payload
+            # the index goes in last, a data file without an index is never read
+            os.replace(data_tmp, data_path)
+            os.replace(index_tmp, index_path)
+            complete = True
+        finally:
+            for path in temporary:
+                self._recording.discard(path)
+                if not complete and os.path.exists(path):
+                    os.remove(path)
+        self.prune(keep=key)
+
+    def delete(self, key):
+        with self._lock:
+            trace = self._open.pop(key, None)
+            if trace is not None:
+                trace.close()
+            self._traces.pop(key, None)
+            self._remove_files(key)
+
+    def _stored(self):
+        # (last read, size, key) of every completed trace, whether mapped or not
+        stored = []
+        for entry in os.scandir(self.directory):
+            if not entry.name.endswith('.data'):
+                continue
+            key = entry.name[:-len('.data')]
+            try:
+                stat = entry.stat()
+                size = stat.st_size + os.path.getsize(self._paths(key)[1])
+            except FileNotFoundError:
+                continue  # a data file without its index isn't a completed trace
+            stored.append((stat.st_mtime, size, key))
+        return stored
+
+    def _remove_stale_tmp(self):
+        # temporary files no recording of this store is writing and that haven't been written to for
+        # STALE_TMP_AGE seconds were left behind by a crashed process
+        stale = time.time() - STALE_TMP_AGE
+        for entry in os.scandir(self.directory):
+            if not entry.name.endswith(TMP_SUFFIX) or entry.path in self._recording:
+                continue
+            try:
+                if entry.stat().st_mtime < stale:
+                    os.remove(entry.path)
+            except FileNotFoundError:
+                pass
+
+    def prune(self, keep=None):
+        '''
+        Deletes stale temporary files and traces not read for max_age seconds, then the least recently read
+        traces until the store's files take up at most max_bytes. Traces that are mapped or still held by a
+        reader and the one under 'keep' (the trace just recorded) are kept. Returns the deleted keys.
+        '''
+        with self._lock:
+            self._remove_stale_tmp()
+            if self.max_bytes is None and self.max_age is None:
+                return []
+            stored = sorted(self._stored())
+            total = sum(size for _, size, _ in stored)
+            oldest = time.time() - self.max_age if self.max_age is not None else None
+            deleted = []
+            for last_read, size, key in stored:
+                expired = oldest is not None and last_read < oldest
+                if not expired and (self.max_bytes is None or total <= self.max_bytes):
+                    continue
+                if key in self._open or key in self._traces or key == keep:
+                    continue
+                self._remove_files(key)
+                total -= size
+                deleted.append(key)
+            return deleted
+
+    def _remove_files(self, key):
+        for path in self._paths(key):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def close(self):
+        with self._lock:
+            for trace in self._open.values():
+                trace.close()
+            self._open.clear()
@@ -0,0 +1,549 @@
+'''
+Compact binary encoding for trace steps.
+
+Each event type has a schema: an ordered list of fields, each with a kind.
+- 'i32' / 'i64' : signed little endian integers, packed together with one struct call
+- 'str' : utf-8 text prefixed with its byte length
+- 'json' : compact JSON prefixed with its byte length, for states, memo entries, ...
+- 'table' : a 1D or 2D table of integers as a packed array, in the narrowest of int8 / int16 / int32 /
+  int64 that holds every value, after a header with that width, the number of dimensions and the shape.
+  When it takes fewer bytes, each row is written instead as its first value and the differences between
+  neighbouring values as varints (width code VARINT_ROW_DELTAS): DP tables grow slowly along their rows,
+  so the differences mostly take one byte whatever the width of the values.
+- 'point' : a {'row', 'col'} highlight as two int32
+- 'cell' : a delta cell, a shape byte (0 : {'row', 'col', 'value'}, 1 : {'index', 'value'}) then the
+  coordinates and the value as varints
+- 'memo' : a memo with int values, a key form byte then the values as varints after the keys. The keys are
+  varints when they are ints (form 1) or the repr of tuples of ints (form 2, after the tuple length), and a
+  length prefixed JSON array otherwise (form 0). They decode to the strings a JSON memo would have.
+- 'explanation' : a uint16 template id and the JSON array of its arguments (length prefixed), for
+  templated explanations. Text explanations use TEXT_EXPLANATION_ID and carry the utf-8 text instead.
+
+A step is written as its type code (uint16) and a bitmask of the schema fields it contains (uint32),
+followed by those fields in schema order. Anything the schema can't hold (an unknown key, None, an
+integer that overflows its column, a cell of another shape) goes into a JSON 'extra' object flagged by
+the top bit of the mask, and steps of an unknown type are written whole as JSON under UNKNOWN_TYPE_CODE.
+
+Varints are zigzag LEB128: n >= 0 is written as 2n and n < 0 as -2n - 1, in 7 bit groups from the lowest,
+the top bit of a byte set when another follows. At most 10 bytes long, they hold any int64 and any difference
+between two.
+
+The schema is sent to the client once per execution (see wire_schema()) so it can decode batches.
+Clients opt in with 'wire_format' : 'binary' in execute_algorithm, JSON stays the default.
+'''
+import json
+import operator
+import re
+import struct
+import sys
+from array import array
+from itertools import accumulate
+
+
+# field kinds
+I32 = 'i32'
+I64 = 'i64'
+STR = 'str'
+JSON = 'json'
+POINT = 'point'
+CELL = 'cell'
+EXPLANATION = 'explanation'
+TABLE = 'table'
+MEMO = 'memo'
+
+EVENT_SCHEMAS = {
+    'call' : (('id', I32), ('parent', I32), ('depth', I32), ('n', I32), ('index', I32), ('capacity', I32),
+              ('i', I32), ('j', I32), ('explanation', EXPLANATION)),
+    'base_case' : (('id', I32), ('n', I32), ('result', I64), ('explanation', EXPLANATION)),
+    'return' : (('id', I32), ('n', I32), ('result', I64), ('explanation', EXPLANATION)),
+    'cache-hit' : (('id', I32), ('n', I32), ('result', I64), ('memo', MEMO), ('explanation', EXPLANATION)),
+    'cache-miss' : (('id', I32), ('n', I32), ('explanation', EXPLANATION)),
+    'cache_hit' : (('id', I32), ('state', JSON), ('result', I64), ('memo', MEMO), ('explanation', EXPLANATION)),
+    'cache_miss' : (('id', I32), ('state', JSON), ('explanation', EXPLANATION)),
+    'store_result' : (('id', I32), ('n', I32), ('state', JSON), ('result', I64), ('memo_entry', JSON),
+                      ('memo', MEMO), ('explanation', EXPLANATION)),
+    'decision' : (('id', I32), ('decision', STR), ('explanation', EXPLANATION)),
+    'decision_start' : (('id', I32), ('branch', STR)),
+    'decision_end' : (('id', I32), ('branch', STR), ('value', I64)),
+    'match' : (('id', I32), ('char', STR)),
+    'mismatch' : (('id', I32),),
+    'init_table' : (('table', TABLE), ('explanation', EXPLANATION)),
+    'set_base_case' : (('cell', CELL), ('table', TABLE), ('explanation', EXPLANATION)),
+    'iteration' : (('i', I32), ('w', I32), ('j', I32), ('cell', CELL), ('table', TABLE), ('highlight', POINT),
+                   ('explanation', EXPLANATION), ('decision', STR)),
+    'final_result' : (('n', I32), ('result', I64), ('table', TABLE), ('explanation', EXPLANATION)),
+    'traceback_step' : (('highlight', POINT), ('explanation', EXPLANATION)),
+    'traceback_match' : (('char', STR), ('explanation', EXPLANATION)),
+    'item_included' : (('item_index', I32), ('explanation', EXPLANATION)),
+    'traceback_complete' : (('included_items', JSON), ('result_length', I32), ('result', I64),
+                            ('explanation', EXPLANATION)),
+    'subtree_ref' : (('id', I64), ('parent', I64), ('depth', I32), ('n', I32), ('index', I32), ('capacity', I32),
+                     ('i', I32), ('j', I32), ('ref', I64), ('id_offset', I64), ('length', I64), ('result', I64),
+                     ('explanation', EXPLANATION)),
+    'iteration_block' : (('unit', STR), ('i', I32), ('w', I32), ('j', I32), ('count', I32), ('spans', JSON),
+                         ('table', TABLE), ('highlight', POINT), ('explanation', EXPLANATION)),
+    'hirschberg_start' : (('row_string', STR), ('rows', I32), ('cols', I32), ('explanation', EXPLANATION)),
+    'hirschberg_split' : (('id', I32), ('parent', I32), ('depth', I32), ('rows', JSON), ('cols', JSON), ('mid', I32),
+                          ('split', I32), ('score', I32), ('forward', TABLE), ('backward', TABLE),
+                          ('explanation', EXPLANATION)),
+    'hirschberg_base' : (('id', I32), ('parent', I32), ('depth', I32), ('rows', JSON), ('cols', JSON), ('result', STR),
+                         ('explanation', EXPLANATION)),
+    'bitparallel_start' : (('row_string', STR), ('rows', I32), ('cols', I32), ('masks', JSON), ('explanation', EXPLANATION)),
+    'bitparallel_row' : (('i', I32), ('char', STR), ('bits', STR), ('length', I32), ('explanation', EXPLANATION)),
+    'doubling_start' : (('n', I64), ('bits', STR), ('explanation', EXPLANATION)),
+    'doubling_step' : (('bit_index', I32), ('bit', I32), ('k', I64), ('value', JSON), ('next_value', JSON),
+                       ('explanation', EXPLANATION)),
+}
+
+WIRE_FORMATS = ('json', 'binary')
+
+# Bumped whenever the encoding of a step changes, stored traces are keyed by it
+WIRE_VERSION = 3
+
+UNKNOWN_TYPE_CODE = 0xFFFF
+EXTRA_BIT = 1 << 31
+TEXT_EXPLANATION_ID = 0xFFFF
+
+HEADER = struct.Struct('<HI')
+LENGTH = struct.Struct('<I')
+COUNT = struct.Struct('<I')
+POINT_STRUCT = struct.Struct('<ii')
+CELL_KEYS = (('row', 'col', 'value'), ('index', 'value'))
+EXPLANATION_HEADER = struct.Struct('<HI')
+TABLE_HEADER = struct.Struct('<BBII')  # width code, dimensions, rows, columns
+TABLE_WIDTHS = (('b', -2 ** 7, 2 ** 7 - 1), ('h', -2 ** 15, 2 ** 15 - 1), ('i', -2 ** 31, 2 ** 31 - 1),
+                ('q', -2 ** 63, 2 ** 63 - 1))
+VARINT_ROW_DELTAS = len(TABLE_WIDTHS)
+MEMO_JSON_KEYS, MEMO_INT_KEYS, MEMO_TUPLE_KEYS = range(3)
+
+INT_FORMATS = {I32 : 'i', I64 : 'q'}
+INT_RANGES = {I32 : (-2 ** 31, 2 ** 31 - 1), I64 : (-2 ** 63, 2 ** 63 - 1)}
+
+INT_TYPE = {int}
+
+_dumps = json.JSONEncoder(separators=(',', ':')).encode
+
+
+def parse_wire_format(data):
+    '''
+    Reads and validates 'wire_format' from an execute_algorithm payload.
+    Raises a ValueError for an unknown format.
+    '''
+    wire_format = data.get('wire_format', 'json')
+    if wire_format not in WIRE_FORMATS:
+        raise ValueError(f"Unknown wire_format '{wire_format}'. Expected one of {list(WIRE_FORMATS)}.")
+    return wire_format
+
+
+# Packers return the bytes for a value, or None if the value doesn't fit the kind and goes into 'extra'.
+# Unpackers return (value, offset just past it).
+
+def _pack_str(value):
+    if type(value) is not str:
+        return None
+    data = value.encode('utf-8')
+    return LENGTH.pack(len(data)) + data
+
+
+def _pack_json(value):
+    data = _dumps(value).encode('utf-8')
+    return LENGTH.pack(len(data)) + data
+
+
+def _unpack_text(blob, offset):
+    (length,) = LENGTH.unpack_from(blob, offset)
+    offset += LENGTH.size
+    return bytes(blob[offset:offset + length]).decode('utf-8'), offset + length
+
+
+def _unpack_json(blob, offset):
+    text, offset = _unpack_text(blob, offset)
+    return json.loads(text), offset
+
+
+def _varint(value):
+    value = value << 1 if value >= 0 else ~value << 1 | 1
+    data = bytearray()
+    while value >= 0x80:
+        data.append(value & 0x7F | 0x80)
+        value >>= 7
+    data.append(value)
+    return bytes(data)
+
+
+# The varints of the values DP traces mostly hold, those up to two bytes long, so that most values are
+# encoded and decoded by a lookup
+SMALL_VARINTS = {value : _varint(value) for value in range(-2 ** 13, 2 ** 13)}
+SMALL_VARINT_VALUES = {data : value for value, data in SMALL_VARINTS.items()}
+VARINT = re.compile(rb'[\x80-\xff]*[\x00-\x7f]')
+
+
+def _varints(values):
+    # the zigzag LEB128 bytes of ints that fit an int64
+    try:
+        return b''.join(map(SMALL_VARINTS.__getitem__, values))
+    except KeyError:
+        return b''.join([SMALL_VARINTS.get(value) or _varint(value) for value in values])
+
+
+def _unpack_varint(data):
+    value = 0
+    for shift, byte in enumerate(data):
+        value |= (byte & 0x7F) << 7 * shift
+    return value >> 1 if not value & 1 else ~(value >> 1)
+
+
+def _unpack_varints(blob, offset, count):
+    # (the 'count' ints written by _varints() at 'offset', offset just past them)
+    varints = VARINT.findall(blob, offset, offset + 2 * count)
+    if len(varints) < count:
+        varints = VARINT.findall(blob, offset, offset + 10 * count)
+    varints = varints[:count]
+    offset += sum(map(len, varints))
+    try:
+        return list(map(SMALL_VARINT_VALUES.__getitem__, varints)), offset
+    except KeyError:
+        return [SMALL_VARINT_VALUES.get(data) or _unpack_varint(data) for data in varints], offset
+
+
+def _fits_int64(values):
+    low, high = INT_RANGES[I64]
+    return set(map(type, values)) <= INT_TYPE and (not values or (low <= min(values) and max(values) <= high))
+
+
+def _pack_point(value):
+    if type(value) is not dict or len(value) != 2:
+        return None
+    try:
+        return POINT_STRUCT.pack(value['row'], value['col'])
+    except (KeyError, struct.error):
+        return None
+
+
+def _unpack_point(blob, offset):
+    row, col = POINT_STRUCT.unpack_from(blob, offset)
+    return {'row' : row, 'col' : col}, offset + POINT_STRUCT.size
+
+
+def _pack_cell(value):
+    if type(value) is not dict:
+        return None
+    for shape, keys in enumerate(CELL_KEYS):
+        if len(value) == len(keys) and all(key in value for key in keys):
+            values = [value[key] for key in keys]
+            if not _fits_int64(values):
+                return None
+            return bytes((shape,)) + _varints(values)
+    return None
+
+
+def _unpack_cell(blob, offset):
+    keys = CELL_KEYS[blob[offset]]
+    values, offset = _unpack_varints(blob, offset + 1, len(keys))
+    return dict(zip(keys, values)), offset
+
+
+def _pack_memo(value):
+    if type(value) is not dict or not _fits_int64(list(value.values())):
+        return None
+    keys = list(value)
+    key_values = _memo_key_values(keys)
+    if key_values is None:
+        # JSON object keys are strings, so int keys are sent as the strings a JSON memo would have
+        if not set(map(type, keys)) <= {str, int}:
+            return None
+        data = _dumps([key if type(key) is str else str(key) for key in keys]).encode('utf-8')
+        return bytes((MEMO_JSON_KEYS,)) + LENGTH.pack(len(data)) + data + _varints(value.values())
+    key_form, arity, key_values = key_values
+    return bytes((key_form, arity)) + _varints([len(keys), *key_values, *value.values()])
+
+
+def _memo_key_values(keys):
+    # (key form, arity, the ints of every key) when the keys are ints or the repr of tuples of ints, else None
+    if not keys:
+        return None
+    if set(map(type, keys)) <= INT_TYPE:
+        return (MEMO_INT_KEYS, 1, keys) if _fits_int64(keys) else None
+    if type(keys[0]) is not str or not keys[0].startswith('('):
+        return None
+    # parsed all at once as a JSON array of arrays, and only kept if the arrays print back as the same keys
+    joined = ', '.join(keys) if set(map(type, keys)) == {str} else ''
+    try:
+        tuples = json.loads('[' + joined.replace('(', '[').replace(')', ']') + ']')
+    except ValueError:
+        return None
+    arity = len(tuples[0]) if tuples and type(tuples[0]) is list else 0
+    if not 1 < arity < 256 or set(map(len, tuples)) != {arity}:
+        return None
+    if repr(tuples)[1:-1].replace('[', '(').replace(']', ')') != joined:
+        return None
+    key_values = [value for values in tuples for value in values]
+    return (MEMO_TUPLE_KEYS, arity, key_values) if _fits_int64(key_values) else None
+
+
+def _unpack_memo(blob, offset):
+    key_form = blob[offset]
+    if key_form == MEMO_JSON_KEYS:
+        keys, offset = _unpack_json(blob, offset + 1)
+        count = len(keys)
+    else:
+        arity = blob[offset + 1]
+        (count,), offset = _unpack_varints(blob, offset + 2, 1)
+        key_values, offset = _unpack_varints(blob, offset, count * arity)
+        if key_form == MEMO_INT_KEYS:
+            keys = map(str, key_values)
+        else:
+            # the repr of the tuples' values as lists, cut back into keys
+            rows = repr([key_values[start:start + arity] for start in range(0, len(key_values), arity)])
+            keys = ['(' + key + ')' for key in rows[2:-2].split('], [')] if key_values else []
+    values, offset = _unpack_varints(blob, offset, count)
+    return dict(zip(keys, values)), offset
+
+
+def _pack_explanation(value):
+    if type(value) is str:
+        data = value.encode('utf-8')
+        return EXPLANATION_HEADER.pack(TEXT_EXPLANATION_ID, len(data)) + data
+    if type(value) not in (list, tuple) or not value or type(value[0]) is not int:
+        return None
+    if not 0 <= value[0] < TEXT_EXPLANATION_ID:
+        return None
+    args = list(value[1:])
+    if set(map(type, args)) <= INT_TYPE:
+        # a list of ints reads the same in Python and JSON, and repr() is much cheaper than the encoder
+        data = repr(args).replace(' ', '').encode('ascii')
+    else:
+        data = _dumps(args).encode('utf-8')
+    return EXPLANATION_HEADER.pack(value[0], len(data)) + data
+
+
+def _unpack_explanation(blob, offset):
+    template_id, length = EXPLANATION_HEADER.unpack_from(blob, offset)
+    offset += EXPLANATION_HEADER.size
+    text = bytes(blob[offset:offset + length]).decode('utf-8')
+    if template_id == TEXT_EXPLANATION_ID:
+        return text, offset + length
+    return [template_id, *json.loads(text)], offset + length
+
+
+def _pack_table(value):
+    if type(value) is not list:
+        return None
+    two_d = bool(value) and type(value[0]) is list
+    rows = value if two_d else [value]
+    columns = len(rows[0])
+    try:
+        if any(type(row) is not list or len(row) != columns for row in rows):
+            return None
+        low = min(map(min, rows)) if columns else 0
+        high = max(map(max, rows)) if columns else 0
+        code = next(code for code, (_, smallest, largest) in enumerate(TABLE_WIDTHS) if smallest <= low and high <= largest)
+        typecode = TABLE_WIDTHS[code][0]
+        packed = [array(typecode, row) for row in rows]
+    except (TypeError, StopIteration):
+        return None  # not all integers, or one too large for int64
+    if code > 0 and columns > 1:
+        # row deltas can only beat one byte per value if the values are wider than that
+        deltas = _varints([delta for row in rows for delta in _row_deltas(row)])
+        if len(deltas) < len(rows) * columns * packed[0].itemsize:
+            return TABLE_HEADER.pack(VARINT_ROW_DELTAS, 2 if two_d else 1, len(rows), columns) + deltas
+    if sys.byteorder == 'big':
+        for row in packed:
+            row.byteswap()
+    header = TABLE_HEADER.pack(code, 2 if two_d else 1, len(rows), columns)
+    return header + b''.join([row.tobytes() for row in packed])
+
+
+def _row_deltas(row):
+    # the first value of a row, then the differences between neighbouring values
+    return [row[0], *map(operator.sub, row[1:], row)]
+
+
+def _unpack_table(blob, offset):
+    code, dimensions, rows, columns = TABLE_HEADER.unpack_from(blob, offset)
+    offset += TABLE_HEADER.size
+    if code == VARINT_ROW_DELTAS:
+        deltas, end = _unpack_varints(blob, offset, rows * columns)
+        table = [list(accumulate(deltas[row * columns:(row + 1) * columns])) for row in range(rows)]
+        return (table[0] if dimensions == 1 else table), end
+    values = array(TABLE_WIDTHS[code][0])
+    end = offset + rows * columns * values.itemsize
+    values.frombytes(bytes(blob[offset:end]))
+    if sys.byteorder == 'big':
+        values.byteswap()
+    values = values.tolist()
+    if dimensions == 1:
+        return values, end
+    return [values[row * columns:(row + 1) * columns] for row in range(rows)], end
+
+
+PACKERS = {
+    STR : (_pack_str, _unpack_text),
+    JSON : (_pack_json, _unpack_json),
+    TABLE : (_pack_table, _unpack_table),
+    MEMO : (_pack_memo, _unpack_memo),
+    POINT : (_pack_point, _unpack_point),
+    CELL : (_pack_cell, _unpack_cell),
+    EXPLANATION : (_pack_explanation, _unpack_explanation),
+}
+
+
+class _TypeCodec:
+    '''
+    Encodes and decodes the steps of a single event type.
+    '''
+
+    def __init__(self, code, step_type, fields):
+        self.code = code
+        self.step_type = step_type
+        self.fields = fields
+        self.names = frozenset(name for name, _ in fields)
+        self.int_fields = [(1 << bit, name, kind) for bit, (name, kind) in enumerate(fields) if kind in INT_FORMATS]
+        self.var_fields = [(1 << bit, name, *PACKERS[kind]) for bit, (name, kind) in enumerate(fields)
+                           if kind not in INT_FORMATS]
+        self._structs = {}  # presence mask -> Struct for the integer fields present
+
+    def _struct(self, mask):
+        packer = self._structs.get(mask)
+        if packer is None:
+            fmt = ''.join(INT_FORMATS[kind] for flag, _, kind in self.int_fields if mask & flag)
+            packer = self._structs[mask] = struct.Struct('<' + fmt)
+        return packer
+
+    def encode(self, step):
+        mask = 0
+        ints = []
+        extra = {}
+        for flag, name, kind in self.int_fields:
+            if name not in step:
+                continue
+            value = step[name]
+            low, high = INT_RANGES[kind]
+            if type(value) is int and low <= value <= high:
+                mask |= flag
+                ints.append(value)
+            else:
+                extra[name] = value
+
+        parts = []
+        for flag, name, pack, _ in self.var_fields:
+            if name not in step:
+                continue
+            value = step[name]
+            data = pack(value) if value is not None else None
+            if data is None:
+                extra[name] = value
+                continue
+            mask |= flag
+            parts.append(data)
+
+        if len(step) - 1 > len(self.names & step.keys()):
+            extra.update((key, value) for key, value in step.items() if key != 'type' and key not in self.names)
+        if extra:
+            mask |= EXTRA_BIT
+            parts.append(_pack_json(extra))
+
+        return HEADER.pack(self.code, mask) + self._struct(mask & ~EXTRA_BIT).pack(*ints) + b''.join(parts)
+
+    def decode(self, blob, offset, mask):
+        step = {'type' : self.step_type}
+        packer = self._struct(mask & ~EXTRA_BIT)
+        values = packer.unpack_from(blob, offset)
+        offset += packer.size
+
+        position = 0
+        for flag, name, _ in self.int_fields:
+            if mask & flag:
+                step[name] = values[position]
+                position += 1
+
+        for flag, name, _, unpack in self.var_fields:
+            if mask & flag:
+                step[name], offset = unpack(blob, offset)
+
+        if mask & EXTRA_BIT:
+            extra, offset = _unpack_json(blob, offset)
+            step.update(extra)
+        return step, offset
+
+
+class StepCodec:
+    '''
+    Binary encoder/decoder for trace steps following EVENT_SCHEMAS (or a schema received from wire_schema()).
+    '''
+
+    def __init__(self, schemas=EVENT_SCHEMAS):
+        self._by_type = {}
+        self._by_code = {}
+        for code, (step_type, fields) in enumerate(schemas.items()):
+            codec = _TypeCodec(code, step_type, tuple(fields))
+            self._by_type[step_type] = codec
+            self._by_code[code] = codec
+
+    def encode_step(self, step):
+        codec = self._by_type.get(step.get('type'))
+        if codec is None:
+            data = _dumps(step).encode('utf-8')
+            return HEADER.pack(UNKNOWN_TYPE_CODE, 0) + LENGTH.pack(len(data)) + data
+        return codec.encode(step)
+
+    def encode_steps(self, steps):
+        '''
+        Packs a batch of steps into one bytes object: a uint32 step count followed by the steps.
+        '''
+        return COUNT.pack(len(steps)) + b''.join([self.encode_step(step) for step in steps])
+
+    def decode_step(self, blob, offset=0):
+        '''
+        Unpacks the step written by encode_step() at 'offset'. Returns (step, offset just past it).
+        '''
+        code, mask = HEADER.unpack_from(blob, offset)
+        offset += HEADER.size
+        if code == UNKNOWN_TYPE_CODE:
+            (length,) = LENGTH.unpack_from(blob, offset)
+            offset += LENGTH.size
+            return json.loads(bytes(blob[offset:offset + length]).decode('utf-8')), offset + length
+        return self._by_code[code].decode(blob, offset, mask)
+
+    def decode_steps(self, blob):
+        '''
+        Unpacks a batch produced by encode_steps() back into step dicts.
+        '''
+        (count,) = COUNT.unpack_from(blob, 0)
+        offset = COUNT.size
+        steps = []
+        for _ in range(count):
+            step, offset = self.decode_step(blob, offset)
+            steps.append(step)
+        return steps
+
+
+def wire_schema(schemas=EVENT_SCHEMAS):
+    '''
+    Description of the binary format that is sent to the client once per execution.
+    '''
+    return {
+        'version' : WIRE_VERSION,
+        'byte_order' : 'little',
+        'header' : {'type_code' : 'uint16', 'field_mask' : 'uint32', 'extra_bit' : 31},
+        'length_prefix' : 'uint32',
+        'text_explanation_id' : TEXT_EXPLANATION_ID,
+        'table_widths' : ['int8', 'int16', 'int32', 'int64', 'varint_row_deltas'],
+        'varint' : 'zigzag_leb128',
+        'memo_key_forms' : ['json', 'int', 'int_tuple'],
+        'unknown_type_code' : UNKNOWN_TYPE_CODE,
+        'types' : [
+            {'code' : code, 'type' : step_type, 'fields' : [{'name' : name, 'kind' : kind} for name, kind in fields]}
+            for code, (step_type, fields) in enumerate(schemas.items())
+        ]
+    }
+
+
+def schemas_from_wire(schema):
+    '''
+    Turns a schema produced by wire_schema() back into the EVENT_SCHEMAS form used by StepCodec.
+    '''
+    return {
+        entry['type'] : tuple((field['name'], field['kind']) for field in entry['fields'])
+        for entry in sorted(schema['types'], key=lambda entry: entry['code'])
+    }
@@ -0,0 +1,287 @@
+'''
+Process pool for running tracers outside the Socket.IO handlers.
+
+A long trace run inline holds the GIL and blocks every other client. Instead each job runs in one of
+up to 'max_workers' worker processes, which sends its steps back over a pipe in chunks as they are produced.
+A reader thread in this process collects the chunks as soon as they arrive, so a worker is handed back to
+the pool when its tracer finishes rather than when the client has been sent every step. A job waiting for
+a worker gives up with WorkersBusy after 'acquire_timeout' seconds.
+
+At most 'max_buffered' chunks of a job are held in memory. Once that many are waiting for a caller that
+is slow to consume (or acknowledge) its steps, the following chunks are spilled to a temporary file and
+read back in order, so the worker still finishes and is handed back without the whole trace piling up
+in memory.
+
+Every job has a time limit and a step limit. A job that goes over either one (or that is abandoned by
+closing its step generator) has its worker process terminated, and a fresh worker is started for the next job.
+'''
+import multiprocessing
+import os
+import pickle
+import tempfile
+import threading
+import time
+from collections import deque
+
+
+DEFAULT_MAX_WORKERS = min(4, os.cpu_count() or 1)
+DEFAULT_TIMEOUT = 30.0  # seconds a job may run in its worker, from the moment it gets one
+DEFAULT_MAX_STEPS = 5_000_000
+CHUNK_SIZE = 256  # steps per message from a worker
+DEFAULT_MAX_BUFFERED = 64  # chunks per job held in memory, the rest are spilled to disk
+
+
+class TraceLimitExceeded(Exception):
+    '''
+    Raised when a job runs past its time or step limit. Its worker has already been stopped.
+    '''
+
+
+class WorkersBusy(Exception):
+    '''
+    Raised when no worker frees up within the time a job may wait for one.
+    '''
+
+
+def _worker_main(conn):
+    # Runs in the worker process: traces one job at a time until it receives None
+    while True:
+        job = conn.recv()
+        if job is None:
+            return
+        func, args, kwargs, chunk_size = job
+        try:
+            chunk = []
+            for step in func(*args, **kwargs):
+                chunk.append(step)
+                if len(chunk) >= chunk_size:
+                    conn.send(('steps', chunk))
+                    chunk = []
+            if chunk:
+                conn.send(('steps', chunk))
+            conn.send(('done', None))
+        except Exception as e:
+            try:
+                conn.send(('error', e))
+            except Exception:
+                # the exception itself couldn't be pickled
+                conn.send(('error', RuntimeError(str(e))))
+
+
+class _Worker:
+
+    def __init__(self, context):
+        self.conn, child_conn = context.Pipe()
+        self.process = context.Process(target=_worker_main, args=(child_conn,), daemon=True)
+        self.process.start()
+        child_conn.close()
+
+    def stop(self, wait=True):
+        '''
+        Terminates the worker process, whatever it is doing.
+        '''
+        self.process.terminate()
+        if wait:
+            self.process.join(1)
+            if self.process.is_alive():
+                self.process.kill()
+                self.process.join()
+        self.conn.close()
+
+
+class _Job:
+    '''
+    The chunks of steps a worker has sent back for one run(), collected by the reader thread. At most
+    'max_chunks' are held in memory, later ones go to a spill file until the caller has caught up.
+    '''
+
+    def __init__(self, max_chunks):
+        self.chunks = deque()
+        self.max_chunks = max_chunks
+        self.spill = None  # temporary file, written at the end and read from 'spill_position'
+        self.spill_position = 0
+        self.spilled = 0  # chunks in the spill file not taken yet
+        self.error = None
+        self.finished = False
+        self.condition = threading.Condition()
+
+    def put(self, chunk):
+        with self.condition:
+            if self.spilled or len(self.chunks) >= self.max_chunks:
+                # chunks already waiting on disk come first, so a new one can't skip ahead in memory
+                if self.spill is None:
+                    self.spill = tempfile.TemporaryFile()
+                self.spill.seek(0, os.SEEK_END)
+                pickle.dump(chunk, self.spill, pickle.HIGHEST_PROTOCOL)
+                self.spilled += 1
+            else:
+                self.chunks.append(chunk)
+            self.condition.notify()
+
+    def finish(self, error=None):
+        with self.condition:
+            self.error = error
+            self.finished = True
+            self.condition.notify()
+
+    def take(self):
+        '''
+        Waits for the next chunk. Returns None once the job has finished, raising its error if it failed.
+        '''
+        with self.condition:
+            while not self.chunks and not self.spilled and not self.finished:
+                self.condition.wait()
+            if self.chunks:
+                return self.chunks.popleft()
+            if self.spilled:
+                self.spill.seek(self.spill_position)
+                chunk = pickle.load(self.spill)
+                self.spill_position = self.spill.tell()
+                self.spilled -= 1
+                return chunk
+            if self.error is not None:
+                raise self.error
+            return None
+
+    def close(self):
+        with self.condition:
+            if self.spill is not None:
+                self.spill.close()
+                self.spill = None
+                self.spilled = 0
+
+
+class TracerPool:
+    '''
+    Runs tracer generator functions in worker processes, yielding their steps back in the calling process.
+    '''
+
+    def __init__(self, max_workers=DEFAULT_MAX_WORKERS, timeout=DEFAULT_TIMEOUT, max_steps=DEFAULT_MAX_STEPS,
+                 chunk_size=CHUNK_SIZE, acquire_timeout=None, max_buffered=DEFAULT_MAX_BUFFERED):
+        if max_workers < 1 or max_buffered < 1:
+            raise ValueError('max_workers and max_buffered must be at least 1.')
+        self.max_workers = max_workers
+        self.timeout = timeout
+        # no job holds a worker for longer than 'timeout', so by default wait about that long for one
+        self.acquire_timeout = timeout if acquire_timeout is None else acquire_timeout
+        self.max_steps = max_steps
+        self.chunk_size = chunk_size
+        self.max_buffered = max_buffered
+        methods = multiprocessing.get_all_start_methods()
+        self._context = multiprocessing.get_context('forkserver' if 'forkserver' in methods else 'spawn')
+        self._idle = []
+        self._busy = 0
+        self._condition = threading.Condition()
+        self._closed = False
+        self._jobs = set()
+
+    def _acquire(self):
+        deadline = time.monotonic() + self.acquire_timeout
+        with self._condition:
+            while not self._closed and not self._idle and self._busy >= self.max_workers:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise WorkersBusy('All tracer workers are busy, try again later.')
+                self._condition.wait(remaining)
+            if self._closed:
+                raise RuntimeError('TracerPool is closed.')
+            self._busy += 1
+            if self._idle:
+                return self._idle.pop()
+        try:
+            return _Worker(self._context)
+        except BaseException:
+            self._release(None)
+            raise
+
+    def _release(self, worker):
+        with self._condition:
+            self._busy -= 1
+            if worker is not None:
+                self._idle.append(worker)
+            self._condition.notify()
+
+    def run(self, func, args=(), kwargs=None, timeout=None, max_steps=None):
+        '''
+        Yields the steps of func(*args, **kwargs) run in a worker process.
+
+        Raises TraceLimitExceeded when the job has been running in its worker for more than 'timeout'
+        seconds or has produced more than 'max_steps' steps, and WorkersBusy when no worker frees up in time.
+        Exceptions raised by the tracer are re-raised here.
+        '''
+        timeout = self.timeout if timeout is None else timeout
+        max_steps = self.max_steps if max_steps is None else max_steps
+
+        worker = self._acquire()
+        job = _Job(self.max_buffered)
+        try:
+            worker.conn.send((func, args, kwargs or {}, self.chunk_size))
+        except BaseException:
+            worker.stop()
+            self._release(None)
+            raise
+        threading.Thread(target=self._collect, args=(worker, job, timeout, max_steps), daemon=True).start()
+
+        self._jobs.add(job)
+        try:
+            while True:
+                chunk = job.take()
+                if chunk is None:
+                    return
+                yield from chunk
+        finally:
+            self._jobs.discard(job)
+            if not job.finished:
+                # abandoned: the reader sees the pipe close and frees the slot
+                worker.process.terminate()
+            job.close()
+
+    def _collect(self, worker, job, timeout, max_steps):
+        # Runs in the reader thread: moves chunks from the worker into the job until the tracer is done
+        deadline = time.monotonic() + timeout
+        reusable = False
+        steps = 0
+        try:
+            while True:
+                if not worker.conn.poll(max(deadline - time.monotonic(), 0)):
+                    raise TraceLimitExceeded(f'Execution took longer than {timeout} seconds and was stopped.')
+                kind, payload = worker.conn.recv()
+
+                if kind == 'steps':
+                    steps += len(payload)
+                    if steps > max_steps:
+                        raise TraceLimitExceeded(f'Execution produced more than {max_steps} steps and was stopped.')
+                    job.put(payload)
+                else:
+                    reusable = True
+                    job.finish(payload if kind == 'error' else None)
+                    return
+        except TraceLimitExceeded as e:
+            job.finish(e)
+        except (EOFError, OSError):
+            job.finish(RuntimeError('Tracer worker exited unexpectedly.'))
+        finally:
+            if not reusable:
+                worker.stop()
+            self._release(worker if reusable else None)
+
+    def buffered(self):
+        '''
+        Chunks held in memory that their callers haven't taken yet, across every running job.
+        '''
+        return sum(len(job.chunks) for job in list(self._jobs))
+
+    def close(self):
+        '''
+        Stops the idle workers. Jobs that are still running stop their own workers when they end.
+        '''
+        with self._condition:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._condition.notify_all()
+        for worker in idle:
+            try:
+                worker.conn.send(None)
+            except OSError:
+                pass
+            worker.stop()